@@ -0,0 +1,99 @@
+# admin_jobs.py
+"""
+Job pemeliharaan admin (reset kode, hapus tiket valid) yang berjalan di latar.
+
+- Dikerjakan per potongan JOB_CHUNK baris, masing-masing satu transaksi pendek,
+  lalu jeda JOB_PAUSE detik -> lock tulis cepat dilepas dan scan di gate tetap
+  jalan selama job berlangsung.
+- Progres (done/total), status dan permintaan batal disimpan di tabel
+  admin_jobs, jadi bisa dipantau/dibatalkan dari worker gunicorn mana pun.
+- Job yang sudah selesai sebagian tetap konsisten: baris yang sudah direset/
+  dihapus tetap begitu, sisanya tidak tersentuh.
+- updated_at diperbarui tiap potongan (heartbeat). Job 'running' tanpa heartbeat
+  lebih dari JOB_STALE detik (thread mati / proses restart) ditandai 'failed'
+  saat startup dan saat statusnya dibuka, jadi panel admin tidak menunggu selamanya.
+"""
+import os
+import json
+import time
+import threading
+
+JOB_CHUNK = int(os.environ.get("ADMIN_JOB_CHUNK", "500"))
+JOB_PAUSE = float(os.environ.get("ADMIN_JOB_PAUSE", "0.05"))
+JOB_STALE = int(os.environ.get("ADMIN_JOB_STALE", "300"))   # detik tanpa heartbeat -> job dianggap mati
+
+JOB_LABELS = {
+    "reset_expired": "Reset kode >24 jam",
+    "reset_all": "Reset semua kode",
+    "delete_valid": "Hapus tiket valid",
+}
+
+
+def _step(storage, kind, event_id, params):
+    if kind == "reset_all":
+        return storage.reset(event_id, limit=JOB_CHUNK, before=params["before"])
+    if kind == "reset_expired":
+        return storage.reset(event_id, older_than=params["older_than"], limit=JOB_CHUNK)
+    if kind == "delete_valid":
+        return storage.delete_valid(event_id, limit=JOB_CHUNK)
+    raise ValueError(f"Job tidak dikenal: {kind}")
+
+
+def _total(storage, kind, event_id, params):
+    if kind == "reset_all":
+        return storage.count_reset(event_id, before=params["before"])
+    if kind == "reset_expired":
+        return storage.count_reset(event_id, older_than=params["older_than"])
+    return storage.count_valid(event_id)
+
+
+def run_job(storage, job_id, kind, event_id, params):
+    done = 0
+    try:
+        while True:
+            n = _step(storage, kind, event_id, params)
+            done += n
+            if n == 0:
+                storage.update_job(job_id, done=done, status="done")
+                return
+            if storage.update_job(job_id, done=done):
+                storage.update_job(job_id, status="cancelled")
+                return
+            time.sleep(JOB_PAUSE)   # beri giliran ke redeem yang sedang antre
+    except Exception as e:
+        print(f"⚠️ Job admin {job_id} gagal:", e)
+        storage.update_job(job_id, done=done, status="failed", error=str(e))
+
+
+def start_job(storage, kind, event_id, **params):
+    """Daftarkan job lalu jalankan di thread latar. Return id job."""
+    total = _total(storage, kind, event_id, params)
+    job_id = storage.create_job(kind, event_id, json.dumps(params), total)
+    threading.Thread(
+        target=run_job, args=(storage, job_id, kind, event_id, params), name=f"admin-job-{job_id}", daemon=True
+    ).start()
+    return job_id
+
+
+def fail_stale(storage, max_age=JOB_STALE):
+    """Tandai job 'running' yang tidak ada kemajuan > max_age detik sebagai 'failed'. Return jumlahnya."""
+    n = storage.fail_stale_jobs(int(time.time()) - max_age, f"tidak ada kemajuan > {max_age} detik (worker mati/restart)")
+    if n:
+        print(f"⚠️ {n} job admin macet ditandai gagal")
+    return n
+
+
+def current(storage, job_id):
+    """job_view terbaru untuk halaman/polling status (job macet ditandai gagal dulu)."""
+    fail_stale(storage)
+    return job_view(storage.get_job(job_id))
+
+
+def job_view(job):
+    """Dict siap tampil/JSON (label + persen)."""
+    if not job:
+        return None
+    view = dict(job)
+    view["label"] = JOB_LABELS.get(job["kind"], job["kind"])
+    view["percent"] = 100 if job["status"] == "done" else int(100 * job["done"] / job["total"]) if job["total"] else 0
+    return view
@@ -0,0 +1,234 @@
+# assets.py
+"""
+Pipeline aset statis untuk produksi (dipakai verify_app).
+
+- Sumber: static/assets/** (CSS, JS scanner, vendor).
+- build(): salin tiap file ke static/dist/<nama>.<hash>.<ext> (hash isi, sha256),
+  plus versi .gz (dan .br jika paket brotli terpasang) untuk teks,
+  lalu tulis static/dist/manifest.json {nama asli -> nama ber-hash}.
+- verify_app melayani /dist/<nama ber-hash> dengan varian terkompresi yang
+  cocok dengan Accept-Encoding dan Cache-Control immutable 1 tahun.
+  Isi berubah -> hash berubah -> URL baru, jadi cache lama tidak pernah basi.
+- Template memanggil asset_url('assets/style.css'); tanpa manifest (dev)
+  fallback ke /static/... biasa.
+
+jsQR di-host sendiri (static/assets/vendor/jsQR.js), diunduh sekali saat build
+(Dockerfile), bukan dari CDN setiap kali halaman scan dibuka. Tiap file VENDOR
+dipatok URL + sha256 isinya: `vendor` menolak unduhan yang digest-nya beda (atau
+yang belum dipatok, sambil mencetak digest-nya untuk diverifikasi lalu ditempel
+ke VENDOR), dan check_vendor() saat startup menolak file vendor yang isinya
+berubah. Jika file vendor belum diunduh (Procfile / jalan lokal), asset_url
+memakai URL CDN yang dipatok supaya scanner tetap jalan; ASSET_CDN_FALLBACK=0 ->
+startup gagal. Harga fallback itu: jsQR dimuat worker lewat importScripts, yang
+tidak bisa membawa SRI (integrity), jadi browser menjalankan apa pun yang
+dikirim CDN untuk URL tersebut tanpa dicek. Produksi sebaiknya memakai vendor
+yang sudah diunduh (image Docker memasang ASSET_CDN_FALLBACK=0).
+
+CLI:
+    python assets.py vendor   # unduh library JS pihak ketiga (versi dipatok)
+    python assets.py build    # hash + kompres -> static/dist
+"""
+import os
+import sys
+import json
+import gzip
+import shutil
+import hashlib
+import argparse
+import mimetypes
+
+BASEDIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASEDIR, "static")
+SRC_DIR = os.path.join(STATIC_DIR, "assets")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFEST_PATH = os.path.join(DIST_DIR, "manifest.json")
+MAX_AGE = 365 * 24 * 3600
+
+COMPRESSIBLE = {".css", ".js", ".svg", ".json", ".html", ".txt", ".map"}
+# rel -> (URL dipatok, sha256 hex isi file). sha256 kosong = belum dipatok: `vendor` menolak
+# dan mencetak digest unduhan; cocokkan dengan rilis resmi (npm pack jsqr@1.4.0) lalu tempel di sini.
+VENDOR = {
+    "vendor/jsQR.js": ("https://unpkg.com/jsqr@1.4.0/dist/jsQR.js", ""),
+}
+# vendor belum diunduh: pakai URL CDN di atas (1) atau tolak startup (0)
+CDN_FALLBACK = os.environ.get("ASSET_CDN_FALLBACK", "1") == "1"
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+_manifest = None
+
+
+def _hashed_name(rel, data):
+    root, ext = os.path.splitext(rel)
+    return f"{root}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+
+
+def _sources():
+    for dirpath, _dirs, files in os.walk(SRC_DIR):
+        for name in sorted(files):
+            path = os.path.join(dirpath, name)
+            yield os.path.relpath(path, STATIC_DIR).replace(os.sep, "/"), path
+
+
+def build(verbose=True):
+    """Bangun static/dist + manifest. Return manifest dict."""
+    manifest = {}
+    keep = {"manifest.json"}
+    for rel, path in _sources():
+        with open(path, "rb") as f:
+            data = f.read()
+        hashed = _hashed_name(rel, data)
+        out = os.path.join(DIST_DIR, hashed)
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+        if not os.path.exists(out):
+            with open(out, "wb") as f:
+                f.write(data)
+        keep.add(hashed)
+        if os.path.splitext(rel)[1] in COMPRESSIBLE:
+            variants = [(".gz", lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                variants.append((".br", lambda d: brotli.compress(d, quality=11)))
+            for suffix, compress in variants:
+                packed = compress(data)
+                if len(packed) < len(data):
+                    with open(out + suffix, "wb") as f:
+                        f.write(packed)
+                    keep.add(hashed + suffix)
+        manifest[rel] = hashed
+        if verbose:
+            print(f"{rel} -> dist/{hashed}")
+
+    # hapus hasil build lama yang tidak dirujuk manifest
+    for dirpath, _dirs, files in os.walk(DIST_DIR):
+        for name in files:
+            rel = os.path.relpath(os.path.join(dirpath, name), DIST_DIR).replace(os.sep, "/")
+            if rel not in keep:
+                os.remove(os.path.join(dirpath, name))
+
+    tmp = MANIFEST_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, MANIFEST_PATH)
+    global _manifest
+    _manifest = manifest
+    return manifest
+
+
+def is_stale():
+    if not os.path.exists(MANIFEST_PATH):
+        return True
+    built = os.path.getmtime(MANIFEST_PATH)
+    return any(os.path.getmtime(path) > built for _rel, path in _sources())
+
+
+def ensure_built():
+    """Build jika manifest belum ada / sumber lebih baru (dipanggil sekali saat startup)."""
+    if is_stale():
+        build(verbose=False)
+    return load_manifest()
+
+
+def load_manifest():
+    global _manifest
+    if _manifest is None:
+        try:
+            with open(MANIFEST_PATH, encoding="utf-8") as f:
+                _manifest = json.load(f)
+        except FileNotFoundError:
+            _manifest = {}
+    return _manifest
+
+
+def hashed_path(name):
+    """'assets/style.css' -> 'assets/style.<hash>.css' atau None jika belum di-build."""
+    return load_manifest().get(name)
+
+
+def is_built_file(filename):
+    return filename in set(load_manifest().values())
+
+
+def pick_variant(filename, accept_encoding):
+    """Return (nama file di dist, content-encoding atau None) sesuai Accept-Encoding."""
+    accept_encoding = accept_encoding or ""
+    for suffix, encoding in ((".br", "br"), (".gz", "gzip")):
+        if encoding in accept_encoding and os.path.exists(os.path.join(DIST_DIR, filename + suffix)):
+            return filename + suffix, encoding
+    return filename, None
+
+
+def mimetype(filename):
+    return mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+
+def _sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def vendor():
+    """Unduh library pihak ketiga ke static/assets/ (sekali, saat build image); sha256 wajib cocok."""
+    from urllib.request import urlopen
+    for rel, (url, sha256) in VENDOR.items():
+        dest = os.path.join(SRC_DIR, rel)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        with urlopen(url, timeout=30) as resp, open(dest + ".tmp", "wb") as f:
+            shutil.copyfileobj(resp, f)
+        got = _sha256_file(dest + ".tmp")
+        if got != sha256:
+            os.remove(dest + ".tmp")
+            reason = "belum dipatok" if not sha256 else f"tidak cocok (dipatok {sha256})"
+            raise RuntimeError(f"sha256 {url} {reason}: unduhan = {got}. File tidak dipasang.")
+        os.replace(dest + ".tmp", dest)
+        print(f"{url} -> static/assets/{rel} ({os.path.getsize(dest)} bytes, sha256 cocok)")
+
+
+def missing_vendor():
+    return [rel for rel in VENDOR if not os.path.exists(os.path.join(SRC_DIR, rel))]
+
+
+def vendor_fallback(name):
+    """'assets/vendor/jsQR.js' yang belum diunduh -> URL CDN yang dipatok, selain itu None."""
+    rel = name[len("assets/"):] if name.startswith("assets/") else None
+    if rel in VENDOR and not os.path.exists(os.path.join(SRC_DIR, rel)):
+        return VENDOR[rel][0]
+    return None
+
+
+def check_vendor():
+    """Dipanggil saat startup: vendor hilang -> peringatan keras (fallback CDN) atau RuntimeError."""
+    for rel, (_url, sha256) in VENDOR.items():
+        path = os.path.join(SRC_DIR, rel)
+        if os.path.exists(path) and _sha256_file(path) != sha256:
+            raise RuntimeError(f"Isi static/assets/{rel} tidak cocok dengan sha256 yang dipatok di VENDOR")
+    missing = missing_vendor()
+    if not missing:
+        return
+    if not CDN_FALLBACK:
+        raise RuntimeError(
+            "Aset vendor belum ada: " + ", ".join(missing)
+            + " (jalankan: python assets.py vendor, atau set ASSET_CDN_FALLBACK=1)"
+        )
+    print("⚠️ Aset vendor belum ada: " + ", ".join(missing)
+          + " -> halaman scan memuat dari CDN tanpa cek integritas (" + ", ".join(VENDOR[rel][0] for rel in missing) + ")."
+          + " Jalankan: python assets.py vendor", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Pipeline aset statis")
+    ap.add_argument("cmd", choices=("vendor", "build"))
+    args = ap.parse_args()
+    if args.cmd == "vendor":
+        vendor()
+    else:
+        m = build()
+        missing = missing_vendor()
+        if missing:
+            print("⚠️ Vendor belum diunduh (jalankan: python assets.py vendor):", ", ".join(missing), file=sys.stderr)
+        print(f"{len(m)} aset -> {os.path.relpath(DIST_DIR, BASEDIR)}")
@@ -0,0 +1,215 @@
+# backup.py
+"""
+Snapshot online data.db tanpa menghentikan gate.
+
+- Memakai SQLite online backup API, BACKUP_PAGES halaman per langkah dengan jeda
+  kecil di antaranya. Sumber dibaca dalam satu transaksi baca (mode WAL, lihat
+  storage.SQLITE_JOURNAL_MODE), jadi snapshot konsisten, redeem tetap bisa
+  menulis, dan backup tidak mengulang dari awal walau ada tulisan selama proses.
+- Hasil dicek (PRAGMA quick_check), dikompres gzip ke
+  BACKUP_DIR/<nama>-YYYYmmdd-HHMMSS.db.gz, lalu hanya BACKUP_KEEP snapshot
+  terbaru yang disimpan.
+- Jadwal: start_scheduler() (dipanggil verify_app) memicu snapshot tiap
+  BACKUP_INTERVAL detik di SUBPROSES ber-nice, jadi kompresi tidak berebut
+  CPU/GIL dengan worker. flock pada BACKUP_DIR/.lock -> hanya satu backup
+  berjalan walau ada banyak worker.
+- Restore: snapshot didekompres dan dicek, DB sekarang di-snapshot dulu, lalu
+  isinya disalin ke DB tujuan lewat backup API (aman walau ada koneksi lain).
+
+CLI:
+    python backup.py snapshot                 # sekali, sekarang
+    python backup.py list
+    python backup.py restore backups/data-20250101-120000.db.gz [--db data.db]
+"""
+import os
+import sys
+import glob
+import gzip
+import time
+import shutil
+import sqlite3
+import argparse
+import threading
+import subprocess
+
+BASEDIR = os.path.dirname(os.path.abspath(__file__))
+DB_FILE = os.path.join(BASEDIR, "data.db")
+BACKUP_DIR = os.environ.get("BACKUP_DIR", os.path.join(BASEDIR, "backups"))
+BACKUP_INTERVAL = int(os.environ.get("BACKUP_INTERVAL", "0"))   # detik; 0 = jadwal otomatis mati
+BACKUP_KEEP = int(os.environ.get("BACKUP_KEEP", "24"))
+BACKUP_PAGES = int(os.environ.get("BACKUP_PAGES", "128"))       # halaman per langkah backup
+BACKUP_STEP_PAUSE = 0.005                                        # detik antar langkah
+
+_scheduler_pid = None
+_lock = threading.Lock()
+
+
+def _base(db_path):
+    return os.path.splitext(os.path.basename(db_path))[0]
+
+
+def snapshots(db_path=DB_FILE, dest_dir=BACKUP_DIR):
+    """Path snapshot milik db_path, terlama dulu (nama berisi timestamp)."""
+    return sorted(glob.glob(os.path.join(dest_dir, f"{_base(db_path)}-*.db.gz")))
+
+
+def check(path):
+    conn = sqlite3.connect(path)
+    try:
+        row = conn.execute("PRAGMA quick_check").fetchone()
+    finally:
+        conn.close()
+    if not row or row[0] != "ok":
+        raise RuntimeError(f"{path} rusak: {row}")
+
+
+def copy_online(src_path, dest_path, pages=BACKUP_PAGES, pause=BACKUP_STEP_PAUSE):
+    """Salin DB yang sedang dipakai ke dest_path (file SQLite biasa) tanpa menahan penulis."""
+    src = sqlite3.connect(src_path, timeout=30, isolation_level=None)
+    dst = sqlite3.connect(dest_path)
+    try:
+        if src.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal":
+            # transaksi baca dibuka sekali -> semua langkah melihat snapshot yang sama
+            src.execute("BEGIN")
+            src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            src.backup(dst, pages=pages, progress=lambda *_: time.sleep(pause))
+            src.execute("COMMIT")
+        else:
+            # mode journal lama: backup bertahap akan mengulang tiap ada tulisan,
+            # jadi salin sekaligus (lock baca singkat, redeem menunggu sebentar)
+            print("⚠️ DB tidak dalam mode WAL; backup disalin sekaligus.")
+            src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+
+def rotate(db_path=DB_FILE, dest_dir=BACKUP_DIR, keep=BACKUP_KEEP):
+    """Hapus snapshot lama, sisakan `keep` terbaru. Return jumlah yang dihapus."""
+    old = snapshots(db_path, dest_dir)[:-keep] if keep > 0 else []
+    for path in old:
+        os.remove(path)
+    return len(old)
+
+
+def snapshot(db_path=DB_FILE, dest_dir=BACKUP_DIR, keep=BACKUP_KEEP):
+    """Buat satu snapshot terkompresi. keep=None -> tanpa rotasi. Return path snapshot."""
+    os.makedirs(dest_dir, exist_ok=True)
+    started = time.time()
+    final = os.path.join(dest_dir, f"{_base(db_path)}-{time.strftime('%Y%m%d-%H%M%S')}.db.gz")
+    tmp_db = final[:-len(".db.gz")] + ".tmp.db"
+    try:
+        copy_online(db_path, tmp_db)
+        check(tmp_db)
+        with open(tmp_db, "rb") as src, gzip.open(final + ".tmp", "wb", compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+        os.replace(final + ".tmp", final)
+    finally:
+        for path in (tmp_db, final + ".tmp"):
+            if os.path.exists(path):
+                os.remove(path)
+    removed = rotate(db_path, dest_dir, keep) if keep is not None else 0
+    print(f"✅ Snapshot {final} ({os.path.getsize(final) / 1e6:.1f} MB, {time.time() - started:.1f} dtk"
+          + (f", {removed} snapshot lama dihapus)" if removed else ")"))
+    return final
+
+
+def restore(snapshot_path, db_path=DB_FILE):
+    """Kembalikan isi db_path dari snapshot .db.gz (DB sekarang di-snapshot dulu)."""
+    tmp = db_path + ".restore.tmp"
+    try:
+        with gzip.open(snapshot_path, "rb") as src, open(tmp, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+        check(tmp)
+        if os.path.exists(db_path):
+            print("Snapshot pengaman DB sekarang:")
+            snapshot(db_path, keep=None)
+        src = sqlite3.connect(tmp)
+        dst = sqlite3.connect(db_path, timeout=30)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+            src.close()
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    print(f"✅ {db_path} dipulihkan dari {snapshot_path}")
+
+
+# === JADWAL OTOMATIS ===
+def _due(db_path, interval):
+    snaps = snapshots(db_path)
+    return not snaps or time.time() - os.path.getmtime(snaps[-1]) >= interval
+
+
+def run_if_due(db_path, interval):
+    """Jalankan snapshot di subproses jika sudah waktunya dan tidak ada backup lain berjalan."""
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    with open(os.path.join(BACKUP_DIR, ".lock"), "w") as lock:
+        try:
+            import fcntl
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except ImportError:
+            pass   # Windows: tanpa flock (biasanya hanya satu proses verifier)
+        except BlockingIOError:
+            return False   # worker/proses lain sedang backup
+        if not _due(db_path, interval):
+            return False
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "snapshot", "--db", db_path],
+            check=True, preexec_fn=(lambda: os.nice(10)) if hasattr(os, "nice") else None,
+        )
+        return True
+
+
+def start_scheduler(db_path, interval=BACKUP_INTERVAL):
+    """Thread latar (sekali per proses) yang memicu snapshot tiap `interval` detik; 0 = mati."""
+    global _scheduler_pid
+    if interval <= 0 or _scheduler_pid == os.getpid():
+        return
+    with _lock:
+        if _scheduler_pid == os.getpid():
+            return
+        _scheduler_pid = os.getpid()
+
+    def run():
+        while True:
+            time.sleep(min(interval, 60))
+            try:
+                if _due(db_path, interval):
+                    run_if_due(db_path, interval)
+            except Exception as e:
+                print("⚠️ Backup terjadwal gagal:", e)
+
+    threading.Thread(target=run, name="backup-scheduler", daemon=True).start()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Backup online data.db")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("snapshot", help="buat snapshot sekarang")
+    p.add_argument("--db", default=DB_FILE)
+    p.add_argument("--keep", type=int, default=BACKUP_KEEP)
+    p = sub.add_parser("list", help="daftar snapshot")
+    p.add_argument("--db", default=DB_FILE)
+    p = sub.add_parser("restore", help="pulihkan DB dari snapshot")
+    p.add_argument("snapshot")
+    p.add_argument("--db", default=DB_FILE)
+    args = ap.parse_args()
+
+    if args.cmd == "snapshot":
+        import metrics
+        started = time.perf_counter()
+        snapshot(args.db, keep=args.keep)
+        metrics.observe("backup_seconds", time.perf_counter() - started)
+        try:
+            metrics.push()
+        except Exception as e:
+            print("⚠️ Gagal mengirim metrik backup:", e)
+    elif args.cmd == "list":
+        for path in snapshots(args.db):
+            print(f"{path}  {os.path.getsize(path) / 1e6:.1f} MB  "
+                  f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(os.path.getmtime(path)))}")
+    else:
+        restore(args.snapshot, args.db)
@@ -0,0 +1,161 @@
+# bench_verifier.py
+"""
+Bandingkan verify_app (Flask + gunicorn) dan verify_async (Quart + hypercorn)
+di bawah beban scan yang sama.
+
+Tiap putaran: mint token baru di data.db (acara BENCH_EVENT), jalankan server,
+lalu `--concurrency` gate virtual (koneksi keep-alive) mengirim total
+`--requests` POST /api/scan, masing-masing tiket berbeda. Dilaporkan:
+throughput, latensi p50/p95/p99/max, dan jumlah hasil per status.
+
+    python bench_verifier.py                              # keduanya, bergantian
+    python bench_verifier.py --only async --concurrency 200
+    python bench_verifier.py --url http://127.0.0.1:5000  # server yang sudah jalan
+
+Server dijalankan dengan konfigurasi produksinya masing-masing:
+gunicorn -c gunicorn.conf.py (WEB_CONCURRENCY x GUNICORN_THREADS) dan
+hypercorn satu proses.
+"""
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import argparse
+import subprocess
+from urllib.parse import urlsplit
+from urllib.request import urlopen
+
+BENCH_EVENT = "bench"
+SERVERS = {
+    "sync": ["gunicorn", "-c", "gunicorn.conf.py", "verify_app:app"],
+    "async": ["hypercorn", "verify_async:app", "--bind", "127.0.0.1:{port}"],
+}
+
+
+async def post_json(reader, writer, host, path, payload):
+    """Satu POST JSON di koneksi keep-alive. Return (kode HTTP, body bytes)."""
+    body = json.dumps(payload).encode()
+    writer.write(
+        f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("koneksi ditutup server")
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    data = await reader.readexactly(length)
+    parts = status_line.split()
+    return (parts[1].decode() if len(parts) > 1 else "?"), data
+
+
+async def _gate(host, port, path, tokens, latencies, outcomes):
+    """Satu gate: satu koneksi keep-alive, scan token satu per satu."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for token in tokens:
+            started = time.perf_counter()
+            code, data = await post_json(reader, writer, host, path,
+                                         {"token": token, "event": BENCH_EVENT, "gate": "bench"})
+            latencies.append(time.perf_counter() - started)
+            key = json.loads(data).get("status", code) if code == "200" else f"http {code}"
+            outcomes[key] = outcomes.get(key, 0) + 1
+    finally:
+        writer.close()
+
+
+async def run_load(url, tokens, concurrency):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    path = parts.path.rstrip("/") + "/api/scan"
+    latencies, outcomes = [], {}
+    shards = [tokens[i::concurrency] for i in range(concurrency)]
+    started = time.perf_counter()
+    await asyncio.gather(*[_gate(host, port, path, s, latencies, outcomes) for s in shards if s])
+    return time.perf_counter() - started, sorted(latencies), outcomes
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * p / 100), len(sorted_values) - 1)]
+
+
+def report(name, elapsed, latencies, outcomes):
+    ms = lambda s: f"{s * 1000:.1f}"
+    print(f"{name:6} {len(latencies) / elapsed:8.0f} req/s  p50 {ms(percentile(latencies, 50))} ms"
+          f"  p95 {ms(percentile(latencies, 95))} ms  p99 {ms(percentile(latencies, 99))} ms"
+          f"  max {ms(latencies[-1] if latencies else 0)} ms  {outcomes}")
+
+
+def mint_tokens(n):
+    from common import init_db
+    from mint import mint_codes
+    init_db()
+    return mint_codes(n, used_by="bench", event_id=BENCH_EVENT)
+
+
+def wait_ready(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urlopen(url + "/", timeout=2).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server {url} tidak siap dalam {timeout} detik")
+
+
+def start_server(kind, port):
+    env = dict(os.environ, PORT=str(port))
+    cmd = [c.format(port=port) for c in SERVERS[kind]]
+    return subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def stop_server(proc):
+    proc.send_signal(signal.SIGTERM)
+    try:
+        proc.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def bench(kind, url, requests, concurrency, warmup=200):
+    asyncio.run(run_load(url, mint_tokens(warmup), min(concurrency, warmup)))
+    tokens = mint_tokens(requests)
+    report(kind, *asyncio.run(run_load(url, tokens, concurrency)))
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark verifier sync vs async")
+    ap.add_argument("--requests", type=int, default=3000)
+    ap.add_argument("--concurrency", type=int, default=64, help="jumlah gate virtual (koneksi) bersamaan")
+    ap.add_argument("--only", choices=tuple(SERVERS), help="hanya satu varian")
+    ap.add_argument("--url", help="uji server yang sudah berjalan (tanpa start/stop)")
+    ap.add_argument("--port", type=int, default=8099)
+    args = ap.parse_args()
+
+    if args.url:
+        bench("server", args.url.rstrip("/"), args.requests, args.concurrency)
+        sys.exit(0)
+
+    print(f"{args.requests} scan, {args.concurrency} gate bersamaan "
+          f"(gunicorn: WEB_CONCURRENCY={os.environ.get('WEB_CONCURRENCY', '2')}, "
+          f"GUNICORN_THREADS={os.environ.get('GUNICORN_THREADS', '4')}; hypercorn: 1 proses)")
+    for kind in ([args.only] if args.only else list(SERVERS)):
+        proc = start_server(kind, args.port)
+        try:
+            url = f"http://127.0.0.1:{args.port}"
+            wait_ready(url)
+            bench(kind, url, args.requests, args.concurrency)
+        finally:
+            stop_server(proc)
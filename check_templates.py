@@ -1,4 +1,5 @@
 # check_templates.py
+# Cek yang sama dijalankan otomatis saat startup verify_app (verify_app.check_templates).
 import os
 basedir = os.path.dirname(os.path.abspath(__file__))
 tpl_dir = os.path.join(basedir, "templates")
@@ -10,5 +11,16 @@ if os.path.isdir(tpl_dir):
     print("Isi folder templates:")
     for f in sorted(os.listdir(tpl_dir)):
         print(" -", f)
+    from verify_app import check_templates
+    import assets
+    problems = check_templates()
+    if problems:
+        print("Template bermasalah:")
+        for name, msg in problems:
+            print(f" ✗ {name}: {msg}")
+    else:
+        print("Semua template berhasil dikompilasi.")
+    for rel in assets.missing_vendor():
+        print(f"Aset vendor belum ada: static/assets/{rel} (jalankan: python assets.py vendor)")
 else:
     print("Folder templates tidak ada di lokasi itu. Pastikan kamu menjalankan skrip dari folder proyek yang benar.")
@@ -1,97 +1,136 @@
 # common.py
+# library Google Sheets (gspread, oauth2client) di-import di dalam fungsi yang
+# memakainya, supaya verify_app & CLI lain tetap ringan saat start.
 import os
 import sqlite3
 from datetime import datetime
-from oauth2client.service_account import ServiceAccountCredentials
-import gspread
-import secrets
-from google.oauth2.service_account import Credentials
+import ticket_codec
+import metrics
 
 DB_FILE = "data.db"
 SPREADSHEET_NAME = "QR Code Database"
 SHEET_PESERTA = "Peserta"
 SHEET_CODES = "Codes"
 
-# initialize output folder
+# acara aktif untuk CLI/GUI/sync; verifier memilih acara per request (/e/<event_id>/...)
+DEFAULT_EVENT = os.environ.get("EVENT_ID", "default")
+
+# folder output gambar QR (dibuat saat file pertama ditulis, lihat ticket_store.py)
 QR_DIR = "output_qr"
-os.makedirs("output_qr", exist_ok=True)
-
-def init_db():
-    conn = sqlite3.connect(DB_FILE, detect_types=sqlite3.PARSE_DECLTYPES)
-    cur = conn.cursor()
-    # table participants mirror sheet Peserta
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS participants (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT,
-        email TEXT,
-        phone TEXT,
-        status TEXT,
-        code TEXT,
-        sent_at TEXT,
-        sheet_row INTEGER  -- optional mapping to sheet row index
-    )
-    """)
-    # codes table for verifier
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS codes (
-        code TEXT PRIMARY KEY,
-        valid INTEGER DEFAULT 1,
-        used INTEGER DEFAULT 0,
-        last_used TEXT,
-        used_by TEXT
+
+def init_db(db_file=None):
+    """Jalankan migrasi skema (migrations.py). Dipanggil sekali saat startup aplikasi/CLI."""
+    import migrations
+    conn = sqlite3.connect(db_file or DB_FILE)
+    try:
+        return migrations.migrate(conn)
+    finally:
+        conn.close()
+
+def ensure_event(conn, event_id, name=None):
+    """Daftarkan acara ke tabel events jika belum ada."""
+    conn.execute(
+        "INSERT OR IGNORE INTO events (event_id, name, created_at) VALUES (?,?,strftime('%s','now'))",
+        (event_id, name or event_id),
     )
-    """)
-    conn.commit()
-    conn.close()
+
+def local_text_to_epoch(text):
+    """'YYYY-MM-DD HH:MM:SS' (waktu lokal) -> detik epoch, atau None."""
+    if not text:
+        return None
+    try:
+        return int(datetime.strptime(str(text).strip(), "%Y-%m-%d %H:%M:%S").timestamp())
+    except ValueError:
+        return None
 
 def get_conn():
     return sqlite3.connect(DB_FILE, detect_types=sqlite3.PARSE_DECLTYPES)
 
 def get_sheet():
     # pastikan credentials.json adalah service account key JSON
+    import gspread
     creds_path = os.path.join(os.path.dirname(__file__), "credentials.json")
     if not os.path.exists(creds_path):
         raise FileNotFoundError("credentials.json (service account) tidak ditemukan.")
-    gc = gspread.service_account(filename=creds_path)
-    sh = gc.open(SPREADSHEET_NAME)
-    return sh.worksheet(SHEET_PESERTA)
+    with metrics.api_call("sheets", "open"):
+        gc = gspread.service_account(filename=creds_path)
+        sh = gc.open(SPREADSHEET_NAME)
+        return sh.worksheet(SHEET_PESERTA)
 
 # sheets client
 def get_sheets_client():
     if not os.path.exists("credentials.json"):
         raise FileNotFoundError("credentials.json not found (service account).")
+    from oauth2client.service_account import ServiceAccountCredentials
+    import gspread
     scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
     creds = ServiceAccountCredentials.from_json_keyfile_name('credentials.json', scope)
     client = gspread.authorize(creds)
     return client
 
 def open_worksheet(name):
-    client = get_sheets_client()
-    ss = client.open(SPREADSHEET_NAME)
-    return ss.worksheet(name)
+    with metrics.api_call("sheets", "open"):
+        client = get_sheets_client()
+        ss = client.open(SPREADSHEET_NAME)
+        return ss.worksheet(name)
 
 def generate_token(nbytes=12):
-    # urlsafe base token (length roughly 16-24 chars)
-    return secrets.token_urlsafe(nbytes).upper()
+    # format mengikuti TICKET_SCHEME (lihat ticket_codec.py)
+    return ticket_codec.new_token(nbytes)
+
+# kolom sheet Peserta -> kolom tabel participants
+PESERTA_COLUMNS = {
+    "Nama Peserta": "name",
+    "Email": "email",
+    "Nomor HP": "phone",
+    "Status": "status",
+    "Kode Unik": "code",
+    "Waktu Kirim": "sent_at",
+    "row": "sheet_row",
+}
+
+def participant_fields(record):
+    """
+    Satu baris Peserta dari Apps Script / webhook -> dict kolom participants.
+    Kunci boleh header sheet ("Nama Peserta", ...) atau nama kolom DB ("name", ...);
+    nilai list (e.namedValues Apps Script) diambil elemen pertamanya.
+    Kolom yang tidak dikirim tidak ada di dict.
+    """
+    fields = {}
+    for key, value in record.items():
+        col = PESERTA_COLUMNS.get(key, key)
+        if col not in PESERTA_COLUMNS.values():
+            continue
+        if isinstance(value, list):
+            value = value[0] if value else ""
+        if col == "sheet_row":
+            fields[col] = int(value) if str(value).strip() else None
+        else:
+            fields[col] = "" if value is None else str(value).strip()
+    if "status" in fields:
+        fields["status"] = fields["status"].upper()
+    return fields
 
 # Sync helpers (lightweight)
-def sync_from_sheets():
+def sync_from_sheets(event_id=None):
     """
-    Pull data from Sheets (Peserta and Codes) -> upsert into SQLite.
-    This is called at startup or manually.
+    Pull data from Sheets (Peserta and Codes) -> upsert into the database.
+    This is called at startup or manually. Rows go to `event_id` (default: EVENT_ID env).
+    Target DB mengikuti DATABASE_URL (lihat storage.py), default data.db lokal.
     """
-    init_db()
-    conn = get_conn()
-    cur = conn.cursor()
+    import gspread
+    from storage import get_storage
+    event_id = event_id or DEFAULT_EVENT
+    storage = get_storage(DB_FILE)
+    storage.init()
     try:
         ws = open_worksheet(SHEET_PESERTA)
     except Exception as e:
         print("Cannot open Peserta sheet:", e)
-        conn.close()
         return
 
-    records = ws.get_all_records()
+    with metrics.api_call("sheets", "get_all_records"):
+        records = ws.get_all_records()
     # helper aman: ambil value, ubah jadi str, lalu strip
     def safe(record, key):
         v = record.get(key, "")
@@ -100,6 +139,7 @@ def sync_from_sheets():
         return str(v).strip()
 
     # We'll map by email+name pair to upsert
+    people = []
     for idx, r in enumerate(records, start=2):
         try:
             name = safe(r, "Nama Peserta")
@@ -108,25 +148,20 @@ def sync_from_sheets():
             status = safe(r, "Status").upper()
             code = safe(r, "Kode Unik")
             sent_at = safe(r, "Waktu Kirim")
-            # upsert by email+name (simple heuristic)
-            cur.execute("SELECT id FROM participants WHERE email=? AND name=?", (email, name))
-            row = cur.fetchone()
-            if row:
-                cur.execute("""UPDATE participants SET phone=?, status=?, code=?, sent_at=?, sheet_row=? WHERE id=?""",
-                            (phone, status, code, sent_at, idx, row[0]))
-            else:
-                cur.execute("""INSERT INTO participants (name,email,phone,status,code,sent_at,sheet_row)
-                               VALUES (?,?,?,?,?,?,?)""",
-                            (name, email, phone, status, code, sent_at, idx))
+            people.append((name, email, phone, status, code, sent_at, idx))
         except Exception as e:
             # jangan crash keseluruhan; log dan lanjut
             print(f"⚠️ Error processing Peserta row {idx}: {e}")
             continue
+    # upsert by email+name (simple heuristic), satu transaksi
+    storage.sync_participants(event_id, people)
 
     # sync codes sheet
     try:
         ws_codes = open_worksheet(SHEET_CODES)
-        codes = ws_codes.get_all_records()
+        with metrics.api_call("sheets", "get_all_records"):
+            codes = ws_codes.get_all_records()
+        code_rows = []
         for r in codes:
             try:
                 # coba beberapa nama kolom yang mungkin berbeda
@@ -140,16 +175,18 @@ def sync_from_sheets():
                 used_by = r.get("UsedBy", "") or ""
                 valid = 1 if str(valid_raw).strip().upper() in ("TRUE", "1", "YES", "Y") else 0
                 used = 1 if str(used_raw).strip().upper() in ("TRUE", "1", "YES", "Y") else 0
-                cur.execute("INSERT OR REPLACE INTO codes (code, valid, used, last_used, used_by) VALUES (?,?,?,?,?)",
-                            (code, valid, used, last_used, used_by))
+                code_rows.append((code, valid, used, last_used, local_text_to_epoch(last_used), used_by))
             except Exception as e:
                 print(f"⚠️ Error processing Codes row: {e}")
                 continue
+        storage.sync_codes(event_id, code_rows)
     except gspread.exceptions.WorksheetNotFound:
         # no Codes sheet yet; ignore
         pass
-    conn.commit()
-    conn.close()
+    try:
+        metrics.push(storage)
+    except Exception as e:
+        print("Warn: metrics push failed:", e)
 
 
 def push_code_to_sheet(code, email):
@@ -157,6 +194,7 @@ def push_code_to_sheet(code, email):
     Append new code row to Codes sheet. If sheet not exist, create it.
     Also convenient to update Peserta row externally — we'll handle Peserta updates outside.
     """
+    import gspread
     try:
         ws_codes = open_worksheet(SHEET_CODES)
     except gspread.exceptions.WorksheetNotFound:
@@ -164,7 +202,8 @@ def push_code_to_sheet(code, email):
         ss = client.open(SPREADSHEET_NAME)
         ws_codes = ss.add_worksheet(title=SHEET_CODES, rows="1000", cols="5")
         ws_codes.update('A1:E1', [["Kode","Valid","Used","LastUsed","UsedBy"]])
-    ws_codes.append_row([code, "TRUE", "FALSE", "", email])
+    with metrics.api_call("sheets", "append_row"):
+        ws_codes.append_row([code, "TRUE", "FALSE", "", email])
 
 # common.py — ganti fungsi ini dengan versi yang lebih toleran
 def update_participant_sheet_row(sheet_row, code, sent_at, email=None, name=None):
@@ -181,14 +220,16 @@ def update_participant_sheet_row(sheet_row, code, sent_at, email=None, name=None
     def safe_update(cell_addr, value):
         """Pastikan update memakai list of lists."""
         try:
-            ws.update(cell_addr, [[value]])
+            with metrics.api_call("sheets", "update"):
+                ws.update(cell_addr, [[value]])
         except Exception as e:
             print(f"Warn: failed update {cell_addr} -> {value}: {e}")
 
     def safe_find(query):
         """Cari cell tanpa bergantung ke CellNotFound."""
         try:
-            return ws.find(query)
+            with metrics.api_call("sheets", "find"):
+                return ws.find(query)
         except Exception:
             return None
 
@@ -216,7 +257,3 @@ def update_participant_sheet_row(sheet_row, code, sent_at, email=None, name=None
 
     print("Warning: Could not update Peserta sheet row (no sheet_row, no email/name match).")
 
-
-
-# init DB on import
-init_db()
@@ -0,0 +1,498 @@
+# edge_sync.py
+"""
+Mode edge: server gate lokal di tiap pintu masuk dengan replika tabel codes.
+
+Peran (env, sama untuk verify_app dan verify_async):
+- hub  = server pusat: EDGE_TOKEN diisi, EDGE_HUB_URL kosong. Endpoint /api/edge/*
+  aktif dan setiap redeem di pusat ikut dicatat di edge_redemptions (feed).
+- edge = server di pintu: EDGE_HUB_URL + EDGE_TOKEN (+ EDGE_NODE_ID, default
+  hostname), DB = data.db lokal. Redeem terjadi di replika lokal (latensi LAN)
+  dan dicatat di edge_outbox dalam transaksi yang sama.
+
+Thread sinkron edge (satu per mesin, flock) tiap EDGE_SYNC_INTERVAL detik:
+1. kirim outbox per EDGE_BATCH ke hub. Hub menerapkan redeem dengan waktu scan
+   asli; tiket yang sudah dipakai di gate lain dalam jendela reuse = konflik
+   (double entry), dicatat di hub dan dilaporkan balik. Kiriman ulang (ack
+   hilang) dikenali dan tidak dihitung dua kali.
+2. tarik redeem gate lain (kursor feed_seq) -> tiket yang sudah masuk lewat pintu
+   lain langsung "used" di sini. feed_seq diberikan hub SESUDAH transaksi redeem
+   commit (urutan commit, bukan urutan id), jadi kiriman besar yang commit
+   belakangan tidak pernah terlewat kursor edge.
+3. tiap EDGE_RESYNC detik: daftar kode dari hub (tiket baru, valid/tidak);
+   status pakai lokal tidak ditimpa.
+Replika kosong di-bootstrap otomatis (salinan penuh codes). Kode yang tidak ada
+di replika (mis. tiket yang baru terbit) ditanyakan langsung ke hub dengan
+timeout singkat; saat link putus gate tetap jalan dengan replika, outbox
+menumpuk dan dikirim begitu link kembali.
+
+Jaminan sekali pakai: selama link hidup, tiket yang dipakai di satu pintu
+dikenal pintu lain dalam ~2x EDGE_SYNC_INTERVAL. Selama link putus, scan ganda
+di dua pintu masih mungkin, tetapi selalu terdeteksi saat outbox sampai di hub
+(/admin/edge.json, metrik edge_conflicts_total). Reset/hapus kode dilakukan di
+hub, lalu jalankan `python edge_sync.py bootstrap` di tiap edge.
+
+CLI (di mesin edge):
+    python edge_sync.py bootstrap   # kirim outbox, lalu salin ulang codes dari hub
+    python edge_sync.py once        # satu putaran sinkron
+    python edge_sync.py status
+"""
+import os
+import json
+import time
+import socket
+import argparse
+import threading
+from urllib.parse import urlencode
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import metrics
+from common import DB_FILE
+from storage import Storage, PostgresStorage
+
+HUB_URL = os.environ.get("EDGE_HUB_URL", "").rstrip("/")
+EDGE_TOKEN = os.environ.get("EDGE_TOKEN", "")
+ROLE = ("edge" if HUB_URL else "hub") if EDGE_TOKEN else None
+NODE_ID = os.environ.get("EDGE_NODE_ID") or ("central" if ROLE == "hub" else socket.gethostname())
+
+SYNC_INTERVAL = float(os.environ.get("EDGE_SYNC_INTERVAL", "1"))   # detik
+RESYNC_INTERVAL = int(os.environ.get("EDGE_RESYNC", "600"))        # detik; 0 = hanya saat bootstrap
+BATCH = int(os.environ.get("EDGE_BATCH", "500"))                   # redeem per kiriman/tarikan
+SNAPSHOT_PAGE = 5000       # kode per halaman bootstrap/resync
+MAX_ITEMS = 5000           # batas item per request di hub
+TIMEOUT = 10               # detik, request sinkron
+LOOKUP_TIMEOUT = 1.5       # detik, tanya hub saat scan kode yang tidak ada di replika
+LOOKUP_BACKOFF = 30        # detik tanpa lookup setelah hub tidak terjangkau
+FEED_LOCK = 720516         # kunci advisory Postgres untuk pemberian feed_seq
+
+OUTBOX_COLUMNS = ("seq", "event_id", "code", "ts", "last_used")
+LOOKUP_OUTCOMES = ("ok", "used", "invalid", "missing")
+
+_sync_pid = None
+_lock = threading.Lock()
+_lookup_blocked_until = 0.0
+
+
+# === REDEEM (hub & edge) ===
+def _log_redemption(conn, node, event_id, code, ts, last_used, outcome, first=(None, None)):
+    conn.execute(
+        """INSERT INTO edge_redemptions
+           (event_id, code, node, ts, last_used, outcome, first_node, first_at, received_at)
+           VALUES (?,?,?,?,?,?,?,?,?)""",
+        (event_id, code, node, ts, last_used, outcome, first[0], first[1], int(time.time())),
+    )
+
+
+def redeem_on(conn, event_id, code, now_ts, now_text, reuse_window):
+    """Storage.redeem_on + jejak replikasi: edge_outbox (edge) atau feed edge_redemptions (hub)."""
+    outcome = Storage.redeem_on(conn, event_id, code, now_ts, now_text, reuse_window)
+    if outcome == "ok":
+        if ROLE == "edge":
+            conn.execute(
+                "INSERT INTO edge_outbox (event_id, code, ts, last_used) VALUES (?,?,?,?)",
+                (event_id, code, now_ts, now_text),
+            )
+        elif ROLE == "hub":
+            _log_redemption(conn, NODE_ID, event_id, code, now_ts, now_text, "ok")
+    return outcome
+
+
+def redeem(storage, event_id, code, now_ts, now_text, reuse_window):
+    """Pengganti storage.redeem saat mode edge/hub aktif (dipanggil verify_code)."""
+    with storage.connection() as conn:
+        with conn:
+            outcome = redeem_on(conn, event_id, code, now_ts, now_text, reuse_window)
+    if outcome == "missing" and ROLE == "edge":
+        outcome = lookup_redeem(storage, event_id, code, now_ts, now_text)
+    return outcome
+
+
+# === HUB ===
+def apply_edge_redemption(conn, node, item, reuse_window):
+    """Terapkan satu redeem kiriman edge di hub. Return (outcome, first_node, first_at, baru)."""
+    event_id, code, ts = str(item["event_id"]), str(item["code"]), int(item["ts"])
+    last_used = item.get("last_used") or time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+    prev = conn.execute(
+        "SELECT outcome, first_node, first_at FROM edge_redemptions WHERE node=? AND event_id=? AND code=? AND ts=?",
+        (node, event_id, code, ts),
+    ).fetchone()
+    if prev:
+        return tuple(prev) + (False,)   # kiriman ulang: ack sebelumnya tidak sampai ke edge
+    outcome = Storage.redeem_on(conn, event_id, code, ts, last_used, reuse_window)
+    first = (None, None)
+    if outcome != "ok":
+        first = conn.execute(
+            "SELECT node, ts FROM edge_redemptions WHERE event_id=? AND code=? AND outcome='ok' ORDER BY id DESC LIMIT 1",
+            (event_id, code),
+        ).fetchone() or first
+    _log_redemption(conn, node, event_id, code, ts, last_used, outcome, tuple(first))
+    return (outcome,) + tuple(first) + (True,)
+
+
+def hub_push(storage, node, items, reuse_window):
+    """POST /api/edge/push: satu transaksi per kiriman. Return {"acked": [seq], "conflicts": [...]}."""
+    acked, conflicts, new_ok, new_conflicts = [], [], 0, 0
+    with storage.connection() as conn:
+        with conn:
+            for item in items:
+                outcome, first_node, first_at, is_new = apply_edge_redemption(conn, node, item, reuse_window)
+                acked.append(item["seq"])
+                if is_new:
+                    new_ok += outcome == "ok"
+                    new_conflicts += outcome != "ok"
+                if outcome != "ok":
+                    conflicts.append({
+                        "seq": item["seq"], "event_id": item["event_id"], "code": item["code"], "ts": item["ts"],
+                        "outcome": outcome, "first_node": first_node, "first_at": first_at,
+                    })
+    # kiriman ulang tidak dihitung dua kali
+    metrics.inc("edge_shipped_total", new_ok, node=node)
+    if new_conflicts:
+        metrics.inc("edge_conflicts_total", new_conflicts, node=node)
+        print(f"⚠️ {new_conflicts} redeem ganda/tidak dikenal dari gate {node}")
+    return {"acked": acked, "conflicts": conflicts}
+
+
+def assign_feed_seq(storage):
+    """
+    Beri feed_seq (naik terus) ke redeem sukses yang sudah commit tapi belum punya nomor.
+    id dialokasikan saat INSERT, jadi di Postgres kiriman 5000 baris bisa commit jauh
+    sesudah redeem ber-id lebih besar; feed_seq mengikuti urutan commit. Satu pemberi
+    nomor sekaligus (BEGIN IMMEDIATE / advisory lock), dan transaksinya commit sebelum
+    feed dibaca -> nomor yang terlihat edge tidak pernah disusul nomor yang lebih kecil.
+    """
+    with storage.connection() as conn:
+        pending = conn.execute(
+            "SELECT 1 FROM edge_redemptions WHERE feed_seq IS NULL AND outcome='ok' LIMIT 1"
+        ).fetchone()
+        if not pending:
+            return 0
+        with conn:
+            if isinstance(storage, PostgresStorage):
+                conn.execute("SELECT pg_advisory_xact_lock(?)", (FEED_LOCK,))
+            else:
+                conn.execute("BEGIN IMMEDIATE")
+            ids = [r[0] for r in conn.execute(
+                "SELECT id FROM edge_redemptions WHERE feed_seq IS NULL AND outcome='ok' ORDER BY id"
+            ).fetchall()]
+            head = conn.execute("SELECT COALESCE(MAX(feed_seq), 0) FROM edge_redemptions").fetchone()[0]
+            conn.executemany(
+                "UPDATE edge_redemptions SET feed_seq=? WHERE id=?",
+                [(head + n, row_id) for n, row_id in enumerate(ids, start=1)],
+            )
+    return len(ids)
+
+
+def hub_pull(storage, node, since, limit):
+    """GET /api/edge/pull: redeem sukses sesudah kursor feed_seq `since`, kecuali milik `node` sendiri."""
+    assign_feed_seq(storage)
+    with storage.connection() as conn:
+        rows = conn.execute(
+            """SELECT feed_seq, event_id, code, ts, last_used, node FROM edge_redemptions
+               WHERE feed_seq > ? ORDER BY feed_seq LIMIT ?""",
+            (since, limit),
+        ).fetchall()
+    items = [list(r[1:5]) for r in rows if r[5] != node]
+    return {"items": items, "cursor": rows[-1][0] if rows else since, "more": len(rows) == limit}
+
+
+def hub_codes(storage, after_event, after_code, limit):
+    """GET /api/edge/codes: daftar codes berurutan (event_id, code), untuk bootstrap/resync edge."""
+    assign_feed_seq(storage)
+    with storage.connection() as conn:
+        head = conn.execute("SELECT COALESCE(MAX(feed_seq), 0) FROM edge_redemptions").fetchone()[0]
+        rows = conn.execute(
+            """SELECT event_id, code, valid, used, last_used, last_used_at FROM codes
+               WHERE event_id > ? OR (event_id = ? AND code > ?)
+               ORDER BY event_id, code LIMIT ?""",
+            (after_event, after_event, after_code, limit),
+        ).fetchall()
+    return {"items": [list(r) for r in rows], "feed_head": head, "more": len(rows) == limit}
+
+
+def hub_redeem(storage, node, event_id, code, ts, last_used, reuse_window):
+    """POST /api/edge/redeem: redeem langsung di hub untuk kode yang tidak ada di replika edge."""
+    with storage.connection() as conn:
+        with conn:
+            outcome = Storage.redeem_on(conn, event_id, code, ts, last_used, reuse_window)
+            if outcome == "ok":
+                _log_redemption(conn, node, event_id, code, ts, last_used, "ok")
+            row = conn.execute(
+                "SELECT valid, used, last_used, last_used_at FROM codes WHERE event_id=? AND code=?", (event_id, code)
+            ).fetchone()
+    result = {"status": outcome}
+    if row:
+        result.update(zip(("valid", "used", "last_used", "last_used_at"), row))
+    return result
+
+
+def hub_status(storage, limit=100):
+    with storage.connection() as conn:
+        nodes = conn.execute(
+            """SELECT node, COUNT(*), SUM(CASE WHEN outcome='ok' THEN 0 ELSE 1 END), MAX(received_at)
+               FROM edge_redemptions GROUP BY node ORDER BY node"""
+        ).fetchall()
+        conflicts = conn.execute(
+            """SELECT event_id, code, node, ts, outcome, first_node, first_at FROM edge_redemptions
+               WHERE outcome <> 'ok' ORDER BY id DESC LIMIT ?""",
+            (limit,),
+        ).fetchall()
+    cols = ("event_id", "code", "node", "ts", "outcome", "first_node", "first_at")
+    return {
+        "role": "hub",
+        "nodes": [dict(zip(("node", "redemptions", "conflicts", "last_seen"), n)) for n in nodes],
+        "conflicts": [dict(zip(cols, c)) for c in conflicts],
+    }
+
+
+# === EDGE ===
+def _call(method, path, payload=None, params=None, timeout=TIMEOUT):
+    url = HUB_URL + path + ("?" + urlencode(params) if params else "")
+    req = Request(
+        url, data=json.dumps(payload).encode() if payload is not None else None, method=method,
+        headers={"Authorization": f"Bearer {EDGE_TOKEN}", "Content-Type": "application/json"},
+    )
+    with metrics.api_call("edge_hub", path.rsplit("/", 1)[-1]):
+        with urlopen(req, timeout=timeout) as resp:
+            return json.loads(resp.read())
+
+
+def _state(conn, key, default=None):
+    row = conn.execute("SELECT value FROM edge_state WHERE key=?", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def _set_state(conn, key, value):
+    conn.execute(
+        "INSERT INTO edge_state (key, value) VALUES (?,?) ON CONFLICT (key) DO UPDATE SET value=excluded.value",
+        (key, str(value)),
+    )
+
+
+def _upsert_codes(storage, conn, rows, replace):
+    """
+    rows: (event_id, code, valid, used, last_used, last_used_at) dari hub.
+    replace=False (resync): kode baru + kolom valid saja, status pakai lokal dipertahankan.
+    replace=True (bootstrap/lookup): status pakai ikut hub, kecuali kode yang redeem-nya masih di outbox.
+    """
+    for event_id in {r[0] for r in rows}:
+        storage.ensure_event(conn, event_id)
+    update = (
+        """valid=excluded.valid, used=excluded.used, last_used=excluded.last_used, last_used_at=excluded.last_used_at
+           WHERE NOT EXISTS (SELECT 1 FROM edge_outbox o WHERE o.event_id=codes.event_id AND o.code=codes.code)"""
+        if replace else "valid=excluded.valid"
+    )
+    conn.executemany(
+        f"""INSERT INTO codes (event_id, code, valid, used, last_used, last_used_at) VALUES (?,?,?,?,?,?)
+            ON CONFLICT (event_id, code) DO UPDATE SET {update}""",
+        [tuple(r) for r in rows],
+    )
+
+
+def lookup_redeem(storage, event_id, code, now_ts, now_text):
+    """Kode tidak ada di replika: redeem langsung di hub, hasilnya disimpan lokal. Hub putus -> "missing"."""
+    global _lookup_blocked_until
+    if time.time() < _lookup_blocked_until:
+        return "missing"
+    try:
+        res = _call("POST", "/api/edge/redeem",
+                    {"node": NODE_ID, "event_id": event_id, "code": code, "ts": now_ts, "last_used": now_text},
+                    timeout=LOOKUP_TIMEOUT)
+        status = res["status"]
+        if status not in LOOKUP_OUTCOMES:
+            raise ValueError(f"status {status!r}")
+        row = None if status == "missing" else (
+            event_id, code, res["valid"], res["used"], res["last_used"], res["last_used_at"])
+    except HTTPError as e:
+        _lookup_blocked_until = time.time() + LOOKUP_BACKOFF
+        if e.code in (401, 403):
+            print(f"⚠️ Hub menolak gate {NODE_ID} (HTTP {e.code}): EDGE_TOKEN di edge dan hub tidak sama")
+        else:
+            print(f"⚠️ Hub gagal menjawab cek kode baru (HTTP {e.code}); {LOOKUP_BACKOFF} detik memakai replika saja")
+        return "missing"
+    except OSError as e:
+        _lookup_blocked_until = time.time() + LOOKUP_BACKOFF
+        print(f"⚠️ Hub tidak terjangkau untuk cek kode baru ({e}); {LOOKUP_BACKOFF} detik memakai replika saja")
+        return "missing"
+    except (ValueError, KeyError, TypeError) as e:
+        print(f"⚠️ Jawaban hub untuk cek kode baru tidak valid ({e!r}); kode dianggap tidak ditemukan")
+        return "missing"
+    if row:
+        with storage.connection() as conn:
+            with conn:
+                _upsert_codes(storage, conn, [row], replace=True)
+    return status
+
+
+def ship(storage):
+    """Kirim outbox ke hub sampai kosong. Return jumlah redeem yang di-ack."""
+    shipped = 0
+    while True:
+        with storage.connection() as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(OUTBOX_COLUMNS)} FROM edge_outbox ORDER BY seq LIMIT ?", (BATCH,)
+            ).fetchall()
+        if not rows:
+            return shipped
+        res = _call("POST", "/api/edge/push", {"node": NODE_ID, "items": [dict(zip(OUTBOX_COLUMNS, r)) for r in rows]})
+        for c in res["conflicts"]:
+            first = (f", sudah dipakai di gate {c['first_node']} "
+                     f"{time.strftime('%H:%M:%S', time.localtime(c['first_at']))}") if c["first_node"] else ""
+            print(f"⚠️ Double entry: {c['code']} ({c['event_id']}) scan {time.strftime('%H:%M:%S', time.localtime(c['ts']))} "
+                  f"di {NODE_ID} -> hub: {c['outcome']}{first}")
+        with storage.connection() as conn:
+            with conn:
+                conn.executemany("DELETE FROM edge_outbox WHERE seq=?", [(seq,) for seq in res["acked"]])
+        shipped += len(res["acked"])
+        if len(rows) < BATCH:
+            return shipped
+
+
+def pull(storage):
+    """Terapkan redeem gate lain dari feed hub. Return jumlah redeem yang diterapkan."""
+    with storage.connection() as conn:
+        cursor = int(_state(conn, "pull_cursor", 0))
+    applied = 0
+    while True:
+        res = _call("GET", "/api/edge/pull", params={"node": NODE_ID, "since": cursor, "limit": BATCH})
+        with storage.connection() as conn:
+            with conn:
+                for event_id in {r[0] for r in res["items"]}:
+                    storage.ensure_event(conn, event_id)
+                # redeem terbaru menang; tiket yang belum ada di replika ikut dibuat
+                conn.executemany(
+                    """INSERT INTO codes (event_id, code, valid, used, last_used, last_used_at) VALUES (?,?,1,1,?,?)
+                       ON CONFLICT (event_id, code) DO UPDATE SET
+                           used=1, last_used=excluded.last_used, last_used_at=excluded.last_used_at
+                       WHERE codes.used=0 OR codes.last_used_at IS NULL OR codes.last_used_at < excluded.last_used_at""",
+                    [(e, c, text, ts) for e, c, ts, text in res["items"]],
+                )
+                cursor = res["cursor"]
+                _set_state(conn, "pull_cursor", cursor)
+        applied += len(res["items"])
+        if not res["more"]:
+            return applied
+
+
+def resync(storage, replace=False):
+    """Salin daftar codes dari hub (replace=True: bootstrap penuh + set kursor feed). Return jumlah kode."""
+    after, head, n = ("", ""), None, 0
+    while True:
+        res = _call("GET", "/api/edge/codes",
+                    params={"after_event": after[0], "after_code": after[1], "limit": SNAPSHOT_PAGE})
+        head = res["feed_head"] if head is None else head
+        if res["items"]:
+            with storage.connection() as conn:
+                with conn:
+                    _upsert_codes(storage, conn, res["items"], replace)
+            after = tuple(res["items"][-1][:2])
+        n += len(res["items"])
+        if not res["more"]:
+            break
+    with storage.connection() as conn:
+        with conn:
+            if replace:
+                _set_state(conn, "pull_cursor", head)   # redeem sesudah salinan ini datang lewat pull()
+            _set_state(conn, "last_resync", int(time.time()))
+    return n
+
+
+def bootstrap(storage):
+    shipped = ship(storage)
+    n = resync(storage, replace=True)
+    print(f"✅ Replika edge {NODE_ID}: {n} kode dari hub ({shipped} redeem lokal dikirim dulu)")
+    return n
+
+
+def sync_once(storage):
+    """Satu putaran: kirim outbox, (bootstrap), tarik feed, resync berkala."""
+    global _lookup_blocked_until
+    started = time.perf_counter()
+    ship(storage)
+    with storage.connection() as conn:
+        bootstrapped = _state(conn, "pull_cursor") is not None
+        last_resync = int(_state(conn, "last_resync", 0))
+    if not bootstrapped:
+        bootstrap(storage)
+    pull(storage)
+    if bootstrapped and RESYNC_INTERVAL and time.time() - last_resync >= RESYNC_INTERVAL:
+        resync(storage)
+    with storage.connection() as conn:
+        with conn:
+            _set_state(conn, "last_contact", int(time.time()))
+    _lookup_blocked_until = 0.0   # hub terjangkau lagi
+    metrics.observe("edge_sync_seconds", time.perf_counter() - started)
+
+
+def edge_status(storage):
+    with storage.connection() as conn:
+        pending, oldest = conn.execute("SELECT COUNT(*), MIN(ts) FROM edge_outbox").fetchone()
+        state = dict(conn.execute("SELECT key, value FROM edge_state").fetchall())
+    return {"role": "edge", "node": NODE_ID, "hub": HUB_URL, "outbox": pending, "oldest_unshipped": oldest, **state}
+
+
+def status(storage):
+    """Ringkasan untuk /admin/edge.json."""
+    if ROLE == "hub":
+        return hub_status(storage)
+    if ROLE == "edge":
+        return edge_status(storage)
+    return {"role": None}
+
+
+def start(storage):
+    """Thread sinkron edge (sekali per proses; hanya satu proses per mesin yang aktif, lewat flock)."""
+    global _sync_pid
+    if ROLE != "edge" or _sync_pid == os.getpid():
+        return
+    with _lock:
+        if _sync_pid == os.getpid():
+            return
+        _sync_pid = os.getpid()
+
+    def run():
+        lock = open(getattr(storage, "path", DB_FILE) + ".edge-sync.lock", "w")
+        try:
+            import fcntl
+        except ImportError:
+            fcntl = None   # Windows: tanpa flock (biasanya hanya satu proses verifier)
+        while fcntl:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                time.sleep(5)   # worker lain sedang menyinkronkan
+        failures = 0
+        while True:
+            try:
+                sync_once(storage)
+                if failures:
+                    print(f"✅ Hub {HUB_URL} terjangkau lagi")
+                failures = 0
+            except Exception as e:
+                if not failures:
+                    print(f"⚠️ Sinkron edge gagal ({e}); scan tetap jalan dengan replika lokal")
+                failures += 1
+            time.sleep(min(SYNC_INTERVAL * 2 ** min(failures, 5), 30))
+
+    threading.Thread(target=run, name="edge-sync", daemon=True).start()
+
+
+if __name__ == "__main__":
+    from storage import get_storage
+
+    ap = argparse.ArgumentParser(description="Sinkron gate edge dengan hub")
+    ap.add_argument("cmd", choices=("bootstrap", "once", "status"))
+    args = ap.parse_args()
+
+    storage = get_storage(DB_FILE)
+    storage.init()
+    if args.cmd == "status":
+        print(json.dumps(status(storage), indent=2))
+    elif ROLE != "edge":
+        raise SystemExit("Bukan mode edge: set EDGE_HUB_URL dan EDGE_TOKEN")
+    elif args.cmd == "bootstrap":
+        bootstrap(storage)
+    else:
+        sync_once(storage)
+        print(json.dumps(edge_status(storage), indent=2))
@@ -1,9 +1,13 @@
 # generate_qr_batch.py
 import os
+import sys
 import csv
-import secrets
-import qrcode
+import time
+import argparse
+import qr_render
+import ticket_codec
 from datetime import datetime
+from multiprocessing import Pool
 
 # Optional Google Sheets support:
 try:
@@ -15,7 +19,6 @@ except Exception:
 
 OUTPUT_DIR = "output_qr"
 CSV_FILE = "tickets.csv"      # local record of generated tokens
-URL_PREFIX = "https://bit.ly/thisisfullycustom?id="
 SPREADSHEET_NAME = "QR Code Database"
 SHEET_PESERTA = "Peserta"
 SHEET_CODES = "Codes"
@@ -23,13 +26,16 @@ SHEET_CODES = "Codes"
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 def generate_token(nbytes=16):
-    return secrets.token_urlsafe(nbytes).upper()
+    return ticket_codec.new_token(nbytes)
+
+def render_qr(token):
+    url = ticket_codec.qr_payload(token)
+    return url, qr_render.render(url)
 
 def make_qr(token):
-    url = f"{URL_PREFIX}{token}"
-    img = qrcode.make(url)
-    filename = os.path.join(OUTPUT_DIR, f"qr_{token}.png")
-    img.save(filename)
+    import ticket_store
+    url, data = render_qr(token)
+    filename = ticket_store.put(token, data)
     return filename, url
 
 def append_to_csv(token, filename):
@@ -58,7 +64,8 @@ def generate_from_sheet():
         email = str(r.get("Email","")).strip()
         name = str(r.get("Nama Peserta","")).strip()
         if status == "PAID" and (not code):
-            token = generate_token()
+            import mint
+            token = mint.mint_codes(1, nbytes=16, generator=generate_token, used_by=email)[0]
             fn, url = make_qr(token)
             append_to_csv(token, fn)
             # update Peserta (kol E) and Waktu Kirim (kol F)
@@ -81,11 +88,97 @@ def generate_from_sheet():
                 print("Warning: failed append to Codes sheet:", e)
             print(f"Generated for row {idx}: {name} <{email}> -> {token} ({fn})")
 
+# --- Parallel batch generation (--count N --workers K) ---
+def _render_worker(token):
+    # dijalankan di process pool; hanya render (CPU-bound), penyimpanan di proses utama
+    url, data = render_qr(token)
+    return token, url, data
+
+def _mint_unique_tokens(count, register_db=True):
+    if register_db:
+        # cek tabrakan + insert ke codes dalam satu transaksi
+        import mint
+        return mint.mint_codes(count, nbytes=16, generator=generate_token)
+    tokens = set()
+    while len(tokens) < count:
+        tokens.add(generate_token())
+    return list(tokens)
+
+def _progress(done, total, started):
+    elapsed = max(time.monotonic() - started, 1e-9)
+    rate = done / elapsed
+    width = 30
+    filled = int(width * done / total) if total else width
+    bar = "#" * filled + "-" * (width - filled)
+    sys.stderr.write(f"\r[{bar}] {done}/{total}  {rate:,.1f} QR/s")
+    if done == total:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
+
+def record_batch(rows):
+    """
+    Simpan satu blok hasil: gambar ke ticket_store (manifest satu transaksi)
+    dan CSV (sekali buka file). Token sudah terdaftar di codes saat minting.
+    """
+    if not rows:
+        return
+    from common import get_conn
+    import ticket_store
+    conn = get_conn()
+    locations = ticket_store.put_many(((token, data) for token, _, data in rows), conn=conn)
+    file_exists = os.path.exists(CSV_FILE)
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with open(CSV_FILE, "a", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        if not file_exists:
+            w.writerow(["Token","File","CreatedAt"])
+        w.writerows([token, locations[token], now] for token, _, _ in rows)
+    conn.close()
+
+def generate_batch(count, workers=None, chunksize=32, flush_every=1000, register_db=True):
+    """
+    Render `count` QR baru memakai process pool.
+    Hasil di-stream kembali berurutan (imap) dan dicatat per blok `flush_every`.
+    """
+    tokens = _mint_unique_tokens(count, register_db)
+    workers = workers or os.cpu_count() or 1
+    started = time.monotonic()
+    pending = []
+    done = 0
+    with Pool(processes=workers) as pool:
+        for result in pool.imap(_render_worker, tokens, chunksize=chunksize):
+            pending.append(result)
+            done += 1
+            if len(pending) >= flush_every:
+                record_batch(pending)
+                pending = []
+            if done % 50 == 0 or done == count:
+                _progress(done, count, started)
+    record_batch(pending)
+    elapsed = time.monotonic() - started
+    print(f"Generated {count} QR in {elapsed:.1f}s with {workers} workers ({count / max(elapsed, 1e-9):,.1f} QR/s)")
+    return tokens
+
 def generate_from_csv():
     # If you keep a CSV of participants (with headers), you can implement reading and generating similarly.
     print("CSV-mode generation: implement as needed (tickets.csv used to record created tokens).")
 
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Generate QR tickets")
+    ap.add_argument("--count", type=int, help="jumlah QR baru (mode batch paralel)")
+    ap.add_argument("--workers", type=int, default=None, help="jumlah proses (default: semua core)")
+    ap.add_argument("--chunksize", type=int, default=32, help="token per tugas yang dikirim ke worker")
+    ap.add_argument("--no-db", action="store_true", help="jangan daftarkan token ke tabel codes")
+    return ap.parse_args(argv)
+
 if __name__ == "__main__":
+    args = parse_args()
+    from common import init_db
+    init_db()
+    if args.count:
+        generate_batch(args.count, workers=args.workers, chunksize=args.chunksize,
+                       register_db=not args.no_db)
+        sys.exit(0)
     # choose path: sheet if credentials exist, else manual single generation demo
     if GS_AVAILABLE and os.path.exists("credentials.json"):
         print("Generating QR for PAID entries from Google Sheets...")
@@ -0,0 +1,31 @@
+# gunicorn.conf.py
+"""
+Konfigurasi gunicorn untuk verify_app.
+
+    gunicorn -c gunicorn.conf.py verify_app:app
+
+- preload_app: aplikasi di-import sekali di master lalu di-fork ke worker
+  (copy-on-write), jadi worker baru/restart langsung siap melayani.
+- Migrasi skema (verify_app.startup) dijalankan sekali di master, bukan di tiap worker.
+- Thread scan_events dan pool Postgres dibuat per worker setelah fork.
+- Thread latar (metrik, backup, worker tiket, sinkron edge) dimulai sekali per
+  worker di post_fork, bukan dari hook request.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+preload_app = True
+
+
+def on_starting(server):
+    import verify_app
+    verify_app.startup()
+    # jangan wariskan koneksi DB master ke worker hasil fork
+    verify_app.storage.close()
+
+
+def post_fork(server, worker):
+    import verify_app
+    verify_app.start_background()
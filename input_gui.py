@@ -1,27 +1,59 @@
-import gspread
-from tkinter import Tk, Label, Entry, Button, StringVar, ttk, messagebox, Frame, END
-from oauth2client.service_account import ServiceAccountCredentials
-
-SPREADSHEET_NAME = "QR Code Database"
-SHEET_NAME = "Peserta"
-
-# === Fungsi koneksi Google Sheets ===
-def get_sheet():
-    scope = [
-        'https://spreadsheets.google.com/feeds',
-        'https://www.googleapis.com/auth/drive'
-    ]
-    creds = ServiceAccountCredentials.from_json_keyfile_name('credentials.json', scope)
-    client = gspread.authorize(creds)
-    return client.open(SPREADSHEET_NAME).worksheet(SHEET_NAME)
+# input_gui.py
+"""
+Form input peserta untuk meja registrasi.
+
+Tabel dibaca dari cache lokal (tabel participants, acara EVENT_ID), bukan
+get_all_records() setiap kali:
+- Simpan: append_row ke sheet di thread latar; hanya baris baru itu yang ditulis
+  ke cache, lalu halaman yang sedang dilihat dimuat ulang dari cache (satu query
+  lokal). Tabel selalu = isi cache, jadi baris yang sudah ikut masuk lewat refresh
+  delta yang berjalan bersamaan tidak pernah tampil dua kali.
+- Tiap REFRESH_SECONDS: refresh delta, yaitu baca baris sheet setelah sheet_row
+  terakhir di cache (satu range read), bukan seluruh sheet.
+- "Sinkronkan Data" = sync penuh (common.sync_from_sheets) di latar, untuk
+  menangkap perubahan baris lama (status, kode, waktu kirim).
+- Treeview hanya berisi PAGE_SIZE baris (terbaru dulu) dengan tombol halaman,
+  jadi ribuan peserta tidak membuat tabel lambat.
+
+Semua panggilan Sheets berjalan di thread latar; hasilnya dikirim ke thread Tk
+lewat queue (Tk tidak thread-safe).
+"""
+import re
+import queue
+import threading
+from tkinter import Tk, Label, Entry, Button, ttk, messagebox, Frame, END
+
+from common import DB_FILE, DEFAULT_EVENT, SHEET_PESERTA, open_worksheet, sync_from_sheets
+from storage import get_storage
+import metrics
+
+PAGE_SIZE = 100
+REFRESH_SECONDS = 30
+SHEET_COLUMNS = 6   # A..F: Nama Peserta, Email, Nomor HP, Status, Kode Unik, Waktu Kirim
+
+
+def _row_tuple(values, sheet_row):
+    """Baris sheet (list nilai A..F) -> tuple untuk storage.sync_participants."""
+    values = [str(v).strip() for v in values] + [""] * (SHEET_COLUMNS - len(values))
+    name, email, phone, status, code, sent_at = values[:SHEET_COLUMNS]
+    return (name, email, phone, status.upper(), code, sent_at, sheet_row)
+
 
 # === GUI Utama ===
 class InputApp:
-    def __init__(self, root):
+    def __init__(self, root, event_id=DEFAULT_EVENT):
         self.root = root
         self.root.title("🧾 Input Data Peserta - QR Ticketing")
-        self.root.geometry("600x400")
-        self.sheet = get_sheet()
+        self.root.geometry("640x480")
+        self.event_id = event_id
+        self.storage = get_storage(DB_FILE)
+        self.storage.init()
+        self.page = 0
+        self.total = 0
+        self._sheet = None
+        self._sheet_lock = threading.Lock()
+        self._ui_queue = queue.Queue()
+        self._refreshing = False
 
         Label(root, text="Form Input Peserta", font=("Segoe UI", 16, "bold")).pack(pady=10)
 
@@ -56,20 +88,127 @@ class InputApp:
         self.tree.column("email", width=150)
         self.tree.column("hp", width=100)
         self.tree.column("status", width=80)
-        self.tree.pack(pady=10, fill="x")
+        self.tree.pack(pady=(10, 0), fill="x")
 
-        self.load_data()
+        # --- Pager + status ---
+        pager = Frame(root)
+        pager.pack(fill="x", pady=4)
+        Button(pager, text="◀", command=lambda: self.show_page(self.page - 1), width=3).pack(side="left", padx=4)
+        self.page_label = Label(pager, text="", font=("Segoe UI", 9))
+        self.page_label.pack(side="left")
+        Button(pager, text="▶", command=lambda: self.show_page(self.page + 1), width=3).pack(side="left", padx=4)
+        self.status_label = Label(pager, text="", font=("Segoe UI", 9), fg="#64748b")
+        self.status_label.pack(side="right", padx=6)
 
-    def load_data(self):
-        """Membaca data dari Google Sheets dan menampilkannya di tabel"""
+        # tampilkan cache lokal langsung, lalu ambil baris baru dari sheet di latar
+        self.show_page(0)
+        self.root.after(100, self._drain_ui_queue)
+        self.refresh_delta()
+
+    # === thread latar -> Tk ===
+    def _run_bg(self, fn, *args):
+        threading.Thread(target=fn, args=args, daemon=True).start()
+
+    def _ui(self, fn, *args):
+        """Jadwalkan fn(*args) di thread Tk (dipanggil dari thread latar)."""
+        self._ui_queue.put((fn, args))
+
+    def _drain_ui_queue(self):
         try:
-            for row in self.tree.get_children():
-                self.tree.delete(row)
-            data = self.sheet.get_all_records()
-            for row in data:
-                self.tree.insert("", END, values=(row["Nama Peserta"], row["Email"], row["Nomor HP"], row["Status"]))
+            while True:
+                fn, args = self._ui_queue.get_nowait()
+                fn(*args)
+        except queue.Empty:
+            pass
+        self.root.after(100, self._drain_ui_queue)
+
+    def _set_status(self, text):
+        self.status_label.config(text=text)
+
+    def get_sheet(self):
+        # satu koneksi Sheets dipakai ulang oleh semua thread latar
+        with self._sheet_lock:
+            if self._sheet is None:
+                self._sheet = open_worksheet(SHEET_PESERTA)
+            return self._sheet
+
+    # === cache lokal ===
+    def _count(self):
+        with self.storage.connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM participants WHERE event_id=?", (self.event_id,)).fetchone()[0]
+
+    def _last_sheet_row(self):
+        with self.storage.connection() as conn:
+            row = conn.execute("SELECT MAX(sheet_row) FROM participants WHERE event_id=?", (self.event_id,)).fetchone()
+        return row[0] or 1   # baris 1 = header
+
+    def show_page(self, page):
+        """Isi Treeview dengan satu halaman dari cache lokal (terbaru dulu)."""
+        self.total = self._count()
+        pages = max((self.total + PAGE_SIZE - 1) // PAGE_SIZE, 1)
+        self.page = min(max(page, 0), pages - 1)
+        with self.storage.connection() as conn:
+            rows = conn.execute(
+                """SELECT name, email, phone, status FROM participants WHERE event_id=?
+                   ORDER BY sheet_row DESC, id DESC LIMIT ? OFFSET ?""",
+                (self.event_id, PAGE_SIZE, self.page * PAGE_SIZE),
+            ).fetchall()
+        self.tree.delete(*self.tree.get_children())
+        for row in rows:
+            self.tree.insert("", END, values=row)
+        self._update_page_label()
+
+    def _update_page_label(self):
+        pages = max((self.total + PAGE_SIZE - 1) // PAGE_SIZE, 1)
+        self.page_label.config(text=f"Halaman {self.page + 1}/{pages} · {self.total} peserta")
+
+    # === sinkronisasi ===
+    def refresh_delta(self):
+        """Refresh delta sekarang, lalu jadwalkan ulang tiap REFRESH_SECONDS."""
+        self.refresh_delta_once()
+        self.root.after(REFRESH_SECONDS * 1000, self.refresh_delta)
+
+    def refresh_delta_once(self):
+        """Ambil hanya baris sheet setelah sheet_row terakhir di cache (di latar)."""
+        if not self._refreshing:
+            self._refreshing = True
+            self._run_bg(self._refresh_delta_job)
+
+    def _refresh_delta_job(self):
+        try:
+            start = self._last_sheet_row() + 1
+            ws = self.get_sheet()
+            with metrics.api_call("sheets", "get_range"):
+                values = ws.get(f"A{start}:F")
+            rows = [_row_tuple(v, start + i) for i, v in enumerate(values) if any(str(x).strip() for x in v)]
+            if rows:
+                self.storage.sync_participants(self.event_id, rows)
+                self._ui(self._after_delta, len(rows))
+            else:
+                self._ui(self._set_status, "✓ data terbaru")
         except Exception as e:
-            messagebox.showerror("Error", f"Gagal memuat data:\n{e}")
+            self._ui(self._set_status, f"⚠️ refresh gagal: {e}")
+        finally:
+            self._refreshing = False
+
+    def _after_delta(self, n):
+        self._set_status(f"+{n} baris dari Sheets")
+        self.show_page(self.page)
+
+    def load_data(self):
+        """Sync penuh dari Google Sheets (di latar), lalu muat ulang halaman dari cache"""
+        self._set_status("🔄 sinkronisasi penuh...")
+
+        def job():
+            try:
+                sync_from_sheets(self.event_id)
+                self._ui(self._set_status, "✅ sinkronisasi selesai")
+                self._ui(self.show_page, self.page)
+            except Exception as e:
+                self._ui(messagebox.showerror, "Error", f"Gagal memuat data:\n{e}")
+                self._ui(self._set_status, "")
+
+        self._run_bg(job)
 
     def save_data(self):
         """Menyimpan data baru ke Google Sheets"""
@@ -82,15 +221,41 @@ class InputApp:
             messagebox.showwarning("Input Kosong", "Harap isi semua data peserta!")
             return
 
-        try:
-            self.sheet.append_row([nama, email, hp, status, "", ""])
-            messagebox.showinfo("Berhasil", f"Data {nama} berhasil ditambahkan.")
-            self.nama.delete(0, END)
-            self.email.delete(0, END)
-            self.hp.delete(0, END)
-            self.load_data()
-        except Exception as e:
-            messagebox.showerror("Error", f"Gagal menyimpan data:\n{e}")
+        # form langsung dikosongkan supaya peserta berikutnya bisa diketik selagi menyimpan
+        self.nama.delete(0, END)
+        self.email.delete(0, END)
+        self.hp.delete(0, END)
+        self.nama.focus_set()
+        self._set_status(f"💾 menyimpan {nama}...")
+
+        def job():
+            values = [nama, email, hp, status, "", ""]
+            try:
+                ws = self.get_sheet()
+                with metrics.api_call("sheets", "append_row"):
+                    resp = ws.append_row(values)
+            except Exception as e:
+                self._ui(self._save_failed, nama, email, hp, e)
+                return
+            # updatedRange mis. "Peserta!A124:F124" -> nomor baris untuk cache
+            m = re.search(r"![A-Z]+(\d+)", (resp or {}).get("updates", {}).get("updatedRange", ""))
+            if m:
+                self.storage.sync_participants(self.event_id, [_row_tuple(values, int(m.group(1)))])
+                self._ui(self.show_page, self.page)
+                self._ui(self._set_status, f"✅ {nama} tersimpan")
+            else:
+                self._ui(self.refresh_delta_once)
+
+        self._run_bg(job)
+
+    def _save_failed(self, nama, email, hp, e):
+        # kembalikan isian supaya tidak perlu diketik ulang
+        if not self.nama.get():
+            self.nama.insert(0, nama)
+            self.email.insert(0, email)
+            self.hp.insert(0, hp)
+        self._set_status("")
+        messagebox.showerror("Error", f"Gagal menyimpan data:\n{e}")
 
 # === MAIN ===
 if __name__ == "__main__":
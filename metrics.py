@@ -0,0 +1,214 @@
+# metrics.py
+"""
+Metrik ringan (counter + histogram) gaya Prometheus, tanpa dependensi tambahan.
+
+- inc()/observe()/timed()/api_call() hanya menambah angka di dict per proses
+  (satu lock, tanpa I/O) -> murah dipanggil di jalur scan.
+- Thread latar per proses menulis delta ke tabel metric_series (lewat storage.py)
+  tiap FLUSH_INTERVAL detik, dijumlahkan dengan UPSERT. Jadi semua worker
+  gunicorn (dan replika yang berbagi Postgres) teragregasi di satu tempat.
+- GET /metrics di verify_app merender isi tabel dalam format teks Prometheus.
+- Proses lain (GUI kirim tiket, sync Sheets) memanggil push(): kirim delta ke
+  METRICS_PUSH_URL (POST /metrics/push di verifier, token METRICS_PUSH_TOKEN),
+  atau langsung ke DB lokal jika URL tidak diset.
+
+Histogram disimpan per bucket (non-kumulatif) + _sum + _count; kumulatif
+dihitung saat render.
+"""
+import os
+import json
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", "5"))
+PUSH_URL = os.environ.get("METRICS_PUSH_URL", "")        # mis. https://tiket.example.com/metrics/push
+PUSH_TOKEN = os.environ.get("METRICS_PUSH_TOKEN", "")
+
+HELP = {
+    "http_request_duration_seconds": "Latensi request HTTP per route",
+    "verify_db_seconds": "Waktu DB untuk redeem tiket (verify_code)",
+    "template_render_seconds": "Waktu render template Jinja",
+    "scan_log_write_seconds": "Waktu menulis scan_log.txt",
+    "external_api_seconds": "Latensi panggilan API eksternal (Sheets, Gmail)",
+    "external_api_errors_total": "Jumlah error panggilan API eksternal",
+    "scans_total": "Jumlah scan per hasil",
+    "participant_search_seconds": "Waktu query pencarian peserta (help desk)",
+    "backup_seconds": "Durasi snapshot data.db (backup.py)",
+    "ingest_rows_total": "Jumlah baris peserta yang diterima endpoint ingest",
+    "tickets_issued_total": "Jumlah tiket dari antrean ingest per hasil",
+    "ticket_issue_seconds": "Waktu kirim satu tiket dari antrean (QR + Gmail + Sheets)",
+    "edge_sync_seconds": "Durasi satu putaran sinkron gate edge dengan hub",
+    "edge_shipped_total": "Jumlah redeem edge yang diterima hub",
+    "edge_conflicts_total": "Jumlah redeem ganda (double entry) antar gate yang terdeteksi hub",
+}
+
+_lock = threading.Lock()
+_pending = {}   # (name, labels, bucket) -> delta
+_flusher = None
+_flusher_pid = None
+
+
+def _labels(labels):
+    def esc(v):
+        return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return ",".join(f'{k}="{esc(v)}"' for k, v in sorted(labels.items()) if v is not None)
+
+
+def inc(name, value=1, **labels):
+    key = (name, _labels(labels), "")
+    with _lock:
+        _pending[key] = _pending.get(key, 0) + value
+
+
+def observe(name, seconds, **labels):
+    lab = _labels(labels)
+    bucket = next((f"{b:g}" for b in BUCKETS if seconds <= b), "+Inf")
+    with _lock:
+        for key, delta in (((name, lab, bucket), 1), ((name, lab, "sum"), seconds), ((name, lab, "count"), 1)):
+            _pending[key] = _pending.get(key, 0) + delta
+
+
+@contextmanager
+def timed(name, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def _error_code(e):
+    # gspread.APIError -> .response.status_code ; googleapiclient HttpError -> .resp.status
+    resp = getattr(e, "response", None)
+    code = getattr(resp, "status_code", None)
+    if code is None:
+        code = getattr(getattr(e, "resp", None), "status", None)
+    return code
+
+
+@contextmanager
+def api_call(api, op):
+    """Ukur satu panggilan API eksternal; error dihitung per tipe/kode HTTP (429 = kuota habis)."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        inc("external_api_errors_total", api=api, op=op, error=type(e).__name__, code=_error_code(e))
+        raise
+    finally:
+        observe("external_api_seconds", time.perf_counter() - started, api=api, op=op)
+
+
+def drain():
+    """Ambil & kosongkan delta yang belum ditulis: list (name, labels, bucket, value)."""
+    global _pending
+    with _lock:
+        items, _pending = _pending, {}
+    return [k + (v,) for k, v in items.items()]
+
+
+def write_rows(conn, rows):
+    if not rows:
+        return
+    with conn:
+        conn.executemany(
+            """
+            INSERT INTO metric_series (name, labels, bucket, value) VALUES (?,?,?,?)
+            ON CONFLICT (name, labels, bucket) DO UPDATE SET value = metric_series.value + excluded.value
+            """,
+            rows,
+        )
+
+
+def flush(storage):
+    rows = drain()
+    if rows:
+        with storage.connection() as conn:
+            write_rows(conn, rows)
+
+
+def start_flusher(storage):
+    """Thread flush latar, satu per proses (dibuat ulang setelah fork)."""
+    global _flusher, _flusher_pid
+    if _flusher is not None and _flusher_pid == os.getpid():
+        return
+
+    def run():
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            try:
+                flush(storage)
+            except Exception as e:
+                print("⚠️ Gagal menulis metrik:", e)
+
+    with _lock:
+        if _flusher is None or _flusher_pid != os.getpid():
+            _flusher_pid = os.getpid()
+            _flusher = threading.Thread(target=run, name="metrics-flush", daemon=True)
+            _flusher.start()
+            atexit.register(flush, storage)
+
+
+def push(storage=None, url=None, token=None):
+    """Kirim delta proses ini ke verifier (METRICS_PUSH_URL) atau ke DB lokal. Return jumlah baris."""
+    url = url or PUSH_URL
+    rows = drain()
+    if not rows:
+        return 0
+    if url:
+        from urllib.request import Request, urlopen
+        req = Request(url, data=json.dumps(rows).encode("utf-8"), method="POST",
+                      headers={"Content-Type": "application/json", "Authorization": f"Bearer {token or PUSH_TOKEN}"})
+        urlopen(req, timeout=10).close()
+    else:
+        if storage is None:
+            from storage import get_storage
+            storage = get_storage()
+        with storage.connection() as conn:
+            write_rows(conn, rows)
+    return len(rows)
+
+
+def parse_push(payload):
+    """Validasi body POST /metrics/push -> rows."""
+    rows = []
+    for item in payload:
+        name, labels, bucket, value = item
+        if not isinstance(name, str) or not isinstance(labels, str) or not isinstance(bucket, str):
+            raise ValueError("format metrik tidak valid")
+        rows.append((name, labels, bucket, float(value)))
+    return rows
+
+
+def render_text(conn):
+    """Format eksposisi teks Prometheus dari metric_series."""
+    series = {}
+    for name, labels, bucket, value in conn.execute(
+        "SELECT name, labels, bucket, value FROM metric_series ORDER BY name, labels"
+    ):
+        series.setdefault(name, {}).setdefault(labels, {})[bucket] = value
+
+    def fmt(v):
+        return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+    out = []
+    for name, by_labels in series.items():
+        is_hist = any("count" in b for b in by_labels.values())
+        out.append(f"# HELP {name} {HELP.get(name, name)}")
+        out.append(f"# TYPE {name} {'histogram' if is_hist else 'counter'}")
+        for labels, buckets in by_labels.items():
+            if not is_hist:
+                out.append(f"{name}{{{labels}}} {fmt(buckets.get('', 0))}" if labels else f"{name} {fmt(buckets.get('', 0))}")
+                continue
+            sep = "," if labels else ""
+            cumulative = 0
+            for b in [f"{x:g}" for x in BUCKETS] + ["+Inf"]:
+                cumulative += buckets.get(b, 0)
+                out.append(f'{name}_bucket{{{labels}{sep}le="{b}"}} {fmt(cumulative)}')
+            lab = f"{{{labels}}}" if labels else ""
+            out.append(f"{name}_sum{lab} {fmt(buckets.get('sum', 0))}")
+            out.append(f"{name}_count{lab} {fmt(buckets.get('count', 0))}")
+    return "\n".join(out) + "\n"
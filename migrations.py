@@ -0,0 +1,381 @@
+# migrations.py
+"""
+Migrasi skema SQLite berversi.
+
+Setiap migrasi = (versi, nama, fungsi(cur)). Versi yang sudah diterapkan
+dicatat di tabel schema_migrations, jadi migrate() aman dipanggil berkali-kali
+dan dari beberapa proses sekaligus (tiap langkah di dalam BEGIN IMMEDIATE).
+
+Dipanggil sekali saat startup lewat common.init_db().
+Tambah migrasi baru di akhir MIGRATIONS; jangan ubah migrasi yang sudah rilis.
+
+Butuh SQLite >= 3.35 (RETURNING di storage.py; ON CONFLICT upsert butuh 3.24):
+migrate() menolak jalan di versi yang lebih tua dengan pesan jelas, bukan gagal
+di tengah query. Pencarian FTS5 trigram (v8, SQLite >= 3.34 dengan FTS5) opsional:
+tanpa itu v8 dilewati dan help desk memakai pencarian LIKE biasa.
+"""
+import time
+import sqlite3
+
+SQLITE_MIN_VERSION = (3, 35, 0)
+
+
+def _v1_baseline(cur):
+    # skema awal (dulu dibuat oleh common.init_db pada setiap import)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS participants (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT,
+        email TEXT,
+        phone TEXT,
+        status TEXT,
+        code TEXT,
+        sent_at TEXT,
+        sheet_row INTEGER  -- optional mapping to sheet row index
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS codes (
+        code TEXT PRIMARY KEY,
+        valid INTEGER DEFAULT 1,
+        used INTEGER DEFAULT 0,
+        last_used TEXT,
+        used_by TEXT
+    )
+    """)
+    # token cadangan yang sudah dicek unik, belum terdaftar di codes (lihat mint.py)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS token_pool (
+        code TEXT PRIMARY KEY,
+        minted_at TEXT
+    )
+    """)
+    # manifest gambar tiket (lihat ticket_store.py)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS ticket_files (
+        code TEXT PRIMARY KEY,
+        backend TEXT,
+        location TEXT,
+        size INTEGER,
+        created_at TEXT
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS ticket_blobs (
+        code TEXT PRIMARY KEY,
+        data BLOB
+    )
+    """)
+
+
+def _v2_epoch_timestamps(cur):
+    # last_used (TEXT, waktu lokal) tetap diisi untuk tampilan/Sheets;
+    # last_used_at (detik epoch UTC) dipakai untuk semua perbandingan waktu.
+    cols = [r[1] for r in cur.execute("PRAGMA table_info(codes)")]
+    if "last_used_at" not in cols:
+        cur.execute("ALTER TABLE codes ADD COLUMN last_used_at INTEGER")
+    cur.execute("""
+    UPDATE codes
+    SET last_used_at = CAST(strftime('%s', last_used, 'utc') AS INTEGER)
+    WHERE last_used IS NOT NULL AND last_used != '' AND last_used_at IS NULL
+    """)
+
+
+def _v3_indexes(cur):
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_participants_email_name ON participants(email, name)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_participants_code ON participants(code)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_participants_sheet_row ON participants(sheet_row)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_codes_used_last_used_at ON codes(used, last_used_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_codes_valid ON codes(valid)")
+
+
+def _v4_scan_events(cur):
+    # satu baris per percobaan scan (append-only); ts = detik epoch UTC (float)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS scan_events (
+        id INTEGER PRIMARY KEY,
+        ts REAL NOT NULL,
+        code TEXT,
+        outcome TEXT,
+        gate TEXT,
+        device TEXT,
+        latency_ms REAL
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_scan_events_ts ON scan_events(ts)")
+    # rollup per bucket waktu (bucket_size detik: 300 = 5 menit, 3600 = 1 jam)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS scan_rollup (
+        bucket_size INTEGER NOT NULL,
+        bucket_start INTEGER NOT NULL,
+        gate TEXT NOT NULL,
+        outcome TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        latency_sum REAL NOT NULL DEFAULT 0,
+        latency_max REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (bucket_size, bucket_start, gate, outcome)
+    ) WITHOUT ROWID
+    """)
+
+
+def _v5_events(cur):
+    # partisi per acara: semua tabel tiket diberi event_id ('default' untuk data lama)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS events (
+        event_id TEXT PRIMARY KEY,
+        name TEXT,
+        created_at INTEGER
+    )
+    """)
+    cur.execute("INSERT OR IGNORE INTO events (event_id, name, created_at) VALUES ('default', 'Default', strftime('%s','now'))")
+
+    # codes: primary key (event_id, code) -> satu lookup index per scan per acara
+    cur.execute("""
+    CREATE TABLE codes_new (
+        event_id TEXT NOT NULL DEFAULT 'default',
+        code TEXT NOT NULL,
+        valid INTEGER DEFAULT 1,
+        used INTEGER DEFAULT 0,
+        last_used TEXT,
+        used_by TEXT,
+        last_used_at INTEGER,
+        PRIMARY KEY (event_id, code)
+    )
+    """)
+    cur.execute("""
+    INSERT INTO codes_new (event_id, code, valid, used, last_used, used_by, last_used_at)
+    SELECT 'default', code, valid, used, last_used, used_by, last_used_at FROM codes
+    """)
+    cur.execute("DROP TABLE codes")
+    cur.execute("ALTER TABLE codes_new RENAME TO codes")
+    cur.execute("CREATE INDEX idx_codes_event_used_last_used_at ON codes(event_id, used, last_used_at)")
+    cur.execute("CREATE INDEX idx_codes_event_valid ON codes(event_id, valid)")
+    # cek tabrakan token lintas acara (mint.py)
+    cur.execute("CREATE INDEX idx_codes_code ON codes(code)")
+
+    cur.execute("ALTER TABLE participants ADD COLUMN event_id TEXT NOT NULL DEFAULT 'default'")
+    cur.execute("DROP INDEX IF EXISTS idx_participants_email_name")
+    cur.execute("DROP INDEX IF EXISTS idx_participants_sheet_row")
+    cur.execute("CREATE INDEX idx_participants_event_email_name ON participants(event_id, email, name)")
+    cur.execute("CREATE INDEX idx_participants_event_sheet_row ON participants(event_id, sheet_row)")
+
+    cur.execute("ALTER TABLE scan_events ADD COLUMN event_id TEXT NOT NULL DEFAULT 'default'")
+    cur.execute("DROP TABLE scan_rollup")
+    cur.execute("""
+    CREATE TABLE scan_rollup (
+        event_id TEXT NOT NULL,
+        bucket_size INTEGER NOT NULL,
+        bucket_start INTEGER NOT NULL,
+        gate TEXT NOT NULL,
+        outcome TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        latency_sum REAL NOT NULL DEFAULT 0,
+        latency_max REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (event_id, bucket_size, bucket_start, gate, outcome)
+    ) WITHOUT ROWID
+    """)
+    # bangun ulang rollup dari event yang sudah ada
+    for size in (300, 3600):
+        cur.execute(f"""
+        INSERT INTO scan_rollup (event_id, bucket_size, bucket_start, gate, outcome, count, latency_sum, latency_max)
+        SELECT event_id, {size}, CAST(ts / {size} AS INTEGER) * {size}, COALESCE(gate, ''), COALESCE(outcome, ''),
+               COUNT(*), COALESCE(SUM(latency_ms), 0), COALESCE(MAX(latency_ms), 0)
+        FROM scan_events
+        GROUP BY 1, 3, 4, 5
+        """)
+
+
+def _v6_admin_jobs(cur):
+    # job pemeliharaan admin (reset/hapus) yang berjalan bertahap di latar (admin_jobs.py);
+    # status di DB supaya progres & pembatalan terlihat dari worker mana pun
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS admin_jobs (
+        id INTEGER PRIMARY KEY,
+        kind TEXT NOT NULL,
+        event_id TEXT NOT NULL,
+        params TEXT,
+        status TEXT NOT NULL,
+        done INTEGER NOT NULL DEFAULT 0,
+        total INTEGER NOT NULL DEFAULT 0,
+        cancel_requested INTEGER NOT NULL DEFAULT 0,
+        error TEXT,
+        created_at INTEGER,
+        updated_at INTEGER
+    )
+    """)
+
+
+def _v7_metrics(cur):
+    # metrik teragregasi dari semua proses (metrics.py); bucket '' = counter,
+    # 'sum'/'count'/batas le = histogram
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS metric_series (
+        name TEXT NOT NULL,
+        labels TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        value REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (name, labels, bucket)
+    ) WITHOUT ROWID
+    """)
+
+
+def _v8_participant_search(cur):
+    # indeks full-text untuk pencarian help desk (storage.search_participants).
+    # external content: teks tetap di participants, FTS hanya menyimpan indeks;
+    # trigram -> cocok sebagian kata ("budi", "gmail", "3456"), tanpa peka huruf besar/kecil
+    try:
+        cur.execute("""
+        CREATE VIRTUAL TABLE participants_fts USING fts5(
+            name, email, phone, code,
+            content='participants', content_rowid='id', tokenize='trigram'
+        )
+        """)
+    except sqlite3.OperationalError as e:
+        # SQLite tanpa FTS5 / tokenizer trigram: pencarian jatuh ke LIKE (SqliteStorage.search_participants)
+        print(f"⚠️ FTS5 trigram tidak tersedia (SQLite {sqlite3.sqlite_version}): {e}; pencarian peserta memakai LIKE")
+        return
+    # trigger menjaga indeks tetap sinkron, siapa pun penulisnya (sync Sheets, GUI, CLI)
+    cur.execute("""
+    CREATE TRIGGER participants_fts_ai AFTER INSERT ON participants BEGIN
+        INSERT INTO participants_fts (rowid, name, email, phone, code)
+        VALUES (new.id, new.name, new.email, new.phone, new.code);
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER participants_fts_ad AFTER DELETE ON participants BEGIN
+        INSERT INTO participants_fts (participants_fts, rowid, name, email, phone, code)
+        VALUES ('delete', old.id, old.name, old.email, old.phone, old.code);
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER participants_fts_au AFTER UPDATE OF name, email, phone, code ON participants BEGIN
+        INSERT INTO participants_fts (participants_fts, rowid, name, email, phone, code)
+        VALUES ('delete', old.id, old.name, old.email, old.phone, old.code);
+        INSERT INTO participants_fts (rowid, name, email, phone, code)
+        VALUES (new.id, new.name, new.email, new.phone, new.code);
+    END
+    """)
+    cur.execute("INSERT INTO participants_fts (participants_fts) VALUES ('rebuild')")
+
+
+def _v9_ticket_queue(cur):
+    # antrean kirim tiket (ticket_issue.py): diisi endpoint ingest saat peserta jadi PAID,
+    # dikerjakan worker di proses mana pun; satu baris per peserta
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS ticket_queue (
+        id INTEGER PRIMARY KEY,
+        event_id TEXT NOT NULL,
+        participant_id INTEGER NOT NULL UNIQUE,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_at INTEGER NOT NULL DEFAULT 0,
+        error TEXT,
+        created_at INTEGER,
+        updated_at INTEGER
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_ticket_queue_status_next_at ON ticket_queue(status, next_at)")
+
+
+def _v10_edge(cur):
+    # replikasi gate edge (edge_sync.py).
+    # hub: semua redeem (langsung + kiriman edge); yang sukses + feed_seq = feed untuk edge lain;
+    # outcome != 'ok' = konflik (tiket sudah dipakai di gate lain / tidak dikenal hub)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS edge_redemptions (
+        id INTEGER PRIMARY KEY,
+        event_id TEXT NOT NULL,
+        code TEXT NOT NULL,
+        node TEXT NOT NULL,
+        ts INTEGER NOT NULL,
+        last_used TEXT,
+        outcome TEXT NOT NULL,
+        first_node TEXT,
+        first_at INTEGER,
+        received_at INTEGER NOT NULL,
+        feed_seq INTEGER,
+        UNIQUE (node, event_id, code, ts)
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_edge_redemptions_event_code ON edge_redemptions(event_id, code)")
+    # feed_seq: urutan commit untuk kursor pull edge (diisi edge_sync.assign_feed_seq)
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_edge_redemptions_feed_seq ON edge_redemptions(feed_seq)")
+    # edge: redeem lokal yang belum diterima hub, dan status sinkron (kursor feed, dll.)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS edge_outbox (
+        seq INTEGER PRIMARY KEY,
+        event_id TEXT NOT NULL,
+        code TEXT NOT NULL,
+        ts INTEGER NOT NULL,
+        last_used TEXT
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_edge_outbox_event_code ON edge_outbox(event_id, code)")
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS edge_state (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )
+    """)
+
+
+MIGRATIONS = [
+    (1, "baseline", _v1_baseline),
+    (2, "epoch timestamps", _v2_epoch_timestamps),
+    (3, "indexes", _v3_indexes),
+    (4, "scan events + rollups", _v4_scan_events),
+    (5, "multi-event partitioning", _v5_events),
+    (6, "admin jobs", _v6_admin_jobs),
+    (7, "metrics", _v7_metrics),
+    (8, "participant search", _v8_participant_search),
+    (9, "ticket queue", _v9_ticket_queue),
+    (10, "edge replication", _v10_edge),
+]
+
+
+def applied_versions(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name TEXT,
+        applied_at INTEGER
+    )
+    """)
+    return {r[0] for r in conn.execute("SELECT version FROM schema_migrations")}
+
+
+def migrate(conn):
+    """Terapkan semua migrasi yang belum tercatat. Return daftar versi yang baru diterapkan."""
+    if sqlite3.sqlite_version_info < SQLITE_MIN_VERSION:
+        raise RuntimeError(
+            f"SQLite {sqlite3.sqlite_version} terlalu tua; butuh >= {'.'.join(map(str, SQLITE_MIN_VERSION))}"
+            " (RETURNING). Perbarui Python/libsqlite3 atau pakai DATABASE_URL Postgres."
+        )
+    old_isolation = conn.isolation_level
+    conn.isolation_level = None   # transaksi dikontrol manual
+    applied = []
+    try:
+        done = applied_versions(conn)
+        for version, name, fn in MIGRATIONS:
+            if version in done:
+                continue
+            cur = conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                # cek ulang di dalam lock: proses lain mungkin baru saja menerapkannya
+                if cur.execute("SELECT 1 FROM schema_migrations WHERE version=?", (version,)).fetchone():
+                    cur.execute("COMMIT")
+                    continue
+                fn(cur)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, name, applied_at) VALUES (?,?,?)",
+                    (version, name, int(time.time())),
+                )
+                cur.execute("COMMIT")
+                applied.append(version)
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+    finally:
+        conn.isolation_level = old_isolation
+    return applied
@@ -0,0 +1,165 @@
+# mint.py
+"""
+Layanan pembuatan (minting) token tiket secara massal.
+
+- mint_codes(n): buat n token unik, cek tabrakan terhadap codes + token_pool
+  dengan operasi set, lalu masukkan ke tabel codes dalam SATU transaksi.
+  Cek dan INSERT ada di transaksi yang sama; INSERT memakai ON CONFLICT DO
+  NOTHING, token yang kalah balapan dengan minter lain langsung diganti.
+- token_pool: cadangan token yang sudah dicek unik tetapi belum terdaftar
+  di codes. Jalur kirim tiket mengambil satu (claim_token), memasangnya ke
+  peserta dan mendaftarkannya ke codes dalam satu transaksi; email gagal ->
+  pemanggil membatalkan keduanya.
+
+CLI:
+    python mint.py codes 10000        # langsung ke tabel codes
+    python mint.py pool --target 2000 # isi ulang pool sampai 2000 token
+"""
+import argparse
+from datetime import datetime
+
+from common import get_conn, generate_token, init_db, ensure_event, DEFAULT_EVENT
+
+POOL_TARGET = 500
+SQL_CHUNK = 500   # jumlah parameter per query IN (...) ; batas SQLite 999
+
+
+def _present(conn, table, items):
+    """Return subset `items` yang ada di kolom code tabel `table`."""
+    found = set()
+    items = list(items)
+    for i in range(0, len(items), SQL_CHUNK):
+        chunk = items[i:i + SQL_CHUNK]
+        marks = ",".join("?" * len(chunk))
+        found.update(r[0] for r in conn.execute(f"SELECT code FROM {table} WHERE code IN ({marks})", chunk))
+    return found
+
+
+def _existing(conn, candidates):
+    """Return subset `candidates` yang sudah ada di codes (acara mana pun) atau token_pool."""
+    return _present(conn, "codes", candidates) | _present(conn, "token_pool", candidates)
+
+
+def _unique_batch(conn, n, generator, nbytes):
+    fresh = set()
+    while len(fresh) < n:
+        candidates = set()
+        while len(candidates) < n - len(fresh):
+            candidates.add(generator(nbytes))
+        candidates -= fresh
+        candidates -= _existing(conn, candidates)
+        fresh |= candidates
+    return list(fresh)
+
+
+def _insert_fresh(conn, n, generator, nbytes, table, sql, params):
+    """
+    INSERT n token baru per batch dengan executemany (sql ber-ON CONFLICT DO NOTHING).
+    Batch yang sebagian bentrok dengan minter lain dibatalkan ke savepoint, token yang
+    kini sudah ada di `table` dibuang, sisanya disisipkan ulang; kekurangannya diganti.
+    """
+    inserted = []
+    while len(inserted) < n:
+        batch = _unique_batch(conn, n - len(inserted), generator, nbytes)
+        while batch:
+            conn.execute("SAVEPOINT mint_batch")
+            if conn.executemany(sql, [params(t) for t in batch]).rowcount == len(batch):
+                inserted += batch
+                break
+            conn.execute("ROLLBACK TO SAVEPOINT mint_batch")
+            taken = _present(conn, table, batch)
+            batch = [t for t in batch if t not in taken]
+    return inserted
+
+
+def mint_codes(n, conn=None, nbytes=12, generator=generate_token, used_by=None, event_id=None):
+    """Buat n token baru dan daftarkan ke tabel codes (acara `event_id`) dalam satu transaksi."""
+    event_id = event_id or DEFAULT_EVENT
+    own_conn = conn is None
+    conn = conn or get_conn()
+    with conn:
+        ensure_event(conn, event_id)
+        tokens = _insert_fresh(
+            conn, n, generator, nbytes, "codes",
+            "INSERT INTO codes (event_id, code, valid, used, used_by) VALUES (?,?,1,0,?) ON CONFLICT DO NOTHING",
+            lambda t: (event_id, t, used_by),
+        )
+    if own_conn:
+        conn.close()
+    return tokens
+
+
+def refill_pool(target=POOL_TARGET, conn=None, nbytes=12, generator=generate_token):
+    """Isi token_pool sampai `target` token. Return jumlah token yang ditambahkan."""
+    own_conn = conn is None
+    conn = conn or get_conn()
+    have = conn.execute("SELECT COUNT(*) FROM token_pool").fetchone()[0]
+    need = max(target - have, 0)
+    if need:
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with conn:
+            _insert_fresh(
+                conn, need, generator, nbytes, "token_pool",
+                "INSERT INTO token_pool (code, minted_at) VALUES (?,?) ON CONFLICT DO NOTHING",
+                lambda t: (t, now),
+            )
+    if own_conn:
+        conn.close()
+    return need
+
+
+def claim_token(conn=None, participant_id=None, event_id=None):
+    """
+    Ambil satu token dari pool (dihapus dari pool secara atomik).
+    participant_id: dalam transaksi yang sama token dipasang ke participants.code
+    (hanya jika masih kosong); peserta sudah punya kode -> None dan token tetap di pool.
+    event_id: token sekaligus didaftarkan ke codes (valid, belum dipakai) di transaksi
+    yang sama, jadi kode yang sudah dipasang ke peserta selalu dikenali gate.
+    """
+    own_conn = conn is None
+    conn = conn or get_conn()
+    try:
+        for _ in range(5):
+            row = conn.execute("SELECT code FROM token_pool LIMIT 1").fetchone()
+            if not row:
+                refill_pool(conn=conn)
+                continue
+            with conn:
+                cur = conn.execute("DELETE FROM token_pool WHERE code=?", (row[0],))
+                # rowcount 0 -> proses lain sudah mengambil token ini lebih dulu
+                if cur.rowcount != 1:
+                    continue
+                if participant_id is not None and conn.execute(
+                    "UPDATE participants SET code=? WHERE id=? AND COALESCE(code, '')=''", (row[0], participant_id)
+                ).rowcount != 1:
+                    conn.rollback()   # sudah dikirim GUI/worker lain: token kembali ke pool
+                    return None
+                if event_id is not None:
+                    conn.execute(
+                        "INSERT INTO codes (event_id, code, valid, used) VALUES (?,?,1,0) ON CONFLICT (event_id, code) DO NOTHING",
+                        (event_id, row[0]),
+                    )
+                return row[0]
+        raise RuntimeError("Gagal mengambil token dari token_pool")
+    finally:
+        if own_conn:
+            conn.close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Mint token tiket massal")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("codes", help="mint langsung ke tabel codes")
+    c.add_argument("count", type=int)
+    c.add_argument("--event", default=DEFAULT_EVENT, help="id acara (default: env EVENT_ID)")
+    p = sub.add_parser("pool", help="isi ulang token_pool")
+    p.add_argument("--target", type=int, default=POOL_TARGET)
+    args = ap.parse_args()
+
+    init_db()
+    if args.cmd == "codes":
+        tokens = mint_codes(args.count, event_id=args.event)
+        print(f"Minted {len(tokens)} kode ke tabel codes (acara {args.event}).")
+    else:
+        added = refill_pool(args.target)
+        print(f"Pool diisi {added} token (target {args.target}).")
@@ -0,0 +1,148 @@
+# print_sheets.py
+"""
+Cetak banyak tiket QR ke satu PDF multi-halaman (untuk peserta walk-in/offline).
+
+- Data nama + kode dibaca dari tabel participants dengan cursor (streaming).
+- Halaman dirender paralel di process pool, per jendela kecil, lalu langsung
+  ditulis ke file oleh qr_render.PdfWriter -> memori tetap datar berapa pun jumlahnya.
+- QR digambar sebagai vektor, jadi tajam di printer apa pun.
+
+Contoh:
+    python print_sheets.py -o badges.pdf --status PAID --cols 3 --rows 4 --workers 4
+"""
+import os
+import sys
+import time
+import argparse
+from itertools import islice
+from multiprocessing import Pool
+
+import qr_render
+import ticket_codec
+from common import get_conn, init_db, DEFAULT_EVENT
+
+A4 = (595.28, 841.89)   # pt
+MARGIN = 28.0           # pt
+NAME_SIZE = 10.0
+CODE_SIZE = 8.0
+
+
+def _pdf_text(s, max_chars):
+    """Escape teks untuk string literal PDF (WinAnsi); potong jika terlalu panjang."""
+    s = (s or "").strip()
+    if len(s) > max_chars:
+        s = s[:max_chars - 1] + "…"
+    raw = s.encode("cp1252", errors="replace").decode("latin-1")
+    return raw.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _text_op(text, x_center, y, size, max_chars):
+    # lebar rata-rata Helvetica ~0.5 em per karakter; cukup untuk memusatkan teks pendek
+    t = _pdf_text(text, max_chars)
+    x = x_center - len(t) * size * 0.25
+    return f"BT /F1 {size:.1f} Tf {x:.2f} {y:.2f} Td ({t}) Tj ET"
+
+
+def render_page(args):
+    """Render satu halaman (dijalankan di worker). Return objek stream PDF terkompresi."""
+    tickets, cols, rows, page_size = args
+    page_w, page_h = page_size
+    cell_w = (page_w - 2 * MARGIN) / cols
+    cell_h = (page_h - 2 * MARGIN) / rows
+    qr_size = min(cell_w, cell_h - (NAME_SIZE + CODE_SIZE + 10)) * 0.9
+    max_chars = max(int(cell_w / (NAME_SIZE * 0.5)), 8)
+
+    ops = []
+    for i, (name, code) in enumerate(tickets):
+        col, row = i % cols, i // cols
+        x0 = MARGIN + col * cell_w
+        y_top = page_h - MARGIN - row * cell_h
+        cx = x0 + cell_w / 2
+        # garis potong tipis
+        ops.append(f"0.8 G 0.5 w {x0:.2f} {y_top - cell_h:.2f} {cell_w:.2f} {cell_h:.2f} re S 0 G")
+        qr_y = y_top - 6 - qr_size
+        matrix = qr_render.qr_matrix(ticket_codec.qr_payload(code))
+        ops.append(qr_render.pdf_qr_ops(matrix, cx - qr_size / 2, qr_y, qr_size))
+        ops.append(_text_op(name, cx, qr_y - NAME_SIZE - 2, NAME_SIZE, max_chars))
+        ops.append(_text_op(code, cx, qr_y - NAME_SIZE - CODE_SIZE - 6, CODE_SIZE, max_chars * 2))
+    return qr_render.pdf_stream_object("\n".join(ops).encode("latin-1"))
+
+
+def iter_tickets(conn, status="PAID", codes_file=None, event_id=None):
+    """Yield (name, code) dari participants satu acara, tanpa memuat semua baris ke memori."""
+    event_id = event_id or DEFAULT_EVENT
+    if codes_file:
+        with open(codes_file, encoding="utf-8") as f:
+            for line in f:
+                code = line.strip()
+                if not code:
+                    continue
+                row = conn.execute(
+                    "SELECT name FROM participants WHERE event_id=? AND code=?", (event_id, code)
+                ).fetchone()
+                yield (row[0] if row else ""), code
+        return
+    sql = "SELECT name, code FROM participants WHERE event_id=? AND code IS NOT NULL AND code != ''"
+    params = (event_id,)
+    if status:
+        sql += " AND UPPER(status)=?"
+        params += (status.upper(),)
+    sql += " ORDER BY sheet_row, id"
+    for name, code in conn.execute(sql, params):
+        yield name, code
+
+
+def _pages(tickets, per_page):
+    it = iter(tickets)
+    while True:
+        page = list(islice(it, per_page))
+        if not page:
+            return
+        yield page
+
+
+def write_sheets(tickets, out, cols=3, rows=4, workers=None, window=None, page_size=A4):
+    """
+    Tulis PDF ke file-like `out`. Halaman dikirim ke pool per jendela (`window` halaman)
+    sehingga hanya sedikit halaman yang berada di memori pada satu waktu.
+    """
+    workers = workers or os.cpu_count() or 1
+    window = window or workers * 4
+    writer = qr_render.PdfWriter(out, page_size)
+    pages = _pages(tickets, cols * rows)
+    started = time.monotonic()
+    done = 0
+    with Pool(processes=workers) as pool:
+        while True:
+            batch = [(page, cols, rows, page_size) for page in islice(pages, window)]
+            if not batch:
+                break
+            for stream in pool.imap(render_page, batch):
+                writer.add_page(stream, compressed=True)
+                done += 1
+            rate = done / max(time.monotonic() - started, 1e-9)
+            sys.stderr.write(f"\r{done} halaman  {rate:,.1f} halaman/s")
+            sys.stderr.flush()
+    writer.close()
+    sys.stderr.write("\n")
+    return done
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Cetak tiket QR ke PDF multi-halaman")
+    ap.add_argument("-o", "--output", required=True, help="file PDF tujuan")
+    ap.add_argument("--status", default="PAID", help="filter participants.status ('' = semua)")
+    ap.add_argument("--codes-file", help="file berisi satu code per baris")
+    ap.add_argument("--cols", type=int, default=3)
+    ap.add_argument("--rows", type=int, default=4)
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--event", default=DEFAULT_EVENT, help="id acara (default: env EVENT_ID)")
+    args = ap.parse_args()
+
+    init_db()
+    conn = get_conn()
+    tickets = iter_tickets(conn, status=args.status, codes_file=args.codes_file, event_id=args.event)
+    with open(args.output, "wb") as f:
+        n = write_sheets(tickets, f, cols=args.cols, rows=args.rows, workers=args.workers)
+    conn.close()
+    print(f"Selesai: {n} halaman -> {args.output}")
@@ -0,0 +1,120 @@
+# profiler.py
+"""
+Profiler request opt-in untuk verify_app (PROFILE_REQUESTS=1).
+
+- Setiap request dipecah ke fase: db, render, log (+ sisa = "other").
+  Pencatatan fase hanya perf_counter per blok -> overhead sangat kecil.
+- Request yang lebih lambat dari PROFILE_SLOW_MS disimpan dengan rincian fasenya.
+- Sebagian kecil request (PROFILE_SAMPLE_RATE) dijalankan di bawah cProfile;
+  fungsi teratas (cumulative) ikut disimpan. Hanya satu request ter-profile
+  pada satu waktu per proses, supaya overhead tetap terbatas.
+- PROFILE_KEEP trace paling lambat disimpan di memori proses (per worker),
+  ditampilkan di /admin/profiler.
+"""
+import os
+import time
+import heapq
+import random
+import pstats
+import cProfile
+import threading
+from contextlib import contextmanager
+
+ENABLED = os.environ.get("PROFILE_REQUESTS", "0") == "1"
+SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0.01"))
+SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", "250"))
+KEEP = int(os.environ.get("PROFILE_KEEP", "20"))
+TOP_FUNCS = 15
+
+_local = threading.local()
+_lock = threading.Lock()
+_cprofile_lock = threading.Lock()
+_slowest = []   # min-heap (total_ms, seq, trace) -> KEEP trace paling lambat
+_seq = 0
+
+
+def begin(method, path):
+    """Mulai trace untuk request di thread ini."""
+    if not ENABLED:
+        return
+    trace = {"method": method, "path": path, "started": time.time(), "t0": time.perf_counter(),
+             "phases": {}, "prof": None}
+    if SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE and _cprofile_lock.acquire(blocking=False):
+        trace["prof"] = cProfile.Profile()
+        trace["prof"].enable()
+    _local.trace = trace
+
+
+def add(name, seconds):
+    trace = getattr(_local, "trace", None)
+    if trace is not None:
+        trace["phases"][name] = trace["phases"].get(name, 0.0) + seconds
+
+
+@contextmanager
+def phase(name):
+    if getattr(_local, "trace", None) is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(name, time.perf_counter() - started)
+
+
+def _top_functions(prof):
+    stats = pstats.Stats(prof)
+    rows = sorted(stats.stats.items(), key=lambda kv: kv[1][3], reverse=True)[:TOP_FUNCS]
+    out = []
+    for (filename, line, func), (cc, nc, tt, ct, _callers) in rows:
+        out.append({
+            "func": f"{os.path.basename(filename)}:{line}({func})",
+            "calls": nc,
+            "tottime_ms": tt * 1000,
+            "cumtime_ms": ct * 1000,
+        })
+    return out
+
+
+def end(status=None):
+    """Selesaikan trace; simpan jika lambat atau ter-sample."""
+    global _seq
+    trace = getattr(_local, "trace", None)
+    if trace is None:
+        return
+    _local.trace = None
+    total_ms = (time.perf_counter() - trace.pop("t0")) * 1000
+    prof = trace.pop("prof")
+    if prof is not None:
+        prof.disable()
+        _cprofile_lock.release()
+    if prof is None and total_ms < SLOW_MS:
+        return
+    phases = {k: v * 1000 for k, v in trace["phases"].items()}
+    phases["other"] = max(total_ms - sum(phases.values()), 0.0)
+    trace.update(status=status, total_ms=total_ms, phases=phases, pid=os.getpid(),
+                 sampled=prof is not None, top=_top_functions(prof) if prof is not None else [])
+    with _lock:
+        _seq += 1
+        item = (total_ms, _seq, trace)
+        if len(_slowest) < KEEP:
+            heapq.heappush(_slowest, item)
+        elif total_ms > _slowest[0][0]:
+            heapq.heapreplace(_slowest, item)
+
+
+def traces():
+    """Trace tersimpan, paling lambat dulu."""
+    with _lock:
+        items = sorted(_slowest, reverse=True)
+    return [t for _, _, t in items]
+
+
+def clear():
+    with _lock:
+        _slowest.clear()
+
+
+def settings():
+    return {"enabled": ENABLED, "sample_rate": SAMPLE_RATE, "slow_ms": SLOW_MS, "keep": KEEP, "pid": os.getpid()}
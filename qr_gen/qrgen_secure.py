@@ -2,72 +2,65 @@
 """
 QR Code Generator (Secure Version)
 ----------------------------------
-- Membuat token acak aman (base64-url).
-- Menyimpan hasil QR di folder 'output_qr'.
-- Mencatat semua kode dan waktu pembuatan di 'tickets.csv'.
+- Membuat token acak aman (ticket_codec: skema TICKET_SCHEME, bertanda tangan jika TICKET_SIGN aktif).
+- Menyimpan hasil QR lewat ticket_store (output_qr/ ter-shard + manifest).
+- Mendaftarkan kode ke tabel codes (mint.py) dan mencatatnya di 'tickets.csv'.
 - Opsional: bisa otomatis mengisi Google Sheets.
 """
 
 import os
+import sys
 import csv
-import secrets
-import qrcode
 from datetime import datetime
 from pathlib import Path
 
+# qr_render.py / ticket_store.py / mint.py ada di folder proyek (satu level di atas qr_gen/)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import qr_render
+import ticket_store
+import ticket_codec
+import mint
+from common import init_db
+
 # === Konfigurasi dasar ===
-URL_PREFIX = "https://bit.ly/thisisfullycustom?id="
-OUTPUT_DIR = Path("output_qr")
 CSV_FILE = Path("tickets.csv")
 
-# === Setup direktori ===
-OUTPUT_DIR.mkdir(exist_ok=True)
-
 def generate_secure_token(length: int = 24) -> str:
-    """Generate token acak aman (URL-safe)."""
-    return secrets.token_urlsafe(length)
+    """Generate token acak aman lewat ticket_codec (TICKET_SCHEME + tanda tangan TICKET_SIGN)."""
+    return ticket_codec.new_token(length)
 
 def make_qr_image(token: str) -> str:
-    """Membuat QR code dari token dan menyimpannya sebagai file PNG."""
-    url = f"{URL_PREFIX}{token}"
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(url)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
-    
-    filename = OUTPUT_DIR / f"qr_{token[:8]}.png"
-    img.save(filename)
-    return str(filename)
+    """Membuat QR code dari token dan menyimpannya ke ticket_store; return lokasi."""
+    url = ticket_codec.qr_payload(token)
+    data = qr_render.render(url, scale=10, border=4, ec="L")
+    return ticket_store.put(token, data)
 
-def append_to_csv(token: str, filename: str):
-    """Mencatat token & file ke CSV dan (opsional) ke Google Sheets."""
+def append_to_csv(rows):
+    """Mencatat banyak (token, file) ke CSV dengan sekali buka file."""
     file_exists = CSV_FILE.exists()
+    now = datetime.now().isoformat(sep=" ", timespec="seconds")
     with open(CSV_FILE, "a", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
         if not file_exists:
             writer.writerow(["Token", "File", "CreatedAt"])
-        writer.writerow([token, filename, datetime.now().isoformat(sep=" ", timespec="seconds")])
-
-    # opsional: kirim otomatis ke Google Sheets
-try:
-    from oauth2client.service_account import ServiceAccountCredentials
-    import gspread
-    scope = ['https://spreadsheets.google.com/feeds','https://www.googleapis.com/auth/drive']
-    creds = ServiceAccountCredentials.from_json_keyfile_name('credentials.json', scope)
-    client = gspread.authorize(creds)
-    sheet = client.open('QR Code Database').worksheet('Codes')
-    sheet.append_row([token, ''])
-except Exception as e:
-    print("⚠️ Gagal sync ke Google Sheets:", e)
+        writer.writerows([token, filename, now] for token, filename in rows)
 
+def push_to_sheet(tokens):
+    """Opsional: tambahkan semua token ke sheet Codes dalam satu request."""
+    try:
+        from oauth2client.service_account import ServiceAccountCredentials
+        import gspread
+        scope = ['https://spreadsheets.google.com/feeds','https://www.googleapis.com/auth/drive']
+        creds = ServiceAccountCredentials.from_json_keyfile_name('credentials.json', scope)
+        client = gspread.authorize(creds)
+        sheet = client.open('QR Code Database').worksheet('Codes')
+        sheet.append_rows([[token, "TRUE", "FALSE", "", ""] for token in tokens])
+    except Exception as e:
+        print("⚠️ Gagal sync ke Google Sheets:", e)
 
 
 def main():
+    init_db()
     print("=== Secure QR Generator ===")
     print("Ketik jumlah QR yang ingin dibuat atau 'exit' untuk keluar.\n")
 
@@ -82,11 +75,15 @@ def main():
             continue
 
         count = int(cmd)
-        for i in range(1, count + 1):
-            token = generate_secure_token()
+        # satu transaksi: token unik langsung terdaftar di tabel codes
+        tokens = mint.mint_codes(count, nbytes=24, generator=generate_secure_token)
+        rows = []
+        for i, token in enumerate(tokens, start=1):
             filename = make_qr_image(token)
-            append_to_csv(token, filename)
+            rows.append((token, filename))
             print(f"[{i}/{count}] ✅ QR dibuat: {filename}")
+        append_to_csv(rows)
+        push_to_sheet(tokens)
         print(f"\n✨ {count} QR Code berhasil dibuat!\n")
 
 if __name__ == "__main__":
@@ -0,0 +1,232 @@
+# qr_render.py
+"""
+Renderer QR ringan.
+
+Matriks modul QR dibangun sekali (qrcode.QRCode.get_matrix) lalu ditulis
+langsung ke format tujuan:
+- PNG 1-bit (hitam/putih) dengan skala piksel per modul yang bisa diatur
+- SVG vektor (satu <path>, run horizontal digabung)
+- PDF vektor (satu halaman, persegi per run)
+
+Dipakai oleh generate_qr_batch, qrgen_secure dan send_ticket_gui
+menggantikan image factory default qrcode (PIL penuh, PNG tanpa optimize).
+
+Benchmark terhadap jalur lama:
+    python qr_render.py --bench 300
+"""
+import io
+import os
+import sys
+import time
+import zlib
+import argparse
+
+import qrcode
+from qrcode.constants import ERROR_CORRECT_L, ERROR_CORRECT_M, ERROR_CORRECT_Q, ERROR_CORRECT_H
+from PIL import Image
+
+DEFAULT_SCALE = 10    # piksel per modul (sama dengan box_size lama)
+DEFAULT_BORDER = 4    # quiet zone, dalam modul
+DEFAULT_EC = "M"     # sama dengan default qrcode.make
+
+EC_LEVELS = {"L": ERROR_CORRECT_L, "M": ERROR_CORRECT_M, "Q": ERROR_CORRECT_Q, "H": ERROR_CORRECT_H}
+FORMATS = ("png", "svg", "pdf")
+MIME_TYPES = {"png": "image/png", "svg": "image/svg+xml", "pdf": "application/pdf"}
+
+
+# === MATRIKS ===
+def qr_matrix(data, border=DEFAULT_BORDER, ec=DEFAULT_EC):
+    """Bangun matriks modul (list of list bool, True = gelap) termasuk quiet zone."""
+    qr = qrcode.QRCode(version=None, error_correction=EC_LEVELS[ec], border=border)
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.get_matrix()
+
+
+def _runs(row):
+    """Yield (start, length) untuk setiap run modul gelap dalam satu baris."""
+    x, n = 0, len(row)
+    while x < n:
+        if row[x]:
+            start = x
+            while x < n and row[x]:
+                x += 1
+            yield start, x - start
+        else:
+            x += 1
+
+
+# === PNG ===
+def matrix_to_png(matrix, scale=DEFAULT_SCALE):
+    """PNG 1-bit; satu piksel per modul lalu diperbesar (nearest) ke `scale`."""
+    n = len(matrix)
+    pixels = bytes(0 if dark else 255 for row in matrix for dark in row)
+    img = Image.frombytes("L", (n, n), pixels).convert("1", dither=Image.Dither.NONE)
+    if scale != 1:
+        img = img.resize((n * scale, n * scale), Image.Resampling.NEAREST)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG", optimize=True)
+    return buf.getvalue()
+
+
+# === SVG ===
+def matrix_to_svg(matrix, scale=DEFAULT_SCALE):
+    n = len(matrix)
+    parts = []
+    for y, row in enumerate(matrix):
+        for x, length in _runs(row):
+            parts.append(f"M{x} {y}h{length}v1h-{length}z")
+    size = n * scale
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" '
+        f'viewBox="0 0 {n} {n}" shape-rendering="crispEdges">'
+        f'<rect width="{n}" height="{n}" fill="#fff"/>'
+        f'<path fill="#000" d="{"".join(parts)}"/></svg>'
+    ).encode("ascii")
+
+
+# === PDF ===
+def pdf_qr_ops(matrix, x, y, size):
+    """
+    Potongan content stream PDF yang menggambar QR berukuran `size` pt
+    dengan pojok kiri-bawah di (x, y). Juga dipakai untuk lembar cetak multi-tiket.
+    """
+    n = len(matrix)
+    m = size / n
+    ops = ["q", "1 g", f"{x:.2f} {y:.2f} {size:.2f} {size:.2f} re f", "0 g"]
+    for row_idx, row in enumerate(matrix):
+        ry = y + (n - row_idx - 1) * m
+        for rx, length in _runs(row):
+            ops.append(f"{x + rx * m:.2f} {ry:.2f} {length * m:.2f} {m:.2f} re")
+    ops.append("f")
+    ops.append("Q")
+    return "\n".join(ops)
+
+
+def pdf_stream_object(stream):
+    """Bungkus content stream sebagai objek stream terkompresi Flate."""
+    data = zlib.compress(stream, 6)
+    return b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(data) + data + b"\nendstream"
+
+
+class PdfWriter:
+    """
+    Penulis PDF minimal yang streaming: setiap halaman langsung ditulis ke `out`,
+    hanya offset objek yang disimpan di memori. Objek 1 = catalog, 2 = pages,
+    3 = font Helvetica (/F1), halaman mulai dari objek 4.
+    """
+
+    def __init__(self, out, page_size):
+        self.out = out
+        self.page_size = page_size
+        self.offsets = {}
+        self.page_ids = []
+        self.next_id = 4
+        self.pos = 0
+        self._write(b"%PDF-1.4\n")
+        self._object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+
+    def _write(self, data):
+        self.out.write(data)
+        self.pos += len(data)
+
+    def _object(self, num, body):
+        self.offsets[num] = self.pos
+        self._write(b"%d 0 obj\n" % num + body + b"\nendobj\n")
+
+    def add_page(self, stream, compressed=False):
+        """Tambah satu halaman; `stream` = content stream (bytes), atau objek siap pakai jika compressed."""
+        page_id, content_id = self.next_id, self.next_id + 1
+        self.next_id += 2
+        w, h = self.page_size
+        self._object(page_id, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {w:.2f} {h:.2f}] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode("ascii"))
+        self._object(content_id, stream if compressed else pdf_stream_object(stream))
+        self.page_ids.append(page_id)
+
+    def close(self):
+        kids = " ".join(f"{i} 0 R" for i in self.page_ids)
+        self._object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>".encode("ascii"))
+        self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        size = self.next_id
+        xref = self.pos
+        self._write(b"xref\n0 %d\n0000000000 65535 f \n" % size)
+        for num in range(1, size):
+            self._write(b"%010d 00000 n \n" % self.offsets[num])
+        self._write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, xref))
+
+
+def build_pdf(page_streams, page_size):
+    """Susun PDF dari daftar content stream (bytes) satu per halaman."""
+    out = io.BytesIO()
+    writer = PdfWriter(out, page_size)
+    for stream in page_streams:
+        writer.add_page(stream)
+    writer.close()
+    return out.getvalue()
+
+
+def matrix_to_pdf(matrix, scale=DEFAULT_SCALE):
+    # 1 pt per piksel PNG yang setara, supaya ukuran fisik cetak mirip
+    size = len(matrix) * scale * 0.75
+    return build_pdf([pdf_qr_ops(matrix, 0, 0, size).encode("ascii")], (size, size))
+
+
+# === API UTAMA ===
+def render(data, fmt="png", scale=DEFAULT_SCALE, border=DEFAULT_BORDER, ec=DEFAULT_EC):
+    """Render `data` ke bytes dalam format png/svg/pdf."""
+    matrix = qr_matrix(data, border=border, ec=ec)
+    if fmt == "png":
+        return matrix_to_png(matrix, scale)
+    if fmt == "svg":
+        return matrix_to_svg(matrix, scale)
+    if fmt == "pdf":
+        return matrix_to_pdf(matrix, scale)
+    raise ValueError(f"Format tidak dikenal: {fmt}")
+
+
+def save(data, path, fmt=None, scale=DEFAULT_SCALE, border=DEFAULT_BORDER, ec=DEFAULT_EC):
+    """Render dan tulis ke `path`; format ditebak dari ekstensi jika tidak diberikan."""
+    fmt = fmt or os.path.splitext(str(path))[1].lstrip(".").lower() or "png"
+    payload = render(data, fmt=fmt, scale=scale, border=border, ec=ec)
+    with open(path, "wb") as f:
+        f.write(payload)
+    return str(path)
+
+
+# === BENCHMARK ===
+def _legacy_png(data):
+    buf = io.BytesIO()
+    qrcode.make(data).save(buf)
+    return buf.getvalue()
+
+
+def benchmark(n=300, payload="https://bit.ly/thisisfullycustom?id="):
+    import secrets
+    samples = [payload + secrets.token_urlsafe(12).upper() for _ in range(n)]
+    cases = [("legacy qrcode.make", _legacy_png)]
+    cases += [(f"qr_render {fmt}", lambda d, f=fmt: render(d, fmt=f)) for fmt in FORMATS]
+    print(f"{'path':<22}{'ms/QR':>10}{'avg bytes':>12}")
+    for label, fn in cases:
+        started = time.perf_counter()
+        total = sum(len(fn(d)) for d in samples)
+        elapsed = time.perf_counter() - started
+        print(f"{label:<22}{elapsed / n * 1000:>10.2f}{total / n:>12.0f}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Render QR / benchmark renderer")
+    ap.add_argument("data", nargs="?", help="isi QR")
+    ap.add_argument("-o", "--output", help="file output (.png/.svg/.pdf)")
+    ap.add_argument("--scale", type=int, default=DEFAULT_SCALE)
+    ap.add_argument("--bench", type=int, metavar="N", help="benchmark N QR vs jalur lama")
+    args = ap.parse_args()
+    if args.bench:
+        benchmark(args.bench)
+    elif args.data and args.output:
+        print(save(args.data, args.output, scale=args.scale))
+    else:
+        ap.print_help()
+        sys.exit(1)
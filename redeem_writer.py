@@ -0,0 +1,89 @@
+# redeem_writer.py
+"""
+Penulis tunggal untuk redeem tiket (dipakai verify_async.py).
+
+- Semua redeem masuk antrean. Satu thread pemilik koneksi DB mengambil semua
+  yang sedang menunggu (maks BATCH_MAX) dan menjalankannya dalam SATU transaksi
+  (group commit): satu commit/fsync untuk banyak scan sekaligus, dan tidak ada
+  rebutan lock tulis SQLite antar request.
+- Urutan dalam batch = urutan kedatangan, logika sama dengan Storage.redeem
+  (Storage.redeem_on) -> tiket yang sama di-scan dua kali tetap "ok" lalu "used".
+- Hasil dikirim balik ke coroutine lewat asyncio.Future (call_soon_threadsafe),
+  jadi event loop tidak pernah menunggu DB.
+- Thread dibuat saat redeem pertama dan dibuat ulang setelah fork.
+- redeem_on bisa diganti (mode edge/hub: edge_sync.redeem_on, ikut mencatat
+  outbox/feed replikasi di transaksi yang sama).
+"""
+import os
+import time
+import queue
+import asyncio
+import threading
+
+BATCH_MAX = int(os.environ.get("REDEEM_BATCH_MAX", "128"))
+
+
+def _resolve(fut, result, error):
+    if fut.cancelled():
+        return
+    if error is not None:
+        fut.set_exception(error)
+    else:
+        fut.set_result(result)
+
+
+class RedeemWriter:
+    def __init__(self, storage, batch_max=BATCH_MAX, redeem_on=None):
+        self.storage = storage
+        self.redeem_on = redeem_on or storage.redeem_on
+        self.batch_max = batch_max
+        self.queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="redeem-writer", daemon=True)
+                self._thread.start()
+
+    async def redeem(self, event_id, code, now_ts, now_text, reuse_window):
+        """Seperti Storage.redeem, tapi dijalankan oleh thread penulis. Return outcome."""
+        self._ensure_thread()
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self.queue.put(((event_id, code, now_ts, now_text, reuse_window), loop, fut))
+        return await fut
+
+    def _take_batch(self):
+        batch = [self.queue.get()]
+        while len(batch) < self.batch_max:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            try:
+                with self.storage.connection() as conn:
+                    while True:
+                        batch = self._take_batch()
+                        try:
+                            with conn:
+                                results = [self.redeem_on(conn, *args) for args, _loop, _fut in batch]
+                        except Exception as e:
+                            for _args, loop, fut in batch:
+                                loop.call_soon_threadsafe(_resolve, fut, None, e)
+                            raise
+                        for (_args, loop, fut), outcome in zip(batch, results):
+                            loop.call_soon_threadsafe(_resolve, fut, outcome, None)
+            except Exception as e:
+                # koneksi rusak / DB terkunci terlalu lama: buka koneksi baru, antrean tetap jalan
+                print("⚠️ Redeem writer error:", e)
+                time.sleep(0.5)
@@ -0,0 +1,317 @@
+# replay_scans.py
+"""
+Uji beban dengan memutar ulang scan asli dari log (pola antrean pintu masuk).
+
+- Sumber: scan_log.txt (dua format: baris lama "ts | kode | VALID/INVALID | pesan"
+  dan baris sekarang "[ts] kode - status") dan/atau tabel scan_events (--from-db,
+  lengkap dengan acara per scan). Jeda sepi lebih dari --max-gap detik dipadatkan;
+  scan dalam detik yang sama (log resolusi detik) disebar rata dalam detik itu.
+- DB: data.db disalin online (backup.copy_online) ke folder sementara lalu
+  di-seed: kode yang pertama kali tercatat "ok" dibuat belum terpakai, yang
+  tercatat "used" dibuat sudah terpakai. Kode tidak dikenal dibiarkan tidak ada.
+  DB asli dan scan_log.txt tidak tersentuh (server replay menulis log sendiri).
+- --crowd N: tiap scan diputar N kali dengan tiket klon (token baru, status
+  awal sama) -> kerumunan N kali lebih besar, bukan sekadar lebih cepat.
+  --speed mempercepat waktu (10 = 1 jam log diputar dalam 6 menit).
+- --gates gate virtual, masing-masing satu koneksi keep-alive; tiap tiket
+  selalu lewat gate yang sama. Gate tidak bisa scan berikutnya sebelum hasil
+  sebelumnya datang (seperti petugas sungguhan); keterlambatan terhadap jadwal
+  dilaporkan sebagai "lag".
+- Laporan per --window detik: scan/detik, error, latensi p50/p95/p99, lag;
+  ringkasan akhir + jumlah hasil yang berbeda dari log asli.
+
+    python replay_scans.py                              # scan_log.txt, 1x, server sync
+    python replay_scans.py --speed 10 --crowd 10 --gates 40 --server async
+    python replay_scans.py --from-db --since "2025-12-07 13:00:00" --until "2025-12-07 15:00:00"
+    python replay_scans.py --url http://127.0.0.1:8080  # server yang sudah jalan (DB-nya tidak di-seed)
+"""
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+import zlib
+from collections import namedtuple
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import backup
+from bench_verifier import SERVERS, post_json, percentile, wait_ready, start_server, stop_server
+from common import generate_token, DEFAULT_EVENT
+from storage import SqliteStorage
+import ticket_codec
+
+BASEDIR = os.path.dirname(os.path.abspath(__file__))
+LOG_FILE = os.path.join(BASEDIR, "scan_log.txt")
+DB_FILE = os.path.join(BASEDIR, "data.db")
+
+Scan = namedtuple("Scan", "ts code outcome event_id")
+
+# "2025-10-06 21:56:46.242814+07:00 | kode | VALID | Tiket valid. Selamat datang!"
+_OLD_LINE = re.compile(r"^(\S+ \S+) \| (\S+) \| (VALID|INVALID) \| (.*)$")
+# "[2025-12-07 13:28:26] kode - ok"
+_NEW_LINE = re.compile(r"^\[([^\]]+)\] (\S+) - (\w+)$")
+
+
+# === SUMBER SCAN ===
+def _outcome_old(verdict, msg):
+    if verdict == "VALID":
+        return "ok"
+    return "used" if "sudah digunakan" in msg else "invalid"
+
+
+def parse_line(line, event_id=DEFAULT_EVENT):
+    """Satu baris scan_log.txt (format lama atau sekarang) -> Scan, None jika tidak dikenali."""
+    line = line.strip()
+    m = _NEW_LINE.match(line)
+    if m:
+        ts = datetime.strptime(m.group(1), "%Y-%m-%d %H:%M:%S").timestamp()
+        return Scan(ts, m.group(2), m.group(3), event_id)
+    m = _OLD_LINE.match(line)
+    if m:
+        return Scan(datetime.fromisoformat(m.group(1)).timestamp(), m.group(2),
+                    _outcome_old(m.group(3), m.group(4)), event_id)
+    return None
+
+
+def read_log(path, event_id=DEFAULT_EVENT):
+    scans, skipped = [], 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            scan = parse_line(line, event_id)
+            if scan:
+                scans.append(scan)
+            elif line.strip():
+                skipped += 1
+    if skipped:
+        print(f"⚠️ {path}: {skipped} baris tidak dikenali, dilewati")
+    return scans
+
+
+def read_scan_events(db_path, event_id=None):
+    storage = SqliteStorage(db_path)
+    sql = "SELECT ts, code, outcome, event_id FROM scan_events"
+    params = ()
+    if event_id:
+        sql, params = sql + " WHERE event_id = ?", (event_id,)
+    with storage.connection() as conn:
+        return [Scan(*row) for row in conn.execute(sql + " ORDER BY ts", params) if row[1]]
+
+
+# === JADWAL ===
+def schedule(scans, speed=1.0, max_gap=60.0):
+    """Scan urut waktu -> [(detik sejak mulai, scan)], jeda > max_gap dipadatkan, dibagi speed."""
+    scans = sorted(scans, key=lambda s: s.ts)
+    # log resolusi detik: beberapa scan di detik yang sama disebar rata
+    spread, i = [], 0
+    while i < len(scans):
+        j = i
+        while j < len(scans) and scans[j].ts == scans[i].ts:
+            j += 1
+        n = j - i
+        spread.extend(scans[i].ts + (k / n if n > 1 else 0) for k in range(n))
+        i = j
+    plan, offset = [], 0.0
+    for k, scan in enumerate(scans):
+        if k:
+            offset += min(spread[k] - spread[k - 1], max_gap)
+        plan.append((offset / speed, scan))
+    return plan
+
+
+def expand_crowd(plan, crowd):
+    """Tiap scan diulang `crowd` kali: salinan ke-2 dst. memakai tiket klon."""
+    if crowd <= 1:
+        return plan
+    clones = {}   # (acara, kode asli, i) -> token klon
+    out = []
+    for t, scan in plan:
+        out.append((t, scan))
+        for i in range(1, crowd):
+            key = (scan.event_id, scan.code, i)
+            if key not in clones:
+                # tanda tangan palsu tetap palsu; kode lain diganti token baru
+                clones[key] = scan.code if ticket_codec.verify_signature(scan.code) is False else generate_token()
+            out.append((t, scan._replace(code=clones[key])))
+    return out
+
+
+# === DB SALINAN ===
+def seed_rows(plan):
+    """Status awal per (acara, kode) dari scan pertama di log: ok -> belum terpakai, used -> terpakai."""
+    first = {}
+    for _t, scan in plan:
+        first.setdefault((scan.event_id, scan.code), scan.outcome)
+    now_ts = int(time.time())
+    now_text = time.strftime("%Y-%m-%d %H:%M:%S")
+    rows = {}
+    for (event_id, code), outcome in first.items():
+        if outcome == "ok":
+            rows.setdefault(event_id, []).append((code, 1, 0, None, None, None))
+        elif outcome == "used":
+            rows.setdefault(event_id, []).append((code, 1, 1, now_text, now_ts, "replay"))
+    return rows
+
+
+def prepare_db(src_path, plan, workdir):
+    path = os.path.join(workdir, "replay.db")
+    backup.copy_online(src_path, path)
+    storage = SqliteStorage(path)
+    storage.init()
+    seeded = 0
+    for event_id, rows in seed_rows(plan).items():
+        seeded += storage.sync_codes(event_id, rows)
+    print(f"DB replay: {path} ({seeded} kode di-seed)")
+    return path
+
+
+# === PEMUTARAN ===
+async def _gate(host, port, base_path, items, started, results):
+    """Satu gate virtual: kirim scan sesuai jadwal, satu per satu di koneksi keep-alive."""
+    reader = writer = None
+    for t, scan in items:
+        delay = started + t - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        sent = time.perf_counter()
+        payload = {"token": scan.code, "event": scan.event_id, "gate": "replay"}
+        try:
+            reused = writer is not None
+            if not reused:
+                reader, writer = await asyncio.open_connection(host, port)
+            try:
+                code, data = await post_json(reader, writer, host, base_path + "/api/scan", payload)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                if not reused:
+                    raise   # koneksi baru pun gagal: dicatat sebagai error di bawah
+                # koneksi keep-alive yang lama menganggur ditutup server: sambung ulang sekali
+                writer.close()
+                reader, writer = await asyncio.open_connection(host, port)
+                code, data = await post_json(reader, writer, host, base_path + "/api/scan", payload)
+            status = json.loads(data).get("status", "?") if code == "200" else f"http {code}"
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            status = f"error {type(e).__name__}"
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+        done = time.perf_counter()
+        results.append((sent - started, done - sent, sent - started - t, status, scan.outcome))
+    if writer is not None:
+        writer.close()
+
+
+async def replay(url, plan, gates):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    # tiket yang sama selalu lewat gate yang sama -> urutan scan ulang per tiket terjaga
+    shards = [[] for _ in range(gates)]
+    for item in plan:
+        shards[zlib.crc32(item[1].code.encode()) % gates].append(item)
+    results = []
+    started = time.perf_counter() + 0.5
+    await asyncio.gather(*[_gate(host, port, parts.path.rstrip("/"), s, started, results) for s in shards if s])
+    return sorted(results)
+
+
+# === LAPORAN ===
+def _is_error(status):
+    return status.startswith(("http", "error"))
+
+
+def _line(label, rows, seconds):
+    latencies = sorted(r[1] for r in rows)
+    lags = sorted(r[2] for r in rows)
+    errors = sum(1 for r in rows if _is_error(r[3]))
+    ms = lambda s: f"{s * 1000:7.1f}"
+    return (f"{label:>10} {len(rows):6} {len(rows) / max(seconds, 1e-9):8.1f}/s  err {errors / len(rows):6.1%}"
+            f"  p50 {ms(percentile(latencies, 50))}  p95 {ms(percentile(latencies, 95))}"
+            f"  p99 {ms(percentile(latencies, 99))}  max {ms(latencies[-1])} ms  lag p99 {ms(max(percentile(lags, 99), 0))} ms")
+
+
+def report(results, window):
+    if not results:
+        print("Tidak ada scan yang diputar.")
+        return
+    print(f"{'detik':>10} {'scan':>6} {'laju':>10}")
+    buckets = {}
+    for row in results:
+        buckets.setdefault(int(row[0] // window), []).append(row)
+    for k in sorted(buckets):
+        print(_line(f"{k * window:.0f}-{(k + 1) * window:.0f}", buckets[k], window))
+    elapsed = max(r[0] + r[1] for r in results)
+    print(_line("total", results, elapsed))
+
+    outcomes, mismatched = {}, {}
+    for _sent, _lat, _lag, status, expected in results:
+        outcomes[status] = outcomes.get(status, 0) + 1
+        if not _is_error(status) and status != expected:
+            key = f"{expected}->{status}"
+            mismatched[key] = mismatched.get(key, 0) + 1
+    print("hasil:", dict(sorted(outcomes.items())))
+    if mismatched:
+        print(f"⚠️ {sum(mismatched.values())} scan hasilnya berbeda dari log asli "
+              f"(log -> replay, mis. jendela 24 jam terpotong saat dipercepat): {dict(sorted(mismatched.items()))}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Putar ulang log scan sebagai uji beban verifier")
+    ap.add_argument("logs", nargs="*", help=f"file log scan (default {os.path.basename(LOG_FILE)})")
+    ap.add_argument("--from-db", action="store_true", help="pakai tabel scan_events dari --db")
+    ap.add_argument("--db", default=DB_FILE, help="DB sumber yang disalin lalu di-seed")
+    ap.add_argument("--event", default=None, help=f"acara untuk baris log teks / filter scan_events (default {DEFAULT_EVENT})")
+    ap.add_argument("--since", help="mulai dari waktu ini (YYYY-mm-dd HH:MM:SS)")
+    ap.add_argument("--until", help="sampai waktu ini (YYYY-mm-dd HH:MM:SS)")
+    ap.add_argument("--speed", type=float, default=1.0, help="percepatan waktu (10 = 10x lebih cepat)")
+    ap.add_argument("--crowd", type=int, default=1, help="pengali jumlah pengunjung (tiket klon)")
+    ap.add_argument("--gates", type=int, default=16, help="jumlah gate virtual bersamaan")
+    ap.add_argument("--max-gap", type=float, default=60.0, help="jeda sepi maksimum di log (detik, sebelum --speed)")
+    ap.add_argument("--window", type=float, default=10.0, help="lebar jendela laporan (detik)")
+    ap.add_argument("--server", choices=tuple(SERVERS), default="sync", help="varian verifier yang dijalankan")
+    ap.add_argument("--url", help="server yang sudah berjalan (tanpa salin/seed DB dan start/stop)")
+    ap.add_argument("--port", type=int, default=8099)
+    args = ap.parse_args()
+
+    scans = []
+    if args.from_db:
+        scans += read_scan_events(args.db, args.event)
+    if args.logs or not args.from_db:
+        for path in args.logs or [LOG_FILE]:
+            scans += read_log(path, args.event or DEFAULT_EVENT)
+    if args.since:
+        since = datetime.strptime(args.since, "%Y-%m-%d %H:%M:%S").timestamp()
+        scans = [s for s in scans if s.ts >= since]
+    if args.until:
+        until = datetime.strptime(args.until, "%Y-%m-%d %H:%M:%S").timestamp()
+        scans = [s for s in scans if s.ts <= until]
+    if not scans:
+        sys.exit("Tidak ada scan di sumber yang dipilih.")
+
+    plan = expand_crowd(schedule(scans, args.speed, args.max_gap), args.crowd)
+    print(f"{len(scans)} scan dari log x{args.crowd} = {len(plan)} scan dalam {plan[-1][0]:.0f} detik "
+          f"(speed {args.speed:g}x, {args.gates} gate)")
+
+    if args.url:
+        report(asyncio.run(replay(args.url.rstrip("/"), plan, args.gates)), args.window)
+        sys.exit(0)
+
+    workdir = tempfile.mkdtemp(prefix="replay-")
+    try:
+        db_path = prepare_db(args.db, plan, workdir)
+        os.environ.update(
+            DATABASE_URL=f"sqlite:///{db_path}",
+            SCAN_LOG_PATH=os.path.join(workdir, "scan_log.txt"),
+            BACKUP_INTERVAL="0",
+        )
+        proc = start_server(args.server, args.port)
+        try:
+            url = f"http://127.0.0.1:{args.port}"
+            wait_ready(url)
+            report(asyncio.run(replay(url, plan, args.gates)), args.window)
+        finally:
+            stop_server(proc)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,136 @@
+# scan_events.py
+"""
+Pencatatan setiap percobaan scan ke tabel scan_events + rollup per bucket waktu.
+
+- record() hanya memasukkan event ke antrean di memori (murah, tidak menyentuh DB).
+- Thread latar menulis antrean per batch (FLUSH_SIZE event atau tiap
+  FLUSH_INTERVAL detik) dalam satu transaksi: executemany ke scan_events
+  dan UPSERT inkremental ke scan_rollup untuk setiap BUCKET_SIZES.
+- Thread dibuat saat event pertama (aman untuk gunicorn --preload / fork).
+- Koneksi diambil dari storage.Storage (SQLite atau Postgres, lihat storage.py).
+"""
+import os
+import time
+import queue
+import atexit
+import threading
+
+FLUSH_SIZE = int(os.environ.get("SCAN_EVENTS_FLUSH_SIZE", "200"))
+FLUSH_INTERVAL = float(os.environ.get("SCAN_EVENTS_FLUSH_INTERVAL", "1.0"))
+BUCKET_SIZES = (300, 3600)   # 5 menit, 1 jam
+
+
+def bucket_start(ts, size):
+    return int(ts // size) * size
+
+
+def rollup_rows(events):
+    """Agregasi batch event -> {(event_id, size, start, gate, outcome): [count, sum, max]}."""
+    agg = {}
+    for ts, event_id, _code, outcome, gate, _device, latency in events:
+        latency = latency or 0.0
+        for size in BUCKET_SIZES:
+            key = (event_id, size, bucket_start(ts, size), gate or "", outcome or "")
+            row = agg.setdefault(key, [0, 0.0, 0.0])
+            row[0] += 1
+            row[1] += latency
+            row[2] = max(row[2], latency)
+    return agg
+
+
+def write_events(conn, events):
+    """Tulis satu batch event + rollup dalam satu transaksi."""
+    if not events:
+        return
+    agg = rollup_rows(events)
+    with conn:
+        conn.executemany(
+            "INSERT INTO scan_events (ts, event_id, code, outcome, gate, device, latency_ms) VALUES (?,?,?,?,?,?,?)",
+            events,
+        )
+        conn.executemany(
+            """
+            INSERT INTO scan_rollup (event_id, bucket_size, bucket_start, gate, outcome, count, latency_sum, latency_max)
+            VALUES (?,?,?,?,?,?,?,?)
+            ON CONFLICT (event_id, bucket_size, bucket_start, gate, outcome) DO UPDATE SET
+                count = scan_rollup.count + excluded.count,
+                latency_sum = scan_rollup.latency_sum + excluded.latency_sum,
+                latency_max = CASE WHEN excluded.latency_max > scan_rollup.latency_max
+                                   THEN excluded.latency_max ELSE scan_rollup.latency_max END
+            """,
+            [key + tuple(vals) for key, vals in agg.items()],
+        )
+
+
+class ScanEventWriter:
+    def __init__(self, storage):
+        self.storage = storage
+        self.queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def _ensure_thread(self):
+        # setelah fork (worker gunicorn) thread milik parent tidak ikut -> buat ulang
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="scan-events", daemon=True)
+            self._thread.start()
+
+    def record(self, code, outcome, event_id="default", gate=None, device=None, latency_ms=None, ts=None):
+        self.queue.put((ts or time.time(), event_id, code, outcome, gate, device, latency_ms))
+        self._ensure_thread()
+
+    def _drain(self, block):
+        batch = []
+        try:
+            batch.append(self.queue.get(timeout=FLUSH_INTERVAL) if block else self.queue.get_nowait())
+            while len(batch) < FLUSH_SIZE:
+                batch.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._drain(block=True)
+            if not batch:
+                continue
+            try:
+                with self.storage.connection() as conn:
+                    write_events(conn, batch)
+            except Exception as e:
+                print("⚠️ Gagal menulis scan_events:", e)
+
+    def flush(self):
+        """Tulis semua event yang masih di antrean (dipanggil saat proses berhenti)."""
+        batch = self._drain(block=False)
+        if not batch:
+            return
+        with self.storage.connection() as conn:
+            while batch:
+                write_events(conn, batch)
+                batch = self._drain(block=False)
+
+
+def rollup_report(conn, event_id="default", bucket_size=300, since_ts=None):
+    """
+    Baris rollup untuk view analitik: (bucket_start, gate, outcome, count, avg_ms, max_ms),
+    diurutkan per waktu. Pencarian memakai primary key (event_id, bucket_size, bucket_start, ...).
+    """
+    since_ts = since_ts if since_ts is not None else time.time() - 24 * 3600
+    return conn.execute(
+        """
+        SELECT bucket_start, gate, outcome, count,
+               CASE WHEN count > 0 THEN latency_sum / count ELSE 0 END, latency_max
+        FROM scan_rollup
+        WHERE event_id = ? AND bucket_size = ? AND bucket_start >= ?
+        ORDER BY bucket_start, gate, outcome
+        """,
+        (event_id, bucket_size, bucket_start(since_ts, bucket_size)),
+    ).fetchall()
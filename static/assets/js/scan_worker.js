@@ -0,0 +1,32 @@
+/* static/assets/js/scan_worker.js
+ * Decode QR di Web Worker supaya thread utama (video + UI) tetap lancar.
+ * Pesan masuk:
+ *   {type: 'init', jsqr: '<url jsQR.js>'}
+ *   {type: 'frame', width, height, buffer}   (buffer RGBA, ditransfer)
+ * Pesan keluar:
+ *   {type: 'ready'} | {type: 'result', data: '<isi QR>' | null, ms} | {type: 'error', msg}
+ *   {type: 'init-error', msg}   (jsQR gagal dimuat -> halaman pindah ke decoder thread utama)
+ */
+self.onmessage = function (e) {
+  var m = e.data;
+  if (m.type === 'init') {
+    try {
+      importScripts(m.jsqr);
+      self.postMessage({ type: 'ready' });
+    } catch (err) {
+      self.postMessage({ type: 'init-error', msg: String(err) });
+    }
+    return;
+  }
+  if (m.type === 'frame') {
+    var t0 = performance.now();
+    var code = null;
+    try {
+      // gambar sudah dipotong ke tengah + diperkecil; tidak perlu mencoba versi terbalik
+      code = jsQR(new Uint8ClampedArray(m.buffer), m.width, m.height, { inversionAttempts: 'dontInvert' });
+    } catch (err) {
+      self.postMessage({ type: 'error', msg: String(err) });
+    }
+    self.postMessage({ type: 'result', data: code && code.data ? code.data : null, ms: performance.now() - t0 });
+  }
+};
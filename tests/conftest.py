@@ -0,0 +1,61 @@
+# tests/conftest.py
+# modul proyek ada di folder induk (skrip datar, bukan paket)
+import os
+import sys
+import uuid
+from urllib.parse import quote
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import SqliteStorage, PostgresStorage   # noqa: E402
+
+# uji backend Postgres: DATABASE_URL=postgresql://postgres:pw@localhost:5432/postgres python -m pytest tests
+PG_URL = os.environ.get("DATABASE_URL", "")
+if not PG_URL.startswith(("postgres://", "postgresql://")):
+    PG_URL = ""
+
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def make_storage(request, tmp_path):
+    """
+    Pabrik storage kosong yang sudah di-init, sekali per backend. Postgres hanya jalan
+    bila DATABASE_URL menunjuk ke Postgres; tiap storage mendapat schema sendiri yang
+    dihapus setelah test.
+    """
+    if request.param == "sqlite":
+        def make(name="data"):
+            storage = SqliteStorage(str(tmp_path / f"{name}.db"))
+            storage.init()
+            return storage
+        yield make
+        return
+
+    if not PG_URL:
+        pytest.skip("DATABASE_URL Postgres tidak diset")
+    import psycopg2
+
+    schemas, made = [], []
+
+    def make(name="data"):
+        schema = f"test_{name}_{uuid.uuid4().hex[:8]}"
+        admin = psycopg2.connect(PG_URL)
+        admin.autocommit = True
+        admin.cursor().execute(f"CREATE SCHEMA {schema}")
+        admin.close()
+        schemas.append(schema)
+        sep = "&" if "?" in PG_URL else "?"
+        storage = PostgresStorage(f"{PG_URL}{sep}options={quote(f'-csearch_path={schema}')}")
+        storage.init()
+        made.append(storage)
+        return storage
+
+    yield make
+    for storage in made:
+        storage.close()
+    admin = psycopg2.connect(PG_URL)
+    admin.autocommit = True
+    for schema in schemas:
+        admin.cursor().execute(f"DROP SCHEMA {schema} CASCADE")
+    admin.close()
@@ -0,0 +1,104 @@
+# tests/test_apps.py
+# verify_app (Flask) dan verify_async (Quart) memakai helper route yang sama -> perilaku harus sama
+import asyncio
+
+import pytest
+
+import verify_app
+import verify_async
+from common import DEFAULT_EVENT
+from redeem_writer import RedeemWriter
+from scan_events import ScanEventWriter
+from storage import SqliteStorage
+
+CODE = "APPTEST1"
+
+
+class Client:
+    """Antarmuka seragam untuk test client Flask dan Quart: call() -> (status, teks)."""
+
+    def __init__(self, kind):
+        self.kind = kind
+        if kind == "flask":
+            self.client = verify_app.app.test_client()
+        else:
+            self.loop = asyncio.new_event_loop()
+            self.client = verify_async.app.test_client()
+
+    def call(self, method, path, form=None, json=None):
+        if self.kind == "flask":
+            resp = self.client.open(path, method=method, data=form, json=json)
+            return resp.status_code, resp.get_data(as_text=True)
+
+        async def go():
+            kwargs = {"form": form} if form is not None else {"json": json} if json is not None else {}
+            resp = await self.client.open(path, method=method, **kwargs)
+            return resp.status_code, await resp.get_data(as_text=True)
+        return self.loop.run_until_complete(go())
+
+    def close(self):
+        if self.kind == "quart":
+            self.loop.close()
+
+
+@pytest.fixture(params=["flask", "quart"])
+def client(request, tmp_path, monkeypatch):
+    storage = SqliteStorage(str(tmp_path / "data.db"))
+    storage.init()
+    storage.sync_codes(DEFAULT_EVENT, [(CODE, 1, 0, None, None, "")])
+    monkeypatch.setattr(verify_app, "storage", storage)
+    monkeypatch.setattr(verify_app, "scan_events", ScanEventWriter(storage))
+    monkeypatch.setattr(verify_app, "LOG_PATH", str(tmp_path / "scan_log.txt"))
+    monkeypatch.setattr(verify_app, "_started", True)
+    monkeypatch.setattr(verify_async, "storage", storage)
+    monkeypatch.setattr(verify_async, "scan_events", verify_app.scan_events)
+    monkeypatch.setattr(verify_async, "writer", RedeemWriter(storage))
+    c = Client(request.param)
+    yield c
+    c.close()
+
+
+def login(client):
+    status, _body = client.call("POST", "/admin", form={"password": verify_app.ADMIN_PASSWORD})
+    assert status == 302
+
+
+def test_scan_page_then_reuse(client):
+    status, body = client.call("GET", f"/S/{CODE}")
+    assert status == 200 and "Tiket valid" in body
+    _status, body = client.call("GET", f"/scan?token={CODE}")
+    assert "sudah digunakan" in body
+    _status, body = client.call("GET", "/scan")
+    assert "(kosong)" in body
+
+
+def test_api_scan(client):
+    status, body = client.call("POST", "/api/scan", json={"payload": CODE, "gate": "A"})
+    assert status == 200 and '"status":"ok"' in body.replace(" ", "")
+    status, _body = client.call("POST", "/api/scan", json={"token": 5})
+    assert status == 400
+
+
+def test_admin_requires_login_and_password(client):
+    status, _body = client.call("GET", "/admin/panel")
+    assert status == 302
+    _status, body = client.call("POST", "/admin", form={"password": "salah"})
+    assert "Password salah" in body
+
+
+def test_admin_pages(client):
+    login(client)
+    status, body = client.call("GET", "/admin/panel?event=tidak-ada")
+    assert status == 200 and "tidak ditemukan" in body
+    status, _body = client.call("GET", "/admin/analytics?bucket=3600&hours=2")
+    assert status == 200
+    status, body = client.call("GET", "/admin/search.json?q=x")
+    assert status == 200 and '"results"' in body
+    status, _body = client.call("GET", "/reset?mode=all")
+    assert status == 302
+
+
+def test_metrics(client):
+    client.call("GET", f"/S/{CODE}")
+    status, body = client.call("GET", "/metrics")
+    assert status == 200 and "scans_total" in body
@@ -0,0 +1,159 @@
+# tests/test_edge_sync.py
+import pytest
+
+import edge_sync
+from storage import SqliteStorage
+
+DAY = 24 * 3600
+T0 = 1_750_000_000
+CODES = ["T1", "T2", "T3"]
+
+
+def _storage(path):
+    storage = SqliteStorage(str(path))
+    storage.init()
+    return storage
+
+
+@pytest.fixture
+def hub(make_storage):
+    """Hub di SQLite, dan di Postgres bila DATABASE_URL diset (pemberian feed_seq pakai advisory lock)."""
+    storage = make_storage("hub")
+    with storage.connection() as conn:
+        with conn:
+            conn.executemany("INSERT INTO codes (event_id, code, valid, used) VALUES ('default', ?, 1, 0)",
+                             [(c,) for c in CODES])
+    return storage
+
+
+def _item(seq, code, ts):
+    return {"seq": seq, "event_id": "default", "code": code, "ts": ts, "last_used": "x"}
+
+
+def _feed(hub, node, since=0, limit=100):
+    return edge_sync.hub_pull(hub, node, since, limit)
+
+
+# === HUB ===
+def test_push_is_idempotent(hub):
+    items = [_item(1, "T1", T0), _item(2, "T2", T0)]
+    first = edge_sync.hub_push(hub, "gateA", items, DAY)
+    again = edge_sync.hub_push(hub, "gateA", items, DAY)   # ack pertama hilang, edge kirim ulang
+    assert first == again == {"acked": [1, 2], "conflicts": []}
+    with hub.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM edge_redemptions").fetchone()[0] == 2
+    assert len(_feed(hub, "gateB")["items"]) == 2
+
+
+def test_double_entry_reported_as_conflict(hub):
+    edge_sync.hub_push(hub, "gateA", [_item(1, "T1", T0)], DAY)
+    res = edge_sync.hub_push(hub, "gateB", [_item(7, "T1", T0 + 30), _item(8, "NOPE", T0)], DAY)
+    assert res["acked"] == [7, 8]
+    conflicts = {c["code"]: c for c in res["conflicts"]}
+    assert conflicts["T1"]["outcome"] == "used"
+    assert (conflicts["T1"]["first_node"], conflicts["T1"]["first_at"]) == ("gateA", T0)
+    assert conflicts["NOPE"]["outcome"] == "missing"
+    # resend konflik: jawaban sama, tidak dicatat dua kali
+    assert edge_sync.hub_push(hub, "gateB", [_item(7, "T1", T0 + 30)], DAY)["conflicts"][0]["first_node"] == "gateA"
+    status = edge_sync.hub_status(hub)
+    assert [c["code"] for c in status["conflicts"]].count("T1") == 1
+    # konflik tidak masuk feed
+    assert [i[1] for i in _feed(hub, "gateC")["items"]] == ["T1"]
+
+
+def test_pull_skips_own_node_and_pages(hub):
+    edge_sync.hub_push(hub, "gateA", [_item(1, "T1", T0), _item(2, "T2", T0)], DAY)
+    edge_sync.hub_push(hub, "gateB", [_item(1, "T3", T0)], DAY)
+
+    page = _feed(hub, "gateA", limit=2)
+    assert page["items"] == [] and page["more"]   # dua baris pertama milik gateA sendiri
+    page = _feed(hub, "gateA", since=page["cursor"], limit=2)
+    assert [i[1] for i in page["items"]] == ["T3"] and not page["more"]
+    assert _feed(hub, "gateA", since=page["cursor"])["items"] == []
+
+
+def test_late_commit_with_lower_id_is_not_skipped(hub):
+    """Kiriman yang id-nya dialokasikan lebih dulu tapi commit belakangan tetap sampai ke edge."""
+    with hub.connection() as conn:
+        with conn:
+            conn.execute("""INSERT INTO edge_redemptions (id, event_id, code, node, ts, outcome, received_at)
+                            VALUES (10, 'default', 'T1', 'central', ?, 'ok', ?)""", (T0, T0))
+    page = _feed(hub, "gateB")
+    assert [i[1] for i in page["items"]] == ["T1"]
+
+    with hub.connection() as conn:
+        with conn:
+            conn.execute("""INSERT INTO edge_redemptions (id, event_id, code, node, ts, outcome, received_at)
+                            VALUES (5, 'default', 'T2', 'gateA', ?, 'ok', ?)""", (T0, T0))
+    assert [i[1] for i in _feed(hub, "gateB", since=page["cursor"])["items"]] == ["T2"]
+
+
+# === EDGE <-> HUB ===
+@pytest.fixture
+def network(hub, tmp_path, monkeypatch):
+    """Dua edge yang bicara dengan hub lewat panggilan fungsi langsung (pengganti HTTP)."""
+    state = {"up": True}
+
+    def call(method, path, payload=None, params=None, timeout=None):
+        if not state["up"]:
+            raise ConnectionRefusedError("hub mati")
+        op = path.rsplit("/", 1)[-1]
+        params = params or {}
+        if op == "push":
+            return edge_sync.hub_push(hub, payload["node"], payload["items"], DAY)
+        if op == "pull":
+            return edge_sync.hub_pull(hub, params["node"], int(params["since"]), int(params["limit"]))
+        if op == "codes":
+            return edge_sync.hub_codes(hub, params["after_event"], params["after_code"], int(params["limit"]))
+        return edge_sync.hub_redeem(hub, payload["node"], payload["event_id"], payload["code"],
+                                    payload["ts"], payload["last_used"], DAY)
+
+    monkeypatch.setattr(edge_sync, "_call", call)
+    monkeypatch.setattr(edge_sync, "ROLE", "edge")
+    edges = {name: _storage(tmp_path / f"{name}.db") for name in ("gateA", "gateB")}
+
+    def sync(name):
+        monkeypatch.setattr(edge_sync, "NODE_ID", name)
+        edge_sync.sync_once(edges[name])
+
+    def scan(name, code, ts):
+        monkeypatch.setattr(edge_sync, "NODE_ID", name)
+        return edge_sync.redeem(edges[name], "default", code, ts, "x", DAY)
+
+    for name in edges:
+        sync(name)   # bootstrap
+    return state, sync, scan
+
+
+def test_redeem_replicates_to_other_gate(network):
+    _state, sync, scan = network
+    assert scan("gateA", "T1", T0) == "ok"
+    assert scan("gateB", "T1", T0 + 1) == "ok"   # belum sinkron: masih mungkin masuk dua kali
+    assert scan("gateA", "T2", T0) == "ok"
+    sync("gateA")
+    sync("gateB")
+    assert scan("gateB", "T2", T0 + 5) == "used"
+
+
+def test_offline_double_entry_detected_after_reconnect(network, hub):
+    state, sync, scan = network
+    state["up"] = False
+    assert scan("gateA", "T3", T0) == "ok"
+    assert scan("gateB", "T3", T0 + 10) == "ok"
+    with pytest.raises(ConnectionRefusedError):
+        sync("gateA")
+    state["up"] = True
+    sync("gateA")
+    sync("gateB")
+    conflicts = edge_sync.hub_status(hub)["conflicts"]
+    assert [(c["code"], c["node"], c["first_node"]) for c in conflicts] == [("T3", "gateB", "gateA")]
+
+
+def test_unknown_code_looked_up_at_hub(network, hub):
+    _state, _sync, scan = network
+    with hub.connection() as conn:
+        with conn:
+            conn.execute("INSERT INTO codes (event_id, code, valid, used) VALUES ('default', 'NEW', 1, 0)")
+    assert scan("gateA", "NEW", T0) == "ok"
+    assert scan("gateA", "NEW", T0 + 1) == "used"   # sudah tersimpan di replika lokal
+    assert scan("gateB", "NEW", T0 + 2) == "used"   # hub sudah mencatat redeem-nya
@@ -0,0 +1,143 @@
+# tests/test_migrations.py
+import sqlite3
+import threading
+
+import pytest
+
+import migrations
+from common import local_text_to_epoch
+from storage import SqliteStorage
+
+LATEST = migrations.MIGRATIONS[-1][0]
+
+
+def _baseline_db(path):
+    """data.db seperti dibuat common.init_db sebelum ada migrasi (tanpa event_id / last_used_at)."""
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+    CREATE TABLE participants (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT, email TEXT, phone TEXT, status TEXT, code TEXT, sent_at TEXT,
+        sheet_row INTEGER
+    );
+    CREATE TABLE codes (
+        code TEXT PRIMARY KEY,
+        valid INTEGER DEFAULT 1,
+        used INTEGER DEFAULT 0,
+        last_used TEXT,
+        used_by TEXT
+    );
+    INSERT INTO participants (name, email, phone, status, code, sent_at, sheet_row)
+    VALUES ('Budi Santoso', 'budi@example.com', '0812', 'PAID', 'USEDCODE', '2025-01-01 09:00:00', 2),
+           ('Siti', 'siti@example.com', '0813', 'PAID', 'FRESHCODE', '', 3);
+    INSERT INTO codes (code, valid, used, last_used, used_by)
+    VALUES ('USEDCODE', 1, 1, '2025-01-01 10:00:00', 'budi@example.com'),
+           ('FRESHCODE', 1, 0, '', 'siti@example.com'),
+           ('VOIDCODE', 0, 0, NULL, NULL);
+    """)
+    conn.commit()
+    return conn
+
+
+def _columns(conn, table):
+    return [r[1] for r in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def test_full_chain_on_baseline_db(tmp_path):
+    path = str(tmp_path / "data.db")
+    conn = _baseline_db(path)
+    assert migrations.migrate(conn) == [v for v, _name, _fn in migrations.MIGRATIONS]
+    assert migrations.migrate(conn) == []   # idempoten
+    assert max(migrations.applied_versions(conn)) == LATEST
+
+    # v2 + v5: data lama dipindah ke acara 'default', waktu pakai jadi epoch
+    rows = {r[0]: r[1:] for r in conn.execute(
+        "SELECT code, event_id, valid, used, last_used_at FROM codes")}
+    assert rows["USEDCODE"] == ("default", 1, 1, local_text_to_epoch("2025-01-01 10:00:00"))
+    assert rows["FRESHCODE"] == ("default", 1, 0, None)
+    assert rows["VOIDCODE"][:2] == ("default", 0)
+    assert conn.execute("SELECT COUNT(*) FROM participants WHERE event_id='default'").fetchone()[0] == 2
+
+    # tabel/kolom yang ditambahkan migrasi selanjutnya
+    for table in ("events", "scan_events", "scan_rollup", "admin_jobs", "metric_series",
+                  "ticket_queue", "edge_redemptions", "edge_outbox", "edge_state"):
+        assert _columns(conn, table), table
+    assert "feed_seq" in _columns(conn, "edge_redemptions")
+    conn.close()
+
+
+def test_migrated_db_is_usable(tmp_path):
+    path = str(tmp_path / "data.db")
+    _baseline_db(path).close()
+    storage = SqliteStorage(path)
+    storage.init()
+
+    # v8: indeks FTS dibangun ulang dari baris lama
+    found, _more = storage.search_participants("default", "budi")
+    assert [p["email"] for p in found] == ["budi@example.com"]
+
+    now = local_text_to_epoch("2025-01-01 12:00:00")
+    assert storage.redeem("default", "FRESHCODE", now, "2025-01-01 12:00:00", 24 * 3600) == "ok"
+    assert storage.redeem("default", "USEDCODE", now, "2025-01-01 12:00:00", 24 * 3600) == "used"
+    assert storage.redeem("default", "VOIDCODE", now, "2025-01-01 12:00:00", 24 * 3600) == "invalid"
+
+
+def test_concurrent_migrate_applies_each_version_once(tmp_path):
+    path = str(tmp_path / "data.db")
+    _baseline_db(path).close()
+    results, errors = [], []
+
+    def run():
+        conn = sqlite3.connect(path, timeout=30)
+        try:
+            results.append(migrations.migrate(conn))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    applied = sorted(v for r in results for v in r)
+    assert applied == [v for v, _name, _fn in migrations.MIGRATIONS]
+
+
+def test_without_fts5_search_falls_back_to_like(tmp_path, monkeypatch):
+    """SQLite tanpa FTS5/trigram: v8 dilewati, startup tetap jalan, pencarian pakai LIKE."""
+    class NoFts5:
+        def __init__(self, cur):
+            self.cur = cur
+
+        def execute(self, sql, *args):
+            if "USING fts5" in sql:
+                raise sqlite3.OperationalError("no such module: fts5")
+            return self.cur.execute(sql, *args)
+
+    v8 = migrations._v8_participant_search
+    monkeypatch.setattr(migrations, "MIGRATIONS", [
+        (v, name, (lambda cur: v8(NoFts5(cur))) if fn is v8 else fn) for v, name, fn in migrations.MIGRATIONS
+    ])
+    path = str(tmp_path / "data.db")
+    _baseline_db(path).close()
+    storage = SqliteStorage(path)
+    storage.init()
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name LIKE 'participants_fts%'").fetchone()[0] == 0
+    conn.execute("UPDATE participants SET name='Budi S.' WHERE code='USEDCODE'")   # tanpa trigger FTS
+    conn.commit()
+    conn.close()
+    found, _more = storage.search_participants("default", "budi")
+    assert [p["email"] for p in found] == ["budi@example.com"]
+
+
+def test_old_sqlite_is_refused_up_front(tmp_path, monkeypatch):
+    monkeypatch.setattr(sqlite3, "sqlite_version_info", (3, 31, 1))
+    conn = sqlite3.connect(str(tmp_path / "data.db"))
+    with pytest.raises(RuntimeError, match="3.35"):
+        migrations.migrate(conn)
+    conn.close()
@@ -0,0 +1,124 @@
+# tests/test_storage.py
+# Test memakai fixture make_storage (conftest.py): SQLite selalu, Postgres bila DATABASE_URL diset.
+import sqlite3
+import threading
+import itertools
+
+import pytest
+
+import mint
+
+DAY = 24 * 3600
+T0 = 1_750_000_000
+
+
+@pytest.fixture
+def storage(make_storage):
+    storage = make_storage()
+    with storage.connection() as conn:
+        with conn:
+            conn.executemany(
+                "INSERT INTO codes (event_id, code, valid, used) VALUES ('default', ?, ?, 0)",
+                [("T1", 1), ("T2", 1), ("VOID", 0)],
+            )
+    return storage
+
+
+def _participant(conn, name, code):
+    return conn.execute("INSERT INTO participants (name, code) VALUES (?, ?) RETURNING id", (name, code)).fetchone()[0]
+
+
+def test_redeem_outcomes(storage):
+    assert storage.redeem("default", "T1", T0, "t0", DAY) == "ok"
+    assert storage.redeem("default", "T1", T0 + 60, "t1", DAY) == "used"
+    assert storage.redeem("default", "T1", T0 + DAY, "t2", DAY) == "ok"   # jendela reuse lewat
+    assert storage.redeem("default", "VOID", T0, "t0", DAY) == "invalid"
+    assert storage.redeem("default", "NOPE", T0, "t0", DAY) == "missing"
+    assert storage.redeem("other-event", "T2", T0, "t0", DAY) == "missing"
+
+
+def test_concurrent_redeem_admits_once(storage):
+    """Tiket sama di-scan bersamaan di banyak gate/worker: tepat satu "ok"."""
+    gates = 8
+    barrier = threading.Barrier(gates)
+    outcomes = []
+
+    def scan():
+        barrier.wait()
+        outcomes.append(storage.redeem("default", "T2", T0, "t0", DAY))
+
+    threads = [threading.Thread(target=scan) for _ in range(gates)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(outcomes) == ["ok"] + ["used"] * (gates - 1)
+
+
+def test_failed_transaction_rolls_back(storage):
+    with pytest.raises(RuntimeError):
+        with storage.connection() as conn:
+            with conn:
+                conn.execute("UPDATE codes SET valid=0 WHERE code='T1'")
+                raise RuntimeError("gagal di tengah transaksi")
+    assert storage.redeem("default", "T1", T0, "t0", DAY) == "ok"
+
+
+def test_sync_codes_upserts(storage):
+    assert storage.sync_codes("default", [("T1", 0, 0, None, None, ""), ("NEW", 1, 1, "t0", T0, "gate")]) == 2
+    assert storage.sync_codes("default", [("NEW", 1, 1, "t0", T0, "gate")]) == 1   # kirim ulang: tetap satu baris
+    assert storage.redeem("default", "T1", T0, "t0", DAY) == "invalid"
+    assert storage.redeem("default", "NEW", T0 + 60, "t1", DAY) == "used"
+    with storage.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM codes WHERE code='NEW'").fetchone()[0] == 1
+
+
+def test_claim_ticket_job_hands_out_each_job_once(storage):
+    for i in range(3):
+        storage.upsert_participant("default", {"name": f"p{i}", "email": f"p{i}@x.id", "status": "PAID"})
+    jobs = []
+
+    def worker():
+        while True:
+            job = storage.claim_ticket_job()
+            if not job:
+                return
+            jobs.append(job)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(j[0] for j in jobs) == sorted({j[0] for j in jobs}) and len(jobs) == 3
+    assert all(attempts == 1 for _id, _pid, attempts in jobs)
+    assert storage.ticket_queue_counts() == {"sending": 3}
+
+
+def test_mint_replaces_tokens_lost_to_another_minter(storage, monkeypatch):
+    """Cek tabrakan meleset (minter lain menyisipkan lebih dulu): token diganti, tanpa IntegrityError."""
+    if not hasattr(storage, "path"):
+        pytest.skip("mint_codes adalah tool data.db lokal (common.ensure_event khas SQLite)")
+    conn = sqlite3.connect(storage.path)
+    seq = itertools.count()
+    monkeypatch.setattr(mint, "_existing", lambda conn, candidates: set())
+    tokens = mint.mint_codes(3, conn=conn, generator=lambda nbytes: ["T1", "T2", "N1", "N2", "N3"][next(seq)])
+    assert sorted(tokens) == ["N1", "N2", "N3"]
+    conn.close()
+
+
+def test_claim_token_reserves_atomically(storage):
+    with storage.connection() as conn:
+        with conn:
+            conn.execute("INSERT INTO token_pool (code, minted_at) VALUES ('P1', '')")
+            has = _participant(conn, "a", "HAS")
+            new = _participant(conn, "b", "")
+
+        # peserta sudah punya kode: token tidak hangus, tetap di pool
+        assert mint.claim_token(conn, participant_id=has, event_id="default") is None
+        assert conn.execute("SELECT code FROM token_pool").fetchall() == [("P1",)]
+
+        assert mint.claim_token(conn, participant_id=new, event_id="default") == "P1"
+        assert conn.execute("SELECT code FROM participants WHERE id=?", (new,)).fetchone() == ("P1",)
+        assert conn.execute("SELECT COUNT(*) FROM token_pool").fetchone()[0] == 0
+    assert storage.redeem("default", "P1", T0, "t0", DAY) == "ok"
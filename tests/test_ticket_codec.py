@@ -0,0 +1,76 @@
+# tests/test_ticket_codec.py
+import pytest
+
+import ticket_codec
+
+
+@pytest.fixture
+def keys(monkeypatch):
+    """Kunci aktif A, kunci lama B (rotasi)."""
+    monkeypatch.setenv("TICKET_SIGNING_KEYS", "A:rahasia-baru,B:rahasia-lama")
+    monkeypatch.setattr(ticket_codec, "_KEYS", None)
+    monkeypatch.setattr(ticket_codec, "SIGNED_ONLY", False)
+    return ticket_codec.signing_keys()
+
+
+def test_sign_verify_roundtrip(keys):
+    token = ticket_codec.sign_token("ABC123XYZ")
+    assert token.startswith("ABC123XYZ.A")
+    assert ticket_codec.verify_signature(token) is True
+    # scanner/keyboard bisa menurunkan huruf
+    assert ticket_codec.verify_signature(token.lower()) is True
+
+
+def test_tampered_body_or_mac_rejected(keys):
+    token = ticket_codec.sign_token("ABC123XYZ")
+    body, tail = token.split(".")
+    assert ticket_codec.verify_signature("ABC123XYW." + tail) is False
+    flipped = tail[:-1] + ("0" if tail[-1] != "0" else "1")
+    assert ticket_codec.verify_signature(body + "." + flipped) is False
+    assert ticket_codec.verify_signature(token[:-1]) is False   # MAC terpotong
+    assert ticket_codec.verify_signature("." + tail) is False   # tanpa body
+
+
+def test_unknown_kid_rejected(keys):
+    token = ticket_codec.sign_token("ABC123XYZ")
+    assert ticket_codec.verify_signature(token.replace(".A", ".C", 1)) is False
+
+
+def test_rotated_key_still_accepted(keys, monkeypatch):
+    old = ticket_codec.sign_token("OLDTICKET", kid="B")
+    assert ticket_codec.verify_signature(old) is True
+    # kunci B dicabut -> tiket lama ditolak
+    monkeypatch.setenv("TICKET_SIGNING_KEYS", "A:rahasia-baru")
+    monkeypatch.setattr(ticket_codec, "_KEYS", None)
+    assert ticket_codec.verify_signature(old) is False
+
+
+def test_unsigned_codes(keys, monkeypatch):
+    assert ticket_codec.verify_signature("LEGACY_token-1") is None
+    monkeypatch.setattr(ticket_codec, "SIGNED_ONLY", True)
+    assert ticket_codec.verify_signature("LEGACY_token-1") is False
+
+
+def test_new_token_signed_for_every_scheme(keys, monkeypatch):
+    monkeypatch.setattr(ticket_codec, "SIGN_TICKETS", True)
+    for scheme in ("legacy", "url", "bare"):
+        token = ticket_codec.new_token(12, scheme=scheme)
+        assert ticket_codec.verify_signature(token) is True
+        assert ticket_codec.is_alnum_token(token)
+
+
+def test_sign_without_keys_raises(monkeypatch):
+    monkeypatch.setenv("TICKET_SIGNING_KEYS", "")
+    monkeypatch.setattr(ticket_codec, "_KEYS", None)
+    with pytest.raises(RuntimeError):
+        ticket_codec.sign_token("ABC")
+
+
+@pytest.mark.parametrize("scheme", ["legacy", "url", "bare"])
+def test_payload_roundtrip(scheme):
+    token = ticket_codec.generate_alnum_token()
+    assert ticket_codec.extract_token(ticket_codec.qr_payload(token, scheme=scheme)) == token
+
+
+def test_legacy_token_keeps_legacy_prefix():
+    assert ticket_codec.qr_payload("ab_c-1", scheme="bare").startswith(ticket_codec.LEGACY_PREFIX)
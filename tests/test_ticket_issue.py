@@ -0,0 +1,155 @@
+# tests/test_ticket_issue.py
+import sqlite3
+from contextlib import contextmanager
+
+import pytest
+
+import ticket_issue
+import ticket_store
+from storage import SqliteStorage
+
+T0 = 1_750_000_000
+DAY = 24 * 3600
+
+
+class FakeGmail:
+    """Pengganti service Gmail: mencatat pesan, atau gagal bila fail=True."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.sent = []
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def send(self, userId, body):
+        self._body = body
+        return self
+
+    def execute(self):
+        if self.fail:
+            raise OSError("Gmail tidak bisa dihubungi")
+        self.sent.append(self._body)
+        return {"id": str(len(self.sent))}
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(ticket_store, "STORE_DIR", str(tmp_path / "qr"))
+    monkeypatch.setattr(ticket_issue, "update_participant_sheet_row", lambda *a, **k: None)
+    monkeypatch.setattr(ticket_issue, "push_code_to_sheet", lambda *a, **k: None)
+    monkeypatch.setattr(ticket_issue, "SEND_PAUSE", 0)
+    storage = SqliteStorage(str(tmp_path / "data.db"))
+    storage.init()
+    return storage
+
+
+def _use_gmail(monkeypatch, service):
+    monkeypatch.setattr(ticket_issue, "_service", None)
+    monkeypatch.setattr(ticket_issue, "gmail_authenticate", lambda interactive=True: service)
+
+
+def _ingest(storage, email, status="PAID"):
+    return storage.upsert_participant("default", {"name": email.split("@")[0], "email": email, "status": status})
+
+
+def _code_row(storage, code):
+    with storage.connection() as conn:
+        return conn.execute("SELECT valid, used FROM codes WHERE event_id='default' AND code=?", (code,)).fetchone()
+
+
+def test_ingest_queues_only_new_paid_rows(storage):
+    pid, queued = _ingest(storage, "a@x.id", status="PENDING")
+    assert not queued
+    assert _ingest(storage, "a@x.id") == (pid, True)
+    assert _ingest(storage, "a@x.id") == (pid, False)   # sudah antre
+    assert storage.ticket_queue_counts() == {"pending": 1}
+
+
+def test_worker_sends_and_registers_code(storage, monkeypatch):
+    gmail = FakeGmail()
+    _use_gmail(monkeypatch, gmail)
+    pid, _ = _ingest(storage, "a@x.id")
+
+    assert ticket_issue.drain(storage, log=lambda *a: None) == 1
+    code = storage.get_participant(pid)["code"]
+    assert code and len(gmail.sent) == 1
+    assert _code_row(storage, code) == (1, 0)
+    assert storage.ticket_queue_counts() == {"done": 1}
+    assert storage.redeem("default", code, T0, "t0", DAY) == "ok"
+
+
+def test_failed_send_releases_code_and_retries(storage, monkeypatch):
+    _use_gmail(monkeypatch, FakeGmail(fail=True))
+    pid, _ = _ingest(storage, "a@x.id")
+
+    assert ticket_issue.process_one(storage, log=lambda *a: None)
+    assert storage.get_participant(pid)["code"] == ""
+    with storage.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM codes").fetchone()[0] == 0
+        status, attempts, next_at = conn.execute("SELECT status, attempts, next_at FROM ticket_queue").fetchone()
+    assert (status, attempts) == ("pending", 1) and next_at > 0
+
+
+def test_write_after_send_failure_keeps_ticket_valid(storage, monkeypatch):
+    """Email terkirim lalu penulisan DB berikutnya gagal: retry dilewati, tapi kode tetap dikenali gate."""
+    gmail = FakeGmail()
+    _use_gmail(monkeypatch, gmail)
+    pid, _ = _ingest(storage, "a@x.id")
+
+    class LockedAfterSend:
+        def __init__(self, raw):
+            self.raw = raw
+
+        def execute(self, sql, params=()):
+            if sql.startswith("UPDATE participants SET sent_at"):
+                raise sqlite3.OperationalError("database is locked")
+            return self.raw.execute(sql, params)
+
+        def __getattr__(self, name):
+            return getattr(self.raw, name)
+
+        def __enter__(self):
+            self.raw.__enter__()
+            return self
+
+        def __exit__(self, *exc):
+            return self.raw.__exit__(*exc)
+
+    real = storage.connection
+
+    @contextmanager
+    def locked():
+        with real() as conn:
+            yield LockedAfterSend(conn)
+
+    monkeypatch.setattr(storage, "connection", locked)
+    monkeypatch.setattr(ticket_issue, "RETRY_BASE", 0)
+    ticket_issue.process_one(storage, log=lambda *a: None)
+    monkeypatch.setattr(storage, "connection", real)
+
+    assert ticket_issue.drain(storage, log=lambda *a: None) == 1   # retry: sudah punya kode -> done
+    assert len(gmail.sent) == 1
+    code = storage.get_participant(pid)["code"]
+    assert storage.ticket_queue_counts() == {"done": 1}
+    assert storage.redeem("default", code, T0, "t0", DAY) == "ok"
+
+
+def test_stale_sending_job_is_reclaimed(storage, monkeypatch):
+    """Worker mati setelah mengambil antrean: baris 'sending' diambil alih setelah SEND_STALE."""
+    gmail = FakeGmail()
+    _use_gmail(monkeypatch, gmail)
+    pid, _ = _ingest(storage, "a@x.id")
+    job_id, _pid, _attempts = storage.claim_ticket_job()   # worker lain, lalu mati
+
+    assert ticket_issue.drain(storage, log=lambda *a: None) == 0   # masih dianggap sedang dikirim
+    with storage.connection() as conn:
+        with conn:
+            conn.execute("UPDATE ticket_queue SET updated_at=updated_at-? WHERE id=?", (ticket_issue.SEND_STALE + 1, job_id))
+
+    assert ticket_issue.drain(storage, log=lambda *a: None) == 1
+    assert len(gmail.sent) == 1 and storage.get_participant(pid)["code"]
+    assert storage.ticket_queue_counts() == {"done": 1}
@@ -0,0 +1,37 @@
+# tests/test_ticket_store.py
+import sqlite3
+
+import pytest
+
+import ticket_store
+from storage import SqliteStorage
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    path = str(tmp_path / "data.db")
+    SqliteStorage(path).init()
+    with sqlite3.connect(path) as conn:
+        conn.executemany("INSERT INTO codes (event_id, code) VALUES ('default', ?)",
+                         [("AbCdEfGh1234",), ("ZZZZZZZZaaaa",), ("ZZZZZZZZbbbb",), ("SHORT",), ("SHORTER",)])
+        conn.execute("INSERT INTO participants (name, code) VALUES ('p', 'PpPpPpPp5678')")
+    monkeypatch.setattr(ticket_store, "get_conn", lambda: sqlite3.connect(path))
+    monkeypatch.setattr(ticket_store, "STORE_DIR", str(tmp_path / "store"))
+    return path
+
+
+def test_import_resolves_truncated_names(db, tmp_path):
+    src = tmp_path / "flat"
+    src.mkdir()
+    for name in ("qr_AbCdEfGh", "qr_PpPpPpPp", "qr_ZZZZZZZZ", "qr_NOTACODE", "SHORT", "notes"):
+        (src / f"{name}.png").write_bytes(name.encode())
+
+    n, skipped = ticket_store.import_flat_dir(str(src))
+    assert n == 3
+    assert sorted(skipped) == ["notes.png", "qr_NOTACODE.png", "qr_ZZZZZZZZ.png"]   # tidak ada / ambigu
+    with sqlite3.connect(db) as conn:
+        assert ticket_store.get("AbCdEfGh1234", conn=conn) == b"qr_AbCdEfGh"
+        assert ticket_store.get("PpPpPpPp5678", conn=conn) == b"qr_PpPpPpPp"
+        assert ticket_store.get("SHORT", conn=conn) == b"SHORT"   # cocok persis walau jadi awalan SHORTER
+        codes = {r[0] for r in conn.execute("SELECT code FROM ticket_files")}
+    assert codes == {"AbCdEfGh1234", "PpPpPpPp5678", "SHORT"}
@@ -0,0 +1,177 @@
+# ticket_codec.py
+"""
+Encoding token + isi QR tiket.
+
+Skema isi QR (TICKET_SCHEME):
+- "legacy" : https://bit.ly/thisisfullycustom?id=<TOKEN>   (default, tiket lama)
+- "url"    : <TICKET_URL_BASE><TOKEN>, mis. HTTPS://TIKET.EXAMPLE.COM/S/<TOKEN>
+- "bare"   : hanya <TOKEN>
+
+Untuk "url"/"bare" token hanya memakai 0-9 A-Z dan URL ditulis huruf besar,
+sehingga seluruh isi QR masuk mode alfanumerik QR (5.5 bit/karakter, bukan 8)
+-> versi QR lebih kecil, modul lebih besar, scan lebih cepat di kamera murah.
+Token lama (berisi '_' / '-') tetap dirender dengan prefix legacy.
+
+Tiket bertanda tangan (opsional, TICKET_SIGN=1):
+    <BODY>.<KID><MAC>
+KID = 1 karakter id kunci, MAC = HMAC-SHA256(kunci, BODY.KID) dipotong ke
+TICKET_MAC_CHARS karakter base36. Semua karakter tetap di set alfanumerik QR.
+Kode palsu/salah ketik ditolak oleh verify_signature() (compare_digest,
+tanpa akses DB). Rotasi kunci: TICKET_SIGNING_KEYS="B:rahasia2,A:rahasia1"
+-> kunci pertama dipakai untuk tiket baru, semua kunci masih diterima.
+
+Ukur versi & jumlah modul per skema:
+    python ticket_codec.py --measure
+"""
+import os
+import hmac
+import math
+import hashlib
+import secrets
+import argparse
+from urllib.parse import urlparse, parse_qs
+
+SCHEME = os.environ.get("TICKET_SCHEME", "legacy")   # legacy | url | bare
+LEGACY_PREFIX = "https://bit.ly/thisisfullycustom?id="
+URL_BASE = os.environ.get("TICKET_URL_BASE", "HTTPS://TIKET.EXAMPLE.COM/S/").upper()
+
+SIGN_TICKETS = os.environ.get("TICKET_SIGN", "0") == "1"
+SIGNED_ONLY = os.environ.get("TICKET_SIGNED_ONLY", "0") == "1"   # tolak kode tanpa tanda tangan
+MAC_CHARS = int(os.environ.get("TICKET_MAC_CHARS", "8"))          # 8 karakter base36 ~ 41 bit
+SIG_SEP = "."   # tidak pernah muncul di token lama (urlsafe) maupun token A-Z0-9
+
+ALNUM = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+# himpunan karakter mode alfanumerik QR (ISO/IEC 18004)
+QR_ALNUM_SET = set(ALNUM + " $%*+-./:")
+
+
+def is_alnum_token(token):
+    return bool(token) and all(c in ALNUM or c == SIG_SEP for c in token)
+
+
+def generate_alnum_token(bits=96):
+    """Token acak dari 0-9A-Z dengan entropi minimal `bits`."""
+    length = math.ceil(bits / math.log2(len(ALNUM)))
+    return "".join(secrets.choice(ALNUM) for _ in range(length))
+
+
+def new_token(nbytes=12, scheme=None):
+    """Token baru sesuai skema aktif; entropi setara `nbytes` byte acak."""
+    scheme = scheme or SCHEME
+    if SIGN_TICKETS and signing_keys():
+        return sign_token(generate_alnum_token(nbytes * 8))
+    if scheme == "legacy":
+        return secrets.token_urlsafe(nbytes).upper()
+    return generate_alnum_token(nbytes * 8)
+
+
+# === TANDA TANGAN HMAC ===
+_KEYS = None
+
+
+def signing_keys():
+    """Dict kid -> kunci (bytes), urutan sesuai env; kunci pertama = aktif."""
+    global _KEYS
+    if _KEYS is None:
+        keys = {}
+        for item in os.environ.get("TICKET_SIGNING_KEYS", "").split(","):
+            kid, _, secret = item.strip().partition(":")
+            kid = kid.upper()
+            if len(kid) == 1 and kid in ALNUM and secret:
+                keys[kid] = secret.encode("utf-8")
+        _KEYS = keys
+    return _KEYS
+
+
+def _mac(key, message):
+    n = int.from_bytes(hmac.new(key, message.encode("ascii"), hashlib.sha256).digest()[:16], "big")
+    out = []
+    for _ in range(MAC_CHARS):
+        n, r = divmod(n, len(ALNUM))
+        out.append(ALNUM[r])
+    return "".join(out)
+
+
+def sign_token(body, kid=None):
+    keys = signing_keys()
+    if not keys:
+        raise RuntimeError("TICKET_SIGNING_KEYS belum diset")
+    kid = kid or next(iter(keys))
+    return f"{body}{SIG_SEP}{kid}{_mac(keys[kid], body + SIG_SEP + kid)}"
+
+
+def verify_signature(code):
+    """
+    Cek tanda tangan tanpa DB.
+    Return True (tanda tangan cocok), False (palsu/rusak/kunci tidak dikenal,
+    atau tanpa tanda tangan saat TICKET_SIGNED_ONLY=1), None (kode lama tanpa
+    tanda tangan -> lanjut cek DB seperti biasa).
+    """
+    body, sep, tail = (code or "").upper().rpartition(SIG_SEP)
+    if not sep:
+        return False if SIGNED_ONLY else None
+    keys = signing_keys()
+    if len(tail) != MAC_CHARS + 1 or not body or tail[0] not in keys:
+        return False
+    kid, mac = tail[0], tail[1:]
+    return hmac.compare_digest(mac, _mac(keys[kid], body + SIG_SEP + kid))
+
+
+def qr_payload(token, scheme=None):
+    """Isi QR untuk satu token. Token non-alfanumerik selalu memakai prefix legacy."""
+    scheme = scheme or SCHEME
+    if scheme == "legacy" or not is_alnum_token(token):
+        return f"{LEGACY_PREFIX}{token}"
+    if scheme == "url":
+        return f"{URL_BASE}{token}"
+    if scheme == "bare":
+        return token
+    raise ValueError(f"Skema tiket tidak dikenal: {scheme}")
+
+
+def extract_token(payload):
+    """Kebalikan qr_payload: ambil token dari isi QR (semua skema)."""
+    payload = (payload or "").strip()
+    if "://" not in payload:
+        return payload
+    parsed = urlparse(payload)
+    query = parse_qs(parsed.query)
+    for key in ("id", "token"):
+        if query.get(key):
+            return query[key][0]
+    return parsed.path.rstrip("/").rsplit("/", 1)[-1]
+
+
+# === PENGUKURAN ===
+def measure(samples=200, nbytes=12, ec="M"):
+    import qr_render
+    rows = []
+    cases = [
+        ("legacy (token lama)", lambda: qr_payload(new_token(nbytes, "legacy"), "legacy")),
+        ("legacy + token A-Z0-9", lambda: qr_payload(generate_alnum_token(nbytes * 8), "legacy")),
+        ("url huruf besar", lambda: qr_payload(generate_alnum_token(nbytes * 8), "url")),
+        ("bare", lambda: qr_payload(generate_alnum_token(nbytes * 8), "bare")),
+    ]
+    print(f"{'skema':<24}{'panjang':>9}{'versi':>7}{'modul':>8}")
+    for label, make in cases:
+        versions, lengths = [], []
+        for _ in range(samples):
+            payload = make()
+            lengths.append(len(payload))
+            matrix = qr_render.qr_matrix(payload, border=0, ec=ec)
+            versions.append((len(matrix) - 17) // 4)
+        v = max(versions)
+        rows.append((label, v))
+        print(f"{label:<24}{sum(lengths) / samples:>9.1f}{v:>7}{17 + 4 * v:>5}x{17 + 4 * v:<3}")
+    return rows
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Encoding token/isi QR tiket")
+    ap.add_argument("--measure", action="store_true", help="bandingkan versi QR per skema")
+    ap.add_argument("--nbytes", type=int, default=12, help="entropi token (byte)")
+    args = ap.parse_args()
+    if args.measure:
+        measure(nbytes=args.nbytes)
+    else:
+        print(qr_payload(new_token(args.nbytes)))
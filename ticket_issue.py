@@ -0,0 +1,398 @@
+# ticket_issue.py
+"""
+Penerbitan tiket: token + QR, email Gmail, lalu kode dicatat di DB dan Sheets.
+
+- issue_ticket(): satu peserta; dipakai tombol "Send Tickets" (send_ticket_gui.py)
+  dan worker antrean di bawah. Kode dipesan dulu di participants dengan UPDATE
+  bersyarat (kode masih kosong) dan didaftarkan ke codes dalam transaksi yang
+  sama -> GUI dan worker tidak pernah mengirim dua tiket ke peserta yang sama
+  (keduanya memakai storage.get_storage, DB yang sama lewat DATABASE_URL), dan
+  tiket yang sudah terkirim selalu dikenali gate. Email gagal -> pesanan
+  kode dan baris codes-nya dibatalkan.
+- Antrean: endpoint ingest (verify_app POST /api/ingest) memasukkan peserta yang
+  baru PAID ke ticket_queue (storage.upsert_participant). start_worker() membuat
+  thread (sekali per proses) yang mengambil antrean secara atomik
+  (storage.claim_ticket_job), jadi aman walau ada banyak worker gunicorn/replika.
+  Gagal -> dicoba lagi setelah RETRY_BASE * 2^(percobaan-1) detik, setelah
+  MAX_ATTEMPTS ditandai failed. Antrean yang tertahan 'sending' lebih dari
+  SEND_STALE detik (worker mati/restart di tengah kirim) dikembalikan ke
+  'pending' di awal tiap drain(); bila peserta ternyata sudah punya kode, antrean
+  itu ditutup 'done' (kodenya sudah terdaftar di codes).
+- wake(): ingest di proses yang sama membangunkan worker seketika; proses lain
+  mengecek antrean tiap POLL_INTERVAL detik.
+- Worker tidak pernah membuka browser OAuth: token.json harus sudah ada
+  (jalankan GUI sekali untuk otorisasi). TICKET_WORKER=0 mematikan worker di
+  verifier, mis. bila antrean dikerjakan `python ticket_issue.py worker` di
+  mesin lain dengan DATABASE_URL yang sama.
+
+CLI:
+    python ticket_issue.py worker    # kerjakan antrean di proses ini
+    python ticket_issue.py status    # jumlah antrean per status
+"""
+import os
+import time
+import base64
+import random
+import sqlite3
+import argparse
+import threading
+from datetime import datetime
+from html import escape
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.mime.image import MIMEImage
+
+import ticket_codec
+import metrics
+from common import push_code_to_sheet, update_participant_sheet_row, DB_FILE
+from mint import claim_token
+
+TICKET_WORKER = os.environ.get("TICKET_WORKER", "1") == "1"
+POLL_INTERVAL = float(os.environ.get("TICKET_POLL_INTERVAL", "5"))   # detik; antrean dari proses lain
+SEND_PAUSE = float(os.environ.get("TICKET_SEND_PAUSE", "1"))         # jeda antar email (batas kirim Gmail)
+SEND_STALE = int(os.environ.get("TICKET_SEND_STALE", "600"))      # detik 'sending' -> worker dianggap mati
+MAX_ATTEMPTS = 5
+RETRY_BASE = 30   # detik
+
+
+def normalize(v):
+    return str(v).strip() if v is not None else ""
+
+
+def is_paid(status):
+    return normalize(status).upper() == "PAID"
+
+
+# === KONFIGURASI EMAIL ===
+SCOPES_GMAIL = ["https://www.googleapis.com/auth/gmail.send"]
+
+# put your sending email here (must match the account you authorize via client_secret.json)
+SENDER_EMAIL = "youremail@gmail.com"
+
+# Event info (edit as needed)
+EVENT_NAME = "CUPO x G-VOZ 2K25"
+VENUE = "SMAN 13 Surabaya"
+EVENT_DATETIME = "17 Desember 2025, 15:20"
+
+
+# ====== EMAIL HTML VARIATION FUNCTION ======
+def make_email_html(name, token, event=None, venue=None, datetime_str=None):
+    name_s = escape(name or "")
+    token_s = escape(token or "")
+    event_s = escape(event or "")
+    venue_s = escape(venue or "")
+    datetime_s = escape(datetime_str or "")
+
+    header_lines = []
+    if event_s:
+        header_lines.append(f"<div class='event'>{event_s}</div>")
+    if datetime_s:
+        header_lines.append(f"<div class='datetime'>{datetime_s}</div>")
+    if venue_s:
+        header_lines.append(f"<div class='venue'>{venue_s}</div>")
+    header_html = "<br>".join(header_lines)
+
+    templates = [
+        """
+        <div class="card">
+          <h1>🎉 {event}</h1>
+          {header}
+          <p class="lead">Halo <strong>{name}</strong>,</p>
+          <p>Kami sudah menerima pembayaranmu. Berikut tiket digital untuk acara kami.</p>
+          <div class="code">Kode: <strong>{token}</strong></div>
+          <img src="cid:qrimage" alt="QR Ticket" class="qr">
+          <p class="note">Tunjukkan QR ini saat registrasi. Sampai jumpa!</p>
+          <div class="sig">— Panitia</div>
+        </div>
+        """,
+
+        """
+        <div class="card">
+          <h2>{event}</h2>
+          {header}
+          <p>Yth. <strong>{name}</strong>,</p>
+          <p>Terima kasih atas partisipasi dan pembelian tiket Anda. Detail tiket digital adalah sebagai berikut:</p>
+          <div class="code boxed">{token}</div>
+          <img src="cid:qrimage" alt="QR Ticket" class="qr">
+          <p class="muted">Mohon hadir 15 menit lebih awal. Salam, Panitia.</p>
+        </div>
+        """,
+
+        """
+        <div class="card">
+          <h2>🎟️ Tiket Anda</h2>
+          {header}
+          <p class="lead">Hai <strong>{name}</strong>,</p>
+          <img src="cid:qrimage" alt="QR Ticket" class="qr">
+          <div style="margin:12px 0;"><span class="btn">Tunjukkan QR saat masuk</span></div>
+          <div class="code small">{token}</div>
+          <p class="muted">Terima kasih telah membeli tiket.</p>
+        </div>
+        """,
+
+        """
+        <div class="card">
+          <h2>Selamat Datang!</h2>
+          {header}
+          <p>Halo <strong>{name}</strong>, terima kasih sudah bergabung.</p>
+          <div class="qr-wrap"><img src="cid:qrimage" alt="QR Ticket" class="qr"></div>
+          <p class="instructions">Langkah singkat: simpan email ini & tampilkan QR pada meja registrasi.</p>
+          <div class="code">{token}</div>
+        </div>
+        """,
+
+        """
+        <div class="card">
+          <h3>{event}</h3>
+          {header}
+          <p><strong>{name}</strong></p>
+          <img src="cid:qrimage" alt="QR Ticket" class="qr">
+          <div class="code tiny">{token}</div>
+          <p class="muted">Panitia</p>
+        </div>
+        """,
+    ]
+
+    css = """
+    <style>
+      body { margin:0; padding:0; font-family: Arial, sans-serif; background:#f4f6f8; }
+      .wrap { display:flex; align-items:center; justify-content:center; padding:18px; }
+      .card {
+        width:100%; max-width:520px; background:#fff; border-radius:12px; padding:20px;
+        box-shadow:0 8px 22px rgba(12,20,36,0.08); text-align:center; margin:10px auto;
+      }
+      .card h1, .card h2, .card h3 { margin:6px 0 10px 0; color:#0f172a; }
+      .lead { font-size:15px; margin:6px 0; color:#0f172a; }
+      .muted { color:#6b7280; font-size:13px; margin-top:8px; }
+      .code { margin:10px auto; font-weight:700; background:#f8fafc; padding:8px 12px; display:inline-block; border-radius:8px; color:#0f172a; }
+      .code.boxed { border:1px solid #e6eef9; padding:10px 14px; }
+      .code.small { font-size:14px; padding:6px 10px; }
+      .code.tiny { font-size:13px; padding:5px 8px; background:transparent; }
+      .qr { width:240px; height:240px; border-radius:8px; border:1px solid #e6eef9; display:block; margin:12px auto; }
+      .btn { display:inline-block; background:#2563eb; color:#fff; padding:10px 14px; border-radius:8px; text-decoration:none; font-weight:600; }
+      .instructions { font-size:13px; color:#374151; margin-top:8px; }
+      .event { font-weight:700; color:#374151; font-size:14px; }
+      .datetime, .venue { color:#6b7280; font-size:13px; }
+      .sig { margin-top:10px; color:#1f2937; font-weight:600; }
+      .qr-wrap { display:flex; justify-content:center; }
+      @media(max-width:480px){
+        .card { padding:16px; }
+        .qr { width:200px; height:200px; }
+      }
+    </style>
+    """
+
+    tpl = random.choice(templates)
+    html_body = tpl.format(name=name_s, token=token_s, event=event_s, header=header_html)
+    full_html = f"""<html><head>{css}</head><body><div class=\"wrap\">{html_body}</div></body></html>"""
+    return full_html
+
+
+def gmail_authenticate(interactive=True):
+    with metrics.api_call("gmail", "auth"):
+        return _gmail_authenticate(interactive)
+
+
+def _gmail_authenticate(interactive=True):
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from googleapiclient.discovery import build
+
+    creds = None
+    if os.path.exists("token.json"):
+        creds = Credentials.from_authorized_user_file("token.json", SCOPES_GMAIL)
+    if not creds or not creds.valid:
+        if creds and creds.expired and creds.refresh_token:
+            creds.refresh(Request())
+        elif not interactive:
+            # worker di server: tidak bisa membuka browser OAuth
+            raise RuntimeError("token.json Gmail belum ada/tidak valid; otorisasi dulu lewat send_ticket_gui.py")
+        else:
+            from google_auth_oauthlib.flow import InstalledAppFlow
+            flow = InstalledAppFlow.from_client_secrets_file("client_secret.json", SCOPES_GMAIL)
+            creds = flow.run_local_server(port=0)
+        with open("token.json", "w") as token:
+            token.write(creds.to_json())
+    return build("gmail", "v1", credentials=creds)
+
+
+def create_message(sender, to, subject, html_body, qr_png, qr_filename="qr.png"):
+    msg = MIMEMultipart("related")
+    msg["To"] = to
+    msg["From"] = sender
+    msg["Subject"] = subject
+
+    alt = MIMEMultipart("alternative")
+    msg.attach(alt)
+    alt.attach(MIMEText(html_body, "html"))
+
+    if qr_png:
+        img = MIMEImage(qr_png)
+        img.add_header("Content-ID", "<qrimage>")
+        img.add_header("Content-Disposition", "inline", filename=qr_filename)
+        msg.attach(img)
+
+    raw = base64.urlsafe_b64encode(msg.as_bytes()).decode()
+    return {"raw": raw}
+
+
+def send_message(service, message):
+    with metrics.api_call("gmail", "send"):
+        return service.users().messages().send(userId="me", body=message).execute()
+
+
+# === KIRIM SATU TIKET ===
+def issue_ticket(conn, participant, service=None, log=print):
+    """
+    Kirim tiket ke satu peserta (dict: id, event_id, name, email, sheet_row).
+    `conn`: storage.connection() (GUI dan worker, DB sesuai DATABASE_URL).
+    Return token, atau None jika peserta ternyata sudah punya kode.
+    """
+    import qr_render      # qrcode + PIL baru dimuat saat tiket pertama dikirim,
+    import ticket_store   # bukan saat verify_app mengimpor modul ini
+    pid, name, email = participant["id"], normalize(participant["name"]), normalize(participant["email"])
+    # ambil dari pool + pasang ke peserta + daftarkan ke codes, satu transaksi
+    token = claim_token(conn, participant_id=pid, event_id=participant["event_id"])
+    if token is None:
+        return None   # sudah dikirim GUI/worker lain
+
+    try:
+        qr_png = qr_render.render(ticket_codec.qr_payload(token))
+        if isinstance(conn, sqlite3.Connection):   # ticket_store hanya ada di data.db
+            ticket_store.put(token, qr_png, conn=conn)
+        log(f"📦 QR generated: {token}")
+        html = make_email_html(name=name, token=token, event=EVENT_NAME, venue=VENUE, datetime_str=EVENT_DATETIME)
+        msg = create_message(SENDER_EMAIL, email, f"Tiket Digital – {EVENT_NAME}", html, qr_png, f"{token}.png")
+        send_message(service or gmail_authenticate(), msg)
+    except Exception:
+        with conn:
+            conn.execute("UPDATE participants SET code='' WHERE id=? AND code=?", (pid, token))
+            conn.execute("DELETE FROM codes WHERE event_id=? AND code=?", (participant["event_id"], token))
+        raise
+    log(f"✉️ SENT → {email}")
+
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with conn:
+        conn.execute("UPDATE participants SET sent_at=? WHERE id=?", (now, pid))
+
+    try:
+        update_participant_sheet_row(participant["sheet_row"], token, now, email=email, name=name)
+    except Exception as e:
+        log(f"⚠️ Sheet Peserta update failed: {e}")
+    try:
+        push_code_to_sheet(token, email)
+    except Exception as e:
+        log(f"⚠️ Sheet Codes append failed: {e}")
+    return token
+
+
+# === ANTREAN (dari endpoint ingest) ===
+_wake = threading.Event()
+_worker_pid = None
+_service = None
+_lock = threading.Lock()
+
+
+def wake():
+    """Bangunkan worker di proses ini (ada antrean baru)."""
+    _wake.set()
+
+
+def _worker_service():
+    global _service
+    if _service is None:
+        _service = gmail_authenticate(interactive=False)
+    return _service
+
+
+def process_one(storage, log=print):
+    """Kerjakan satu antrean yang siap. Return False jika antrean kosong."""
+    global _service
+    job = storage.claim_ticket_job()
+    if not job:
+        return False
+    job_id, participant_id, attempts = job
+    participant = storage.get_participant(participant_id)
+    if (not participant or normalize(participant["code"]) or not is_paid(participant["status"])
+            or not normalize(participant["email"])):
+        storage.finish_ticket_job(job_id, "done", error="dilewati: sudah punya kode / tidak PAID / tanpa email")
+        return True
+
+    started = time.perf_counter()
+    try:
+        with storage.connection() as conn:
+            token = issue_ticket(conn, participant, service=_worker_service(), log=log)
+    except Exception as e:
+        _service = None   # kredensial/koneksi Gmail dibuat ulang pada percobaan berikutnya
+        metrics.inc("tickets_issued_total", outcome="error")
+        if attempts >= MAX_ATTEMPTS:
+            storage.finish_ticket_job(job_id, "failed", error=str(e))
+            log(f"❌ Tiket {participant['email']} gagal setelah {attempts} percobaan: {e}")
+        else:
+            retry_at = int(time.time()) + RETRY_BASE * 2 ** (attempts - 1)
+            storage.finish_ticket_job(job_id, "pending", error=str(e), next_at=retry_at)
+            log(f"⚠️ Tiket {participant['email']} gagal (percobaan {attempts}), dicoba lagi: {e}")
+        return True
+    storage.finish_ticket_job(job_id, "done")
+    metrics.inc("tickets_issued_total", outcome="sent" if token else "skipped")
+    metrics.observe("ticket_issue_seconds", time.perf_counter() - started)
+    return True
+
+
+def reclaim_stale(storage, max_age=SEND_STALE, log=print):
+    """Kembalikan antrean 'sending' yang macet > max_age detik ke 'pending'. Return jumlahnya."""
+    n = storage.reclaim_ticket_jobs(int(time.time()) - max_age)
+    if n:
+        log(f"⚠️ {n} antrean tiket macet di 'sending' dikembalikan ke antrean")
+    return n
+
+
+def drain(storage, log=print):
+    """Kerjakan antrean sampai kosong (antrean macet diambil alih dulu). Return jumlah yang diproses."""
+    reclaim_stale(storage, log=log)
+    n = 0
+    while process_one(storage, log):
+        n += 1
+        time.sleep(SEND_PAUSE)
+    return n
+
+
+def start_worker(storage):
+    """Thread latar (sekali per proses) yang mengerjakan ticket_queue; TICKET_WORKER=0 = mati."""
+    global _worker_pid
+    if not TICKET_WORKER or _worker_pid == os.getpid():
+        return
+    with _lock:
+        if _worker_pid == os.getpid():
+            return
+        _worker_pid = os.getpid()
+
+    def run():
+        while True:
+            _wake.clear()
+            try:
+                drain(storage)
+            except Exception as e:
+                print("⚠️ Worker tiket error:", e)
+            _wake.wait(POLL_INTERVAL)
+
+    threading.Thread(target=run, name="ticket-worker", daemon=True).start()
+
+
+if __name__ == "__main__":
+    from storage import get_storage
+
+    ap = argparse.ArgumentParser(description="Antrean kirim tiket (ticket_queue)")
+    ap.add_argument("cmd", choices=("worker", "status"))
+    args = ap.parse_args()
+
+    storage = get_storage(DB_FILE)
+    storage.init()
+    if args.cmd == "status":
+        print(storage.ticket_queue_counts() or "antrean kosong")
+    else:
+        print(f"Worker tiket berjalan (cek antrean tiap {POLL_INTERVAL:g} detik)...")
+        while True:
+            if drain(storage):
+                metrics.push(storage)
+            time.sleep(POLL_INTERVAL)
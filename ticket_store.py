@@ -0,0 +1,233 @@
+# ticket_store.py
+"""
+Penyimpanan gambar tiket QR.
+
+Dua backend:
+- "fs"     : file di subfolder ter-hash, output_qr/ab/cd/<sha1>.png
+             (maks. 256 file/folder di level bawah untuk jutaan tiket,
+             nama file dari hash penuh -> tidak ada tabrakan seperti token[:8])
+- "sqlite" : blob di tabel ticket_blobs (tanpa overhead satu-file-per-tiket)
+
+Tabel manifest `ticket_files` memetakan code -> lokasi, sehingga lookup
+tidak pernah perlu listing direktori.
+
+CLI:
+    python ticket_store.py export -o paid.zip --status PAID
+    python ticket_store.py export -o - --codes-file daftar.txt > tiket.zip
+    python ticket_store.py import output_qr     # salin file datar lama ke store
+"""
+import os
+import sys
+import hashlib
+import zipfile
+import argparse
+from datetime import datetime
+
+from common import get_conn, init_db, QR_DIR, DEFAULT_EVENT
+
+STORE_BACKEND = os.environ.get("TICKET_STORE_BACKEND", "fs")  # fs | sqlite
+STORE_DIR = os.environ.get("TICKET_STORE_DIR", QR_DIR)
+
+
+def shard_path(code, ext="png"):
+    digest = hashlib.sha1(code.encode("utf-8")).hexdigest()
+    return os.path.join(STORE_DIR, digest[:2], digest[2:4], f"{digest}.{ext}")
+
+
+def _write_file(code, data):
+    path = shard_path(code)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return path
+
+
+def put_many(items, conn=None, backend=None):
+    """
+    Simpan banyak tiket sekaligus; `items` = iterable (code, png_bytes).
+    Manifest (dan blob, untuk backend sqlite) ditulis dalam satu transaksi.
+    Return dict code -> lokasi.
+    """
+    backend = backend or STORE_BACKEND
+    own_conn = conn is None
+    conn = conn or get_conn()
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    manifest, blobs, locations = [], [], {}
+    for code, data in items:
+        if backend == "sqlite":
+            location = f"blob:{code}"
+            blobs.append((code, data))
+        else:
+            location = _write_file(code, data)
+        manifest.append((code, backend, location, len(data), now))
+        locations[code] = location
+    with conn:
+        if blobs:
+            conn.executemany("INSERT OR REPLACE INTO ticket_blobs (code, data) VALUES (?,?)", blobs)
+        conn.executemany(
+            "INSERT OR REPLACE INTO ticket_files (code, backend, location, size, created_at) VALUES (?,?,?,?,?)",
+            manifest,
+        )
+    if own_conn:
+        conn.close()
+    return locations
+
+
+def put(code, data, conn=None, backend=None):
+    return put_many([(code, data)], conn=conn, backend=backend)[code]
+
+
+def locate(code, conn=None):
+    """Return (backend, location) dari manifest, atau None."""
+    own_conn = conn is None
+    conn = conn or get_conn()
+    row = conn.execute("SELECT backend, location FROM ticket_files WHERE code=?", (code,)).fetchone()
+    if own_conn:
+        conn.close()
+    return row
+
+
+def get(code, conn=None):
+    """Ambil bytes PNG tiket, atau None jika tidak ada di store."""
+    own_conn = conn is None
+    conn = conn or get_conn()
+    try:
+        row = locate(code, conn)
+        if not row:
+            return None
+        backend, location = row
+        if backend == "sqlite":
+            blob = conn.execute("SELECT data FROM ticket_blobs WHERE code=?", (code,)).fetchone()
+            return bytes(blob[0]) if blob else None
+        if not os.path.exists(location):
+            return None
+        with open(location, "rb") as f:
+            return f.read()
+    finally:
+        if own_conn:
+            conn.close()
+
+
+# === EXPORT ===
+def cohort_codes(conn, status=None, codes_file=None, event_id=None):
+    """Iterasi code untuk satu kelompok tiket (tanpa memuat semuanya ke memori)."""
+    if codes_file:
+        with open(codes_file, encoding="utf-8") as f:
+            for line in f:
+                code = line.strip()
+                if code:
+                    yield code
+        return
+    if status:
+        cur = conn.execute(
+            "SELECT code FROM participants WHERE event_id=? AND UPPER(status)=? AND code IS NOT NULL AND code != ''",
+            (event_id or DEFAULT_EVENT, status.upper()),
+        )
+    else:
+        cur = conn.execute("SELECT code FROM ticket_files ORDER BY code")
+    for (code,) in cur:
+        yield code
+
+
+def export_zip(codes, out, conn=None):
+    """
+    Tulis zip berisi tiket untuk `codes` ke file-like `out` (boleh non-seekable, mis. stdout).
+    Entry ditulis satu per satu; PNG sudah terkompresi jadi disimpan STORED.
+    """
+    own_conn = conn is None
+    conn = conn or get_conn()
+    written = missing = 0
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_STORED) as zf:
+        for code in codes:
+            data = get(code, conn)
+            if data is None:
+                missing += 1
+                continue
+            zf.writestr(f"{code}.png", data)
+            written += 1
+    if own_conn:
+        conn.close()
+    return written, missing
+
+
+# === IMPORT FILE DATAR LAMA ===
+def _resolve_code(conn, name):
+    """
+    Nama file lama -> kode: cocok persis, atau satu-satunya kode di codes/participants
+    yang diawali `name` (nama token[:8] dari qrgen_secure). Tidak ada / >1 -> None.
+    """
+    if not name:
+        return None
+    found = set()
+    for table in ("codes", "participants"):
+        if conn.execute(f"SELECT 1 FROM {table} WHERE code=?", (name,)).fetchone():
+            return name
+        # rentang [name, name+U+FFFF) = awalan `name`, tetap memakai indeks kolom code
+        found.update(r[0] for r in conn.execute(
+            f"SELECT DISTINCT code FROM {table} WHERE code >= ? AND code < ? LIMIT 2", (name, name + "\uffff")
+        ))
+    return found.pop() if len(found) == 1 else None
+
+
+def import_flat_dir(src_dir, backend=None, batch=500):
+    """
+    Masukkan PNG lama (qr_<token>.png / <token>.png) ke store + manifest.
+    qrgen_secure lama menamai file qr_<token[:8]>.png: nama dicocokkan ke codes/participants
+    dan dipakai hanya jika tepat satu kode cocok; tidak cocok / ambigu -> dilewati.
+    Return (jumlah diimpor, daftar nama file yang dilewati).
+    """
+    conn = get_conn()
+    pending, total, skipped = [], 0, []
+    for entry in os.scandir(src_dir):
+        if not entry.is_file() or not entry.name.endswith(".png"):
+            continue
+        name = entry.name[:-4]
+        if name.startswith("qr_"):
+            name = name[3:]
+        code = _resolve_code(conn, name)
+        if code is None:
+            skipped.append(entry.name)
+            continue
+        with open(entry.path, "rb") as f:
+            pending.append((code, f.read()))
+        if len(pending) >= batch:
+            total += len(put_many(pending, conn=conn, backend=backend))
+            pending = []
+    total += len(put_many(pending, conn=conn, backend=backend))
+    conn.close()
+    return total, skipped
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Ticket image store")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ex = sub.add_parser("export", help="zip tiket satu kelompok")
+    ex.add_argument("-o", "--output", required=True, help="file zip, atau '-' untuk stdout")
+    ex.add_argument("--status", help="filter participants.status (mis. PAID)")
+    ex.add_argument("--codes-file", help="file berisi satu code per baris")
+    ex.add_argument("--event", default=DEFAULT_EVENT, help="id acara untuk filter --status")
+    im = sub.add_parser("import", help="salin folder PNG datar ke store")
+    im.add_argument("src_dir")
+    im.add_argument("--backend", choices=("fs", "sqlite"))
+    args = ap.parse_args()
+
+    init_db()
+    if args.cmd == "export":
+        conn = get_conn()
+        codes = cohort_codes(conn, status=args.status, codes_file=args.codes_file, event_id=args.event)
+        if args.output == "-":
+            written, missing = export_zip(codes, sys.stdout.buffer, conn)
+        else:
+            with open(args.output, "wb") as f:
+                written, missing = export_zip(codes, f, conn)
+        conn.close()
+        print(f"Exported {written} tiket ({missing} tidak ditemukan di store)", file=sys.stderr)
+    elif args.cmd == "import":
+        n, skipped = import_flat_dir(args.src_dir, backend=args.backend)
+        print(f"Imported {n} file ke store ({args.backend or STORE_BACKEND})")
+        if skipped:
+            print(f"⚠️ {len(skipped)} file dilewati (kode tidak ditemukan / prefix cocok ke >1 kode):", file=sys.stderr)
+            for name in skipped:
+                print(f"  {name}", file=sys.stderr)
@@ -1,17 +1,55 @@
 # verify_app.py — versi lengkap dengan Admin Panel + Password + Statistik + Log
+# Import dijaga ringan agar worker cepat boot: Sheets (gspread) baru dimuat saat /check,
+# qrcode/PIL saat /qr pertama. Ukur: python -X importtime -c "import verify_app"
 import os
-import sqlite3
-from datetime import datetime, timedelta
-from flask import Flask, render_template, request, redirect, url_for, session
-from common import get_sheet
-from jinja2 import TemplateNotFound
+import hmac
+import time
+import hashlib
+import threading
+from functools import lru_cache
+from datetime import datetime
+from flask import Flask, render_template, request, redirect, url_for, session, abort, make_response, jsonify, g
+from flask import send_from_directory
+from flask import before_render_template, template_rendered
+from common import DEFAULT_EVENT, participant_fields
+import ticket_codec
+from storage import get_storage, SqliteStorage
+import admin_jobs
+import metrics
+import profiler
+import assets
+import backup
+import ticket_issue
+import edge_sync
+from scan_events import ScanEventWriter, rollup_report
+from jinja2 import TemplateNotFound, TemplateSyntaxError
 
 # === KONFIGURASI ===
 BASEDIR = os.path.dirname(os.path.abspath(__file__))
 TEMPLATES_DIR = os.path.join(BASEDIR, "templates")
 STATIC_DIR = os.path.join(BASEDIR, "static")
 DB_PATH = os.path.join(BASEDIR, "data.db")
-LOG_PATH = os.path.join(BASEDIR, "scan_log.txt")
+LOG_PATH = os.environ.get("SCAN_LOG_PATH", os.path.join(BASEDIR, "scan_log.txt"))
+
+QR_CACHE_SIZE = int(os.environ.get("QR_CACHE_SIZE", "2048"))  # jumlah gambar QR di memori
+QR_MAX_AGE = 365 * 24 * 3600  # gambar QR untuk satu token tidak pernah berubah
+
+REUSE_WINDOW = 24 * 3600  # detik; tiket tidak bisa dipakai ulang dalam jendela ini
+
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")            # opsional: Bearer token untuk GET /metrics
+METRICS_PUSH_TOKEN = os.environ.get("METRICS_PUSH_TOKEN", "")  # wajib diisi agar POST /metrics/push aktif
+INGEST_TOKEN = os.environ.get("INGEST_TOKEN", "")              # wajib diisi agar POST /api/ingest aktif
+INGEST_MAX_ROWS = 100                                           # baris per request ingest
+# mode gate edge/hub: EDGE_TOKEN, EDGE_HUB_URL, EDGE_NODE_ID (lihat edge_sync.py)
+
+# profil produksi secara default; FLASK_DEBUG=1 untuk reload template + debugger saat pengembangan
+DEBUG = os.environ.get("FLASK_DEBUG", "0") == "1"
+
+# template yang wajib ada; dicek + dikompilasi sekali saat startup
+REQUIRED_TEMPLATES = (
+    "base.html", "index.html", "scan_choice.html", "verify_result.html", "check_ticket.html",
+    "admin.html", "analytics.html", "job.html", "profiler.html", "search.html",
+)
 
 ADMIN_PASSWORD = "admin123"  # ubah sesuai kebutuhanmu
 SECRET_KEY = "supersecretkey"  # wajib untuk session
@@ -19,53 +57,216 @@ SECRET_KEY = "supersecretkey"  # wajib untuk session
 # === SETUP APP ===
 app = Flask(__name__, template_folder=TEMPLATES_DIR, static_folder=STATIC_DIR)
 app.secret_key = SECRET_KEY
-app.config["TEMPLATES_AUTO_RELOAD"] = True
+app.config["TEMPLATES_AUTO_RELOAD"] = DEBUG
 
+# backend DB: DATABASE_URL (Postgres untuk banyak replika) atau data.db lokal (lihat storage.py)
+storage = get_storage(DB_PATH)
+
+# event scan ditulis per batch oleh thread latar (lihat scan_events.py)
+scan_events = ScanEventWriter(storage)
+
+_started = False
+_start_lock = threading.Lock()
+
+
+def check_templates():
+    """
+    Pastikan folder templates ada dan semua template bisa dikompilasi.
+    Template yang lolos tersimpan di cache Jinja (tanpa auto reload -> tidak dicek ulang per render).
+    Return list (nama, pesan error).
+    """
+    if not os.path.isdir(TEMPLATES_DIR):
+        return [(TEMPLATES_DIR, "folder templates tidak ditemukan")]
+    names = set(REQUIRED_TEMPLATES) | {n for n in os.listdir(TEMPLATES_DIR) if n.endswith(".html")}
+    problems = []
+    for name in sorted(names):
+        try:
+            app.jinja_env.get_template(name)
+        except TemplateNotFound:
+            problems.append((name, "tidak ditemukan"))
+        except TemplateSyntaxError as e:
+            problems.append((name, f"baris {e.lineno}: {e.message}"))
+    return problems
+
+
+def startup():
+    """
+    Persiapan sekali jalan: migrasi skema, cek + kompilasi template, build aset statis.
+    Dipanggil dari gunicorn.conf.py di master sebelum fork (--preload), atau otomatis
+    pada request pertama jika dijalankan tanpa itu.
+    """
+    global _started
+    with _start_lock:
+        if not _started:
+            storage.init()
+            admin_jobs.fail_stale(storage)   # job yang terputus oleh restart sebelumnya
+            problems = check_templates()
+            if problems:
+                raise RuntimeError("Template bermasalah: " + "; ".join(f"{n} ({m})" for n, m in problems))
+            assets.ensure_built()
+            assets.check_vendor()
+            _started = True
+
+
+def start_background():
+    """
+    Thread latar per proses worker: flush metrik, jadwal backup, worker antrean tiket,
+    sinkron edge. Dipanggil sekali per proses dari gunicorn.conf.py (post_fork),
+    verify_async (before_serving) dan __main__. Gagal start -> satu peringatan di log,
+    subsistem lain tetap jalan.
+    """
+    subsystems = [("metrics", lambda: metrics.start_flusher(storage))]
+    if isinstance(storage, SqliteStorage):
+        subsystems.append(("backup", lambda: backup.start_scheduler(storage.path)))   # BACKUP_INTERVAL=0 -> mati
+    if INGEST_TOKEN:
+        subsystems.append(("ticket worker", lambda: ticket_issue.start_worker(storage)))   # sisa antrean setelah restart
+    subsystems.append(("edge sync", lambda: edge_sync.start(storage)))   # hanya di mode edge
+    for name, start in subsystems:
+        try:
+            start()
+        except Exception as e:
+            print(f"⚠️ Gagal memulai {name} (pid {os.getpid()}):", e)
+
+
+@app.context_processor
+def _asset_helpers():
+    return {"asset_url": asset_url}
+
+
+def asset_url(name):
+    """URL aset ber-hash (immutable) jika sudah di-build, vendor yang belum diunduh -> CDN, selain itu /static."""
+    hashed = assets.hashed_path(name)
+    if hashed:
+        return url_for("built_asset", filename=hashed)
+    return assets.vendor_fallback(name) or url_for("static", filename=name)
+
+
+@app.before_request
+def _ensure_startup():
+    if not _started:
+        startup()
+    g.request_started = time.perf_counter()
+    profiler.begin(request.method, request.path)
+
+
+@app.teardown_request
+def _end_profile(exc):
+    profiler.end(g.get("response_status", 500 if exc else None))
+
+
+# === METRIK (lihat metrics.py) ===
+@app.after_request
+def _observe_request(resp):
+    started = g.pop("request_started", None)
+    g.response_status = resp.status_code
+    if started is not None:
+        metrics.observe(
+            "http_request_duration_seconds", time.perf_counter() - started,
+            route=request.url_rule.rule if request.url_rule else "unmatched",
+            method=request.method, status=resp.status_code,
+        )
+    return resp
+
+
+def _template_started(sender, template, context, **extra):
+    g.setdefault("template_started", []).append(time.perf_counter())
 
-# === UTILITAS DATABASE ===
-def get_conn():
-    return sqlite3.connect(DB_PATH)
 
+def _template_done(sender, template, context, **extra):
+    stack = g.get("template_started")
+    if stack:
+        elapsed = time.perf_counter() - stack.pop()
+        metrics.observe("template_render_seconds", elapsed, template=template.name)
+        profiler.add("render", elapsed)
+
+
+before_render_template.connect(_template_started, app)
+template_rendered.connect(_template_done, app)
+
+
+# === UTILITAS DATABASE ===
 
 def log_scan(code, status):
     ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(LOG_PATH, "a", encoding="utf-8") as f:
-        f.write(f"[{ts}] {code} - {status}\n")
+    with profiler.phase("log"), metrics.timed("scan_log_write_seconds"):
+        with open(LOG_PATH, "a", encoding="utf-8") as f:
+            f.write(f"[{ts}] {code} - {status}\n")
+
+
+def list_events():
+    return storage.list_events()
 
 
-def verify_code(code):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT code, valid, used, last_used FROM codes WHERE code=?", (code,))
-    row = cur.fetchone()
+def admin_event(sess=None):
+    """Acara yang sedang dikelola admin (dipilih di panel, disimpan di session; Quart mengoper `sess`)."""
+    return (session if sess is None else sess).get("event_id") or DEFAULT_EVENT
 
-    if not row:
-        conn.close()
-        return {"status": "invalid", "msg": "Kode tidak ditemukan."}
 
-    _, valid, used, last_used = row
+def select_event(sess, requested, events):
+    """
+    ?event=... dari panel admin: acara terdaftar -> disimpan di `sess` (session Flask/Quart).
+    Return pesan error (acara lama tetap aktif) atau None; salah ketik tidak boleh membuat
+    reset/hapus berikutnya jalan di acara yang tidak ada.
+    """
+    requested = (requested or "").strip()
+    if not requested:
+        return None
+    if requested not in {ev_id for ev_id, _name in events}:
+        return f"Acara '{requested}' tidak ditemukan; tetap mengelola '{sess.get('event_id') or DEFAULT_EVENT}'."
+    sess["event_id"] = requested
+    return None
+
+
+# hasil redeem (storage.redeem) -> respons untuk gate
+SCAN_RESULTS = {
+    "ok": {"status": "ok", "msg": "Tiket valid. Selamat datang!"},
+    "used": {"status": "used", "msg": "Kode sudah digunakan dalam 24 jam terakhir."},
+    "invalid": {"status": "invalid", "msg": "Kode tidak valid."},
+    "missing": {"status": "invalid", "msg": "Kode tidak ditemukan."},
+}
+
+
+def verify_code(code, event_id=DEFAULT_EVENT):
+    # tiket bertanda tangan: kode palsu/salah ketik ditolak tanpa menyentuh DB
+    if ticket_codec.verify_signature(code) is False:
+        return dict(SCAN_RESULTS["invalid"])
+
+    # satu UPDATE bersyarat: aman walau tiket sama di-scan bersamaan di beberapa replika
+    # (mode edge/hub: + jejak replikasi di transaksi yang sama, lihat edge_sync.py)
     now = datetime.now()
+    redeem = (lambda *a: edge_sync.redeem(storage, *a)) if edge_sync.ROLE else storage.redeem
+    with profiler.phase("db"), metrics.timed("verify_db_seconds"):
+        outcome = redeem(event_id, code, int(time.time()), now.strftime("%Y-%m-%d %H:%M:%S"), REUSE_WINDOW)
+    return dict(SCAN_RESULTS[outcome])
 
-    if not valid:
-        conn.close()
-        return {"status": "invalid", "msg": "Kode tidak valid."}
 
-    if used and last_used:
-        try:
-            last_dt = datetime.strptime(last_used, "%Y-%m-%d %H:%M:%S")
-        except ValueError:
-            last_dt = None
-        if last_dt and now - last_dt < timedelta(hours=24):
-            conn.close()
-            return {"status": "used", "msg": "Kode sudah digunakan dalam 24 jam terakhir."}
-
-    cur.execute(
-        "UPDATE codes SET used=1, last_used=? WHERE code=?",
-        (now.strftime("%Y-%m-%d %H:%M:%S"), code),
-    )
-    conn.commit()
-    conn.close()
-    return {"status": "ok", "msg": "Tiket valid. Selamat datang!"}
+def code_exists(code, event_id=None):
+    with profiler.phase("db"):
+        return storage.code_exists(code, event_id)
+
+
+@lru_cache(maxsize=QR_CACHE_SIZE)
+def render_qr_cached(token, fmt, scale):
+    """Render QR tiket (bytes + ETag kuat). Dibatasi LRU supaya memori tetap terkendali."""
+    import qr_render
+    payload = qr_render.render(ticket_codec.qr_payload(token), fmt=fmt, scale=scale)
+    etag = hashlib.sha1(payload).hexdigest()
+    return payload, etag
+
+
+def qr_scale(args):
+    """?s= (ukuran modul QR dalam piksel), dibatasi 1..20."""
+    return min(max(args.get("s", 10, type=int), 1), 20)
+
+
+def qr_headers(resp, fmt, etag):
+    """Tipe + ETag + cache untuk respons /qr (Flask maupun Quart)."""
+    import qr_render
+    resp.mimetype = qr_render.MIME_TYPES[fmt]
+    resp.set_etag(etag)
+    # private: QR adalah tiket masuk, jangan disimpan cache publik/CDN
+    resp.headers["Cache-Control"] = f"private, max-age={QR_MAX_AGE}, immutable"
+    return resp
 
 
 # === ROUTES ===
@@ -80,26 +281,130 @@ def scan_choice():
 
 
 @app.route("/scan")
-def verify():
+@app.route("/e/<event_id>/scan")
+def verify(event_id=None):
     token = request.args.get("token") or request.args.get("id")
-    if not token:
-        return render_template(
-            "verify_result.html",
-            status="error",
-            message="Tidak ada kode QR yang dikirim.",
-            code="(kosong)",
-            time=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        )
+    return verify_page(token, event_id or request.args.get("event") or DEFAULT_EVENT)
+
 
-    result = verify_code(token)
+# URL huruf besar dari skema "url" (HTTPS://HOST/S/<TOKEN>), lihat ticket_codec.py
+@app.route("/S/<token>")
+@app.route("/s/<token>")
+@app.route("/e/<event_id>/S/<token>")
+@app.route("/e/<event_id>/s/<token>")
+def verify_short(token, event_id=None):
+    return verify_page(token, event_id or request.args.get("event") or DEFAULT_EVENT)
+
+
+def process_scan(token, event_id, gate=None, device=None):
+    """Redeem + log + metrik + scan_events; dipakai halaman /scan dan API JSON."""
+    started = time.perf_counter()
+    result = verify_code(token, event_id)
+    latency_ms = (time.perf_counter() - started) * 1000
     log_scan(token, result["status"])
-    return render_template(
-        "verify_result.html",
-        status=result["status"],
-        message=result["msg"],
-        code=token,
-        time=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-    )
+    metrics.inc("scans_total", outcome=result["status"])
+    scan_events.record(token, result["status"], event_id=event_id, gate=gate, device=device, latency_ms=latency_ms)
+    return result
+
+
+def scan_source(values, headers, remote_addr):
+    """Gate + device untuk scan_events: dari query/body, lalu header X-Gate-Id / X-Device-Id, lalu IP."""
+    gate = values.get("gate") or headers.get("X-Gate-Id")
+    device = values.get("device") or headers.get("X-Device-Id") or remote_addr
+    return gate, device
+
+
+def body_event(event_id, data):
+    """Acara dari URL (/e/<event_id>/...), lalu field "event" di body JSON, lalu DEFAULT_EVENT."""
+    return event_id or (data.get("event") if isinstance(data, dict) else None) or DEFAULT_EVENT
+
+
+def scan_page(token, result=None):
+    """Konteks verify_result.html; tanpa token -> halaman error "kosong"."""
+    if not token:
+        return {"status": "error", "message": "Tidak ada kode QR yang dikirim.", "code": "(kosong)",
+                "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+    return {"status": result["status"], "message": result["msg"], "code": token,
+            "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+
+
+def scan_json(token, result):
+    return {"status": result["status"], "msg": result["msg"], "token": token,
+            "time": datetime.now().strftime("%H:%M:%S")}
+
+
+SCAN_BODY_FIELDS = ("token", "payload", "event", "gate", "device")
+
+
+def scan_token(data):
+    """Body /api/scan -> token (bisa kosong). ValueError jika body bukan objek JSON atau field bukan teks."""
+    if not isinstance(data, dict):
+        raise ValueError("Body harus objek JSON.")
+    for key in SCAN_BODY_FIELDS:
+        if data.get(key) is not None and not isinstance(data[key], str):
+            raise ValueError(f"Field {key} harus teks.")
+    return (data.get("token") or ticket_codec.extract_token(data.get("payload") or "")).strip()
+
+
+@app.route("/api/scan", methods=["POST"])
+@app.route("/e/<event_id>/api/scan", methods=["POST"])
+def api_scan(event_id=None):
+    """
+    Scan berkelanjutan dari halaman scanner (fetch JSON, kamera tetap menyala).
+    Body: {"payload": isi QR mentah} atau {"token": ...}, opsional event/gate/device.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        token = scan_token(data)
+    except ValueError as e:
+        return jsonify({"status": "invalid", "msg": str(e)}), 400
+    if not token:
+        return jsonify({"status": "error", "msg": "Tidak ada kode QR yang dikirim."}), 400
+    gate, device = scan_source(data, request.headers, request.remote_addr)
+    result = process_scan(token, body_event(event_id, data), gate=gate, device=device)
+    resp = jsonify(scan_json(token, result))
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+
+def verify_page(token, event_id=DEFAULT_EVENT):
+    if not token:
+        return render_template("verify_result.html", **scan_page(None))
+    gate, device = scan_source(request.args, request.headers, request.remote_addr)
+    result = process_scan(token, event_id, gate=gate, device=device)
+    return render_template("verify_result.html", **scan_page(token, result))
+
+
+@app.route("/qr/<token>.<any(png, svg):fmt>")
+def qr_image(token, fmt):
+    """Render QR tiket on-demand dari tabel codes (tanpa file di disk)."""
+    if not code_exists(token, request.args.get("event")):
+        abort(404)
+    # qrcode + PIL baru dimuat saat QR pertama diminta (render_qr_cached)
+    payload, etag = render_qr_cached(token, fmt, qr_scale(request.args))
+    return qr_headers(make_response(payload), fmt, etag).make_conditional(request)
+
+
+def lookup_sheet_code(code):
+    """Cari kode di sheet Peserta (seluruh sheet dibaca). Return dict hasil untuk check_ticket.html."""
+    from common import get_sheet   # gspread dimuat di sini, bukan saat worker boot
+    sheet = get_sheet()
+    with metrics.api_call("sheets", "get_all_records"):
+        records = sheet.get_all_records()
+
+    for r in records:
+        if str(r.get("Kode Unik", "")).strip().upper() == code:
+            return {
+                "valid": True,
+                "code": "qr_" + code,
+                "token": code,
+                "name": r.get("Nama Peserta"),
+                "email": r.get("Email"),
+                "sent_at": r.get("Waktu Kirim"),
+                "used_at": r.get("Nomor HP"),
+                "status": r.get("Status"),
+            }
+    return {"valid": False, "code": code}
 
 
 @app.route("/check", methods=["GET", "POST"])
@@ -110,70 +415,74 @@ def check_ticket():
         code = request.form.get("code", "").strip().upper()
 
         try:
-            sheet = get_sheet()
-            records = sheet.get_all_records()
+            result = lookup_sheet_code(code)
         except Exception as e:
             return f"Error membaca data: {e}"
 
-        for r in records:
-            if str(r.get("Kode Unik", "")).strip().upper() == code:
-                result = {
-                    "valid": True,
-                    "code": "qr_" + code,
-                    "name": r.get("Nama Peserta"),
-                    "email": r.get("Email"),
-                    "sent_at": r.get("Waktu Kirim"),
-                    "used_at": r.get("Nomor HP"),
-                    "status": r.get("Status"),
-                }
-                break
-
-        if not result:
-            result = {"valid": False, "code": code}
-
     return render_template("check_ticket.html", result=result)
 
 
+def start_reset(event_id, mode):
+    """mode expired = tiket terpakai >24 jam, all = semua. Return id job."""
+    if mode == "all":
+        return admin_jobs.start_job(storage, "reset_all", event_id, before=int(time.time()) + 1)
+    return admin_jobs.start_job(storage, "reset_expired", event_id, older_than=int(time.time()) - REUSE_WINDOW)
+
+
 @app.route("/reset", methods=["GET", "POST"])
 def reset():
-    """Reset kode sesuai permintaan admin"""
+    """Reset kode sesuai permintaan admin (job latar bertahap, lihat admin_jobs.py)"""
     if not session.get("is_admin"):
         return redirect(url_for("admin_login"))
 
-    conn = get_conn()
-    cur = conn.cursor()
+    job_id = start_reset(admin_event(), request.args.get("mode", "expired"))
+    return redirect(url_for("admin_job", job_id=job_id))
+
 
-    mode = request.args.get("mode", "expired")  # expired = >24 jam, all = semua
-    if mode == "all":
-        cur.execute("UPDATE codes SET used=0, last_used=NULL")
-        message = "Semua kode berhasil direset."
-    else:
-        cur.execute("UPDATE codes SET used=0 WHERE used=1 AND last_used < datetime('now','-24 hours')")
-        message = "Kode yang digunakan >24 jam telah direset."
-
-    conn.commit()
-    conn.close()
-    return render_template("reset.html", message=message)
-    
 @app.route("/delete_valid", methods=["POST"])
 def delete_valid():
-    """Hapus semua tiket valid dari database"""
+    """Hapus semua tiket valid dari database (job latar bertahap)"""
     if not session.get("is_admin"):
         return redirect(url_for("admin_login"))
 
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM codes WHERE valid=1")
-    deleted_rows = cur.rowcount
-    conn.commit()
-    conn.close()
+    job_id = admin_jobs.start_job(storage, "delete_valid", admin_event())
+    return redirect(url_for("admin_job", job_id=job_id))
+
+
+@app.route("/admin/jobs/<int:job_id>")
+def admin_job(job_id):
+    if not session.get("is_admin"):
+        return redirect(url_for("admin_login"))
+    job = admin_jobs.current(storage, job_id)
+    if not job:
+        abort(404)
+    return render_template("job.html", job=job)
 
-    message = f"✅ Berhasil menghapus {deleted_rows} tiket valid dari database."
-    return render_template("reset.html", message=message)
+
+@app.route("/admin/jobs/<int:job_id>.json")
+def admin_job_status(job_id):
+    if not session.get("is_admin"):
+        abort(403)
+    job = admin_jobs.current(storage, job_id)
+    if not job:
+        abort(404)
+    return jsonify(job)
+
+
+@app.route("/admin/jobs/<int:job_id>/cancel", methods=["POST"])
+def admin_job_cancel(job_id):
+    if not session.get("is_admin"):
+        return redirect(url_for("admin_login"))
+    storage.cancel_job(job_id)
+    return redirect(url_for("admin_job", job_id=job_id))
 
 
 
 # === ADMIN PANEL ===
+def password_ok(password):
+    return hmac.compare_digest(password or "", ADMIN_PASSWORD)
+
+
 @app.route("/admin", methods=["GET", "POST"])
 def admin_login():
     # Jika sudah login
@@ -181,8 +490,7 @@ def admin_login():
         return redirect(url_for("admin_panel"))
 
     if request.method == "POST":
-        password = request.form.get("password")
-        if password == ADMIN_PASSWORD:
+        if password_ok(request.form.get("password")):
             session["is_admin"] = True
             return redirect(url_for("admin_panel"))
         else:
@@ -197,41 +505,307 @@ def logout():
     return redirect(url_for("index"))
 
 
+def recent_logs(n=20):
+    """n baris terakhir dari log scanner."""
+    if not os.path.exists(LOG_PATH):
+        return []
+    with open(LOG_PATH, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    return lines[-n:] if len(lines) > n else lines
+
+
+def admin_panel_view(sess, requested=None):
+    """Konteks admin.html: pilih acara (?event=..., disimpan di `sess`), statistik, log, job terakhir."""
+    events = list_events()
+    error = select_event(sess, requested, events)
+    event_id = admin_event(sess)
+    return {
+        "event_id": event_id, "events": events, "error": error,
+        "stats": storage.stats(event_id),     # statistik per acara
+        "logs": recent_logs(),                # 20 baris terakhir log scanner
+        "jobs": [admin_jobs.job_view(j) for j in storage.list_jobs(event_id, limit=5)],
+    }
+
+
 @app.route("/admin/panel")
 def admin_panel():
     if not session.get("is_admin"):
         return redirect(url_for("admin_login"))
 
-    # Statistik dari database
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT COUNT(*) FROM codes")
-    total = cur.fetchone()[0]
-    cur.execute("SELECT COUNT(*) FROM codes WHERE valid=1")
-    valid = cur.fetchone()[0]
-    cur.execute("SELECT COUNT(*) FROM codes WHERE used=1")
-    used = cur.fetchone()[0]
-    cur.execute("SELECT COUNT(*) FROM codes WHERE used=0")
-    unused = cur.fetchone()[0]
-    conn.close()
-
-    stats = {
-        "total": total,
-        "valid": valid,
-        "used": used,
-        "unused": unused,
-    }
+    return render_template("admin.html", login=False, **admin_panel_view(session, request.args.get("event")))
+
+
+def analytics_view(rows, bucket):
+    """Baris rollup_report -> (items tabel per bucket+gate, puncak) untuk analytics.html."""
+    # pivot: (bucket_start, gate) -> hitungan per outcome
+    table = {}
+    for start, gate, outcome, count, avg_ms, max_ms in rows:
+        key = (start, gate or "-")
+        r = table.setdefault(key, {"ok": 0, "used": 0, "invalid": 0, "total": 0, "lat_sum": 0.0, "max_ms": 0.0})
+        r[outcome if outcome in ("ok", "used") else "invalid"] += count
+        r["total"] += count
+        r["lat_sum"] += avg_ms * count
+        r["max_ms"] = max(r["max_ms"], max_ms)
+
+    per_bucket = {}
+    for (start, _), r in table.items():
+        per_bucket[start] = per_bucket.get(start, 0) + r["total"]
+    peak_start, peak_count = max(per_bucket.items(), key=lambda kv: kv[1], default=(None, 0))
+
+    items = []
+    for (start, gate), r in sorted(table.items()):
+        items.append({
+            "time": datetime.fromtimestamp(start).strftime("%Y-%m-%d %H:%M"),
+            "gate": gate,
+            "ok": r["ok"],
+            "used": r["used"],
+            "invalid": r["invalid"],
+            "total": r["total"],
+            "per_min": r["total"] / (bucket / 60),
+            "avg_ms": r["lat_sum"] / r["total"] if r["total"] else 0,
+            "max_ms": r["max_ms"],
+            "bar": int(100 * r["total"] / peak_count) if peak_count else 0,
+        })
+    peak = None
+    if peak_start is not None:
+        peak = {
+            "time": datetime.fromtimestamp(peak_start).strftime("%Y-%m-%d %H:%M"),
+            "count": peak_count,
+            "per_min": peak_count / (bucket / 60),
+        }
+
+    return items, peak
+
+
+def analytics_report(event_id, args):
+    """?bucket= (300/3600 detik) & ?hours= (1..336) -> konteks analytics.html dari scan_rollup."""
+    bucket = args.get("bucket", 300, type=int)
+    if bucket not in (300, 3600):
+        bucket = 300
+    hours = min(max(args.get("hours", 24, type=int), 1), 24 * 14)
+    with storage.connection() as conn:
+        rows = rollup_report(conn, event_id=event_id, bucket_size=bucket, since_ts=time.time() - hours * 3600)
+    items, peak = analytics_view(rows, bucket)
+    return {"items": items, "peak": peak, "bucket": bucket, "hours": hours, "event_id": event_id}
+
+
+@app.route("/admin/analytics")
+def admin_analytics():
+    if not session.get("is_admin"):
+        return redirect(url_for("admin_login"))
+
+    return render_template("analytics.html", **analytics_report(admin_event(), request.args))
+
+
+@app.route("/admin/search")
+def admin_search():
+    """Help desk: cari peserta (nama/email/HP/kode sebagian), hasil muncul sambil mengetik."""
+    if not session.get("is_admin"):
+        return redirect(url_for("admin_login"))
+    return render_template("search.html", event_id=admin_event(), q=request.args.get("q", ""))
 
-    # Baca 20 baris terakhir dari log scanner
-    logs = []
-    if os.path.exists(LOG_PATH):
-        with open(LOG_PATH, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-            logs = lines[-20:] if len(lines) > 20 else lines
 
-    return render_template("admin.html", login=False, stats=stats, logs=logs)
+def search_report(event_id, args):
+    """?q= & ?page= -> body /admin/search.json (tanpa qr_url: url_for butuh konteks request)."""
+    q = args.get("q", "").strip()
+    page = max(args.get("page", 1, type=int), 1)
+    started = time.perf_counter()
+    with profiler.phase("db"), metrics.timed("participant_search_seconds"):
+        rows, has_more = storage.search_participants(event_id, q, page=page)
+    return {"q": q, "page": page, "results": rows, "has_more": has_more,
+            "ms": round((time.perf_counter() - started) * 1000, 2)}
+
+
+@app.route("/admin/search.json")
+def admin_search_json():
+    if not session.get("is_admin"):
+        abort(403)
+    event_id = admin_event()
+    result = search_report(event_id, request.args)
+    for r in result["results"]:
+        r["qr_url"] = url_for("qr_image", token=r["code"], fmt="png", event=event_id) if r["code"] else None
+    resp = jsonify(result)
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+
+@app.route("/dist/<path:filename>")
+def built_asset(filename):
+    """Aset ber-hash dari static/dist: varian .br/.gz sesuai Accept-Encoding, cache immutable."""
+    if not assets.is_built_file(filename):
+        abort(404)
+    served, encoding = assets.pick_variant(filename, request.headers.get("Accept-Encoding"))
+    resp = send_from_directory(assets.DIST_DIR, served, mimetype=assets.mimetype(filename), max_age=assets.MAX_AGE)
+    return asset_headers(resp, encoding)
+
+
+def asset_headers(resp, encoding):
+    if encoding:
+        resp.headers["Content-Encoding"] = encoding
+    resp.headers["Vary"] = "Accept-Encoding"
+    resp.headers["Cache-Control"] = f"public, max-age={assets.MAX_AGE}, immutable"
+    return resp
+
+
+@app.route("/admin/profiler", methods=["GET", "POST"])
+def admin_profiler():
+    """Trace request paling lambat di worker ini (lihat profiler.py)."""
+    if not session.get("is_admin"):
+        return redirect(url_for("admin_login"))
+    if request.method == "POST":
+        profiler.clear()
+        return redirect(url_for("admin_profiler"))
+    return render_template("profiler.html", traces=profiler.traces(), cfg=profiler.settings(),
+                           now_ts=time.time())
+
+
+def metrics_authorized(header):
+    return not METRICS_TOKEN or hmac.compare_digest(header or "", f"Bearer {METRICS_TOKEN}")
+
+
+def metrics_text():
+    metrics.flush(storage)   # sertakan delta proses ini yang belum ditulis
+    with storage.connection() as conn:
+        return metrics.render_text(conn)
+
+
+def write_metric_rows(rows):
+    with storage.connection() as conn:
+        metrics.write_rows(conn, rows)
+    return {"ok": True, "rows": len(rows)}
+
+
+@app.route("/metrics")
+def metrics_page():
+    """Metrik semua worker/proses dalam format teks Prometheus."""
+    if not metrics_authorized(request.headers.get("Authorization")):
+        abort(403)
+    resp = make_response(metrics_text())
+    resp.mimetype = "text/plain"
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+
+@app.route("/metrics/push", methods=["POST"])
+def metrics_push():
+    """Terima delta metrik dari GUI kirim tiket / sync Sheets (metrics.push)."""
+    if not METRICS_PUSH_TOKEN:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get("Authorization") or "", f"Bearer {METRICS_PUSH_TOKEN}"):
+        abort(403)
+    try:
+        rows = metrics.parse_push(request.get_json(force=True))
+    except (TypeError, ValueError):
+        abort(400)
+    return jsonify(write_metric_rows(rows))
+
+
+# === INGEST PESERTA (Apps Script / webhook pembayaran) ===
+def ingest_authorized(header):
+    return bool(INGEST_TOKEN) and hmac.compare_digest(header or "", f"Bearer {INGEST_TOKEN}")
+
+
+def ingest_rows(data):
+    """Body ingest (satu baris, atau {"rows": [...]}) -> list dict participant_fields. ValueError jika tidak valid."""
+    records = data.get("rows") if isinstance(data, dict) and "rows" in data else [data]
+    if not isinstance(records, list) or not records:
+        raise ValueError("Body harus satu baris peserta atau {\"rows\": [...]}")
+    if len(records) > INGEST_MAX_ROWS:
+        raise ValueError(f"Maksimal {INGEST_MAX_ROWS} baris per request")
+    rows = []
+    for record in records:
+        if not isinstance(record, dict):
+            raise ValueError("Setiap baris harus objek JSON")
+        fields = participant_fields(record)
+        if not (fields.get("name") or fields.get("email")):
+            raise ValueError("Baris tanpa nama/email")
+        rows.append(fields)
+    return rows
+
+
+def apply_ingest(event_id, rows):
+    """Upsert tiap baris; peserta baru PAID langsung diantrekan dan worker tiket dibangunkan."""
+    queued = 0
+    for fields in rows:
+        _participant_id, is_queued = storage.upsert_participant(event_id, fields)
+        queued += is_queued
+    metrics.inc("ingest_rows_total", len(rows))
+    if queued:
+        ticket_issue.start_worker(storage)
+        ticket_issue.wake()
+    return {"ok": True, "rows": len(rows), "queued": queued}
+
+
+@app.route("/api/ingest", methods=["POST"])
+@app.route("/e/<event_id>/api/ingest", methods=["POST"])
+def ingest(event_id=None):
+    """
+    Perubahan baris Peserta dari trigger Apps Script (onEdit/onFormSubmit) atau
+    webhook pembayaran, menggantikan "Sync from Sheets" penuh.
+    Header: Authorization: Bearer <INGEST_TOKEN>. Body: {"Nama Peserta": ..., "Email": ...,
+    "Status": "PAID", "row": 12} (atau nama kolom DB), atau {"rows": [...], "event": ...}.
+    """
+    if not INGEST_TOKEN:
+        abort(404)
+    if not ingest_authorized(request.headers.get("Authorization")):
+        abort(403)
+    data = request.get_json(silent=True)
+    try:
+        rows = ingest_rows(data)
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    return jsonify(apply_ingest(body_event(event_id, data), rows))
+
+
+# === REPLIKASI GATE EDGE (hub, lihat edge_sync.py) ===
+def edge_authorized(header):
+    return edge_sync.ROLE == "hub" and hmac.compare_digest(header or "", f"Bearer {edge_sync.EDGE_TOKEN}")
+
+
+def edge_api(op, args, data):
+    """Endpoint hub untuk edge: push/pull/codes/redeem. ValueError jika parameter tidak valid."""
+    try:
+        if op == "push":
+            items = data["items"]
+            if not isinstance(items, list) or len(items) > edge_sync.MAX_ITEMS:
+                raise ValueError(f"items harus list, maksimal {edge_sync.MAX_ITEMS}")
+            return edge_sync.hub_push(storage, str(data["node"]), items, REUSE_WINDOW)
+        if op == "pull":
+            limit = min(int(args.get("limit", edge_sync.BATCH)), edge_sync.MAX_ITEMS)
+            return edge_sync.hub_pull(storage, args.get("node", ""), int(args.get("since", 0)), limit)
+        if op == "codes":
+            limit = min(int(args.get("limit", edge_sync.SNAPSHOT_PAGE)), edge_sync.MAX_ITEMS * 4)
+            return edge_sync.hub_codes(storage, args.get("after_event", ""), args.get("after_code", ""), limit)
+        return edge_sync.hub_redeem(
+            storage, str(data["node"]), str(data["event_id"]), str(data["code"]),
+            int(data["ts"]), data.get("last_used"), REUSE_WINDOW,
+        )
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Parameter tidak lengkap: {e}")
+
+
+@app.route("/api/edge/<any(push, pull, codes, redeem):op>", methods=["GET", "POST"])
+def edge_endpoint(op):
+    if edge_sync.ROLE != "hub":
+        abort(404)
+    if not edge_authorized(request.headers.get("Authorization")):
+        abort(403)
+    try:
+        return jsonify(edge_api(op, request.args, request.get_json(silent=True) or {}))
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+
+
+@app.route("/admin/edge.json")
+def admin_edge_status():
+    """Hub: gate yang terhubung + redeem ganda; edge: outbox, kursor, kontak terakhir dengan hub."""
+    if not session.get("is_admin"):
+        abort(403)
+    return jsonify(edge_sync.status(storage))
 
 
 # === JALANKAN SERVER ===
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    startup()
+    start_background()
+    app.run(host="0.0.0.0", port=5000, debug=DEBUG)
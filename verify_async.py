@@ -0,0 +1,402 @@
+# verify_async.py
+"""
+Varian async verifier (Quart, ASGI): route yang sama dengan verify_app
+(/scan, /S/<token>, /api/scan, /check, /qr, admin) tapi satu proses melayani
+banyak gate + koneksi dashboard sekaligus, tidak terbatas jumlah worker.
+
+    hypercorn verify_async:app --bind 0.0.0.0:8080
+    python verify_async.py          # pengembangan
+
+- Redeem tiket lewat satu thread penulis (redeem_writer.py) dengan group commit.
+- Query baca (statistik, job, pencarian, analitik) dan I/O file dijalankan di
+  thread pool (asyncio.to_thread) -> event loop tidak pernah menunggu DB.
+- /check membaca Google Sheets di thread pool juga.
+- /admin/stats/stream: statistik live (Server-Sent Events) untuk panel admin.
+- Template, aset, logika, konfigurasi dan storage dipakai bersama dari verify_app,
+  jadi kedua varian bisa jalan bergantian pada DB yang sama. Session cookie juga
+  kompatibel (SECRET_KEY sama).
+- Route di sini hanya pembungkus tipis: parsing request, lalu helper verify_app
+  (scan_page, admin_panel_view, analytics_report, search_report, metrics_text, ...)
+  lewat db(). Logika route baru ditulis di verify_app, bukan disalin ke sini.
+- Profiler request (profiler.py) berbasis thread-local, jadi hanya di verify_app.
+
+Bandingkan dengan verify_app di bawah beban yang sama: bench_verifier.py.
+"""
+import os
+import hmac
+import json
+import time
+import asyncio
+from datetime import datetime
+from quart import Quart, render_template, request, redirect, url_for, session, abort, make_response, jsonify, g
+from quart import send_from_directory
+
+import verify_app
+from verify_app import DEFAULT_EVENT, REUSE_WINDOW, METRICS_PUSH_TOKEN, SCAN_RESULTS, REQUIRED_TEMPLATES, INGEST_TOKEN
+import ticket_codec
+import admin_jobs
+import metrics
+import profiler
+import assets
+import edge_sync
+from redeem_writer import RedeemWriter
+
+STREAM_INTERVAL = float(os.environ.get("STATS_STREAM_INTERVAL", "2"))  # detik antar cek statistik live
+
+# === SETUP APP ===
+app = Quart(__name__, template_folder=verify_app.TEMPLATES_DIR, static_folder=verify_app.STATIC_DIR)
+app.secret_key = verify_app.SECRET_KEY
+app.config["TEMPLATES_AUTO_RELOAD"] = verify_app.DEBUG
+
+storage = verify_app.storage
+scan_events = verify_app.scan_events
+writer = RedeemWriter(storage, redeem_on=edge_sync.redeem_on if edge_sync.ROLE else None)
+
+
+def db(fn, *args, **kwargs):
+    """Jalankan panggilan blocking (storage, file, Sheets) di thread pool."""
+    return asyncio.to_thread(fn, *args, **kwargs)
+
+
+@app.before_serving
+async def _startup():
+    # migrasi, cek template, build aset (sekali, sama dengan verify_app)
+    await db(verify_app.startup)
+    for name in REQUIRED_TEMPLATES:
+        app.jinja_env.get_template(name)
+    verify_app.start_background()   # sekali per proses hypercorn
+
+
+@app.context_processor
+def _asset_helpers():
+    return {"asset_url": asset_url}
+
+
+def asset_url(name):
+    hashed = assets.hashed_path(name)
+    if hashed:
+        return url_for("built_asset", filename=hashed)
+    return assets.vendor_fallback(name) or url_for("static", filename=name)
+
+
+# === METRIK ===
+@app.before_request
+async def _start_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+async def _observe_request(resp):
+    started = g.pop("request_started", None)
+    if started is not None:
+        metrics.observe(
+            "http_request_duration_seconds", time.perf_counter() - started,
+            route=request.url_rule.rule if request.url_rule else "unmatched",
+            method=request.method, status=resp.status_code, server="async",
+        )
+    return resp
+
+
+def admin_event():
+    return verify_app.admin_event(session)
+
+
+# === SCAN ===
+async def verify_code(code, event_id=DEFAULT_EVENT):
+    if ticket_codec.verify_signature(code) is False:
+        return dict(SCAN_RESULTS["invalid"])
+    now = datetime.now()
+    started = time.perf_counter()
+    now_ts, now_text = int(time.time()), now.strftime("%Y-%m-%d %H:%M:%S")
+    outcome = await writer.redeem(event_id, code, now_ts, now_text, REUSE_WINDOW)
+    if outcome == "missing" and edge_sync.ROLE == "edge":
+        # kode belum ada di replika lokal: tanya hub (timeout singkat)
+        outcome = await db(edge_sync.lookup_redeem, storage, event_id, code, now_ts, now_text)
+    metrics.observe("verify_db_seconds", time.perf_counter() - started)
+    return dict(SCAN_RESULTS[outcome])
+
+
+async def process_scan(token, event_id, gate=None, device=None):
+    """Redeem + log + metrik + scan_events (setara verify_app.process_scan)."""
+    started = time.perf_counter()
+    result = await verify_code(token, event_id)
+    latency_ms = (time.perf_counter() - started) * 1000
+    await db(verify_app.log_scan, token, result["status"])
+    metrics.inc("scans_total", outcome=result["status"])
+    scan_events.record(token, result["status"], event_id=event_id, gate=gate, device=device, latency_ms=latency_ms)
+    return result
+
+
+@app.route("/")
+async def index():
+    return await render_template("index.html")
+
+
+@app.route("/scan_choice")
+async def scan_choice():
+    return await render_template("scan_choice.html")
+
+
+@app.route("/scan")
+@app.route("/e/<event_id>/scan")
+async def verify(event_id=None):
+    token = request.args.get("token") or request.args.get("id")
+    return await verify_page(token, event_id or request.args.get("event") or DEFAULT_EVENT)
+
+
+@app.route("/S/<token>")
+@app.route("/s/<token>")
+@app.route("/e/<event_id>/S/<token>")
+@app.route("/e/<event_id>/s/<token>")
+async def verify_short(token, event_id=None):
+    return await verify_page(token, event_id or request.args.get("event") or DEFAULT_EVENT)
+
+
+async def verify_page(token, event_id=DEFAULT_EVENT):
+    if not token:
+        return await render_template("verify_result.html", **verify_app.scan_page(None))
+    gate, device = verify_app.scan_source(request.args, request.headers, request.remote_addr)
+    result = await process_scan(token, event_id, gate=gate, device=device)
+    return await render_template("verify_result.html", **verify_app.scan_page(token, result))
+
+
+@app.route("/api/scan", methods=["POST"])
+@app.route("/e/<event_id>/api/scan", methods=["POST"])
+async def api_scan(event_id=None):
+    data = await request.get_json(silent=True) or {}
+    try:
+        token = verify_app.scan_token(data)
+    except ValueError as e:
+        return jsonify({"status": "invalid", "msg": str(e)}), 400
+    if not token:
+        return jsonify({"status": "error", "msg": "Tidak ada kode QR yang dikirim."}), 400
+    gate, device = verify_app.scan_source(data, request.headers, request.remote_addr)
+    result = await process_scan(token, verify_app.body_event(event_id, data), gate=gate, device=device)
+    resp = jsonify(verify_app.scan_json(token, result))
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+
+@app.route("/qr/<token>.<any(png, svg):fmt>")
+async def qr_image(token, fmt):
+    if not await db(storage.code_exists, token, request.args.get("event")):
+        abort(404)
+    payload, etag = await db(verify_app.render_qr_cached, token, fmt, verify_app.qr_scale(request.args))
+    resp = verify_app.qr_headers(await make_response(payload), fmt, etag)
+    return await resp.make_conditional(request)
+
+
+@app.route("/check", methods=["GET", "POST"])
+async def check_ticket():
+    result = None
+    if request.method == "POST":
+        code = (await request.form).get("code", "").strip().upper()
+        try:
+            result = await db(verify_app.lookup_sheet_code, code)
+        except Exception as e:
+            return f"Error membaca data: {e}"
+    return await render_template("check_ticket.html", result=result)
+
+
+# === ADMIN ===
+@app.route("/admin", methods=["GET", "POST"])
+async def admin_login():
+    if session.get("is_admin"):
+        return redirect(url_for("admin_panel"))
+    if request.method == "POST":
+        if verify_app.password_ok((await request.form).get("password")):
+            session["is_admin"] = True
+            return redirect(url_for("admin_panel"))
+        return await render_template("admin.html", login=True, error="Password salah!")
+    return await render_template("admin.html", login=True)
+
+
+@app.route("/logout")
+async def logout():
+    session.clear()
+    return redirect(url_for("index"))
+
+
+@app.route("/admin/panel")
+async def admin_panel():
+    if not session.get("is_admin"):
+        return redirect(url_for("admin_login"))
+    view = await db(verify_app.admin_panel_view, session, request.args.get("event"))
+    return await render_template("admin.html", login=False, live_stats_url=url_for("admin_stats_stream"), **view)
+
+
+@app.route("/admin/stats/stream")
+async def admin_stats_stream():
+    """Statistik tiket acara aktif sebagai Server-Sent Events (dikirim hanya saat berubah)."""
+    if not session.get("is_admin"):
+        abort(403)
+    event_id = admin_event()
+
+    async def events():
+        last = None
+        while True:
+            stats = await db(storage.stats, event_id)
+            if stats != last:
+                yield f"data: {json.dumps(stats)}\n\n".encode("utf-8")
+                last = stats
+            await asyncio.sleep(STREAM_INTERVAL)
+
+    resp = await make_response(events(), {"Content-Type": "text/event-stream", "Cache-Control": "no-store",
+                                          "X-Accel-Buffering": "no"})
+    resp.timeout = None   # koneksi dashboard boleh terbuka selamanya
+    return resp
+
+
+@app.route("/reset", methods=["GET", "POST"])
+async def reset():
+    if not session.get("is_admin"):
+        return redirect(url_for("admin_login"))
+    job_id = await db(verify_app.start_reset, admin_event(), request.args.get("mode", "expired"))
+    return redirect(url_for("admin_job", job_id=job_id))
+
+
+@app.route("/delete_valid", methods=["POST"])
+async def delete_valid():
+    if not session.get("is_admin"):
+        return redirect(url_for("admin_login"))
+    job_id = await db(admin_jobs.start_job, storage, "delete_valid", admin_event())
+    return redirect(url_for("admin_job", job_id=job_id))
+
+
+@app.route("/admin/jobs/<int:job_id>")
+async def admin_job(job_id):
+    if not session.get("is_admin"):
+        return redirect(url_for("admin_login"))
+    job = await db(admin_jobs.current, storage, job_id)
+    if not job:
+        abort(404)
+    return await render_template("job.html", job=job)
+
+
+@app.route("/admin/jobs/<int:job_id>.json")
+async def admin_job_status(job_id):
+    if not session.get("is_admin"):
+        abort(403)
+    job = await db(admin_jobs.current, storage, job_id)
+    if not job:
+        abort(404)
+    return jsonify(job)
+
+
+@app.route("/admin/jobs/<int:job_id>/cancel", methods=["POST"])
+async def admin_job_cancel(job_id):
+    if not session.get("is_admin"):
+        return redirect(url_for("admin_login"))
+    await db(storage.cancel_job, job_id)
+    return redirect(url_for("admin_job", job_id=job_id))
+
+
+@app.route("/admin/analytics")
+async def admin_analytics():
+    if not session.get("is_admin"):
+        return redirect(url_for("admin_login"))
+    return await render_template("analytics.html", **await db(verify_app.analytics_report, admin_event(), request.args))
+
+
+@app.route("/admin/search")
+async def admin_search():
+    if not session.get("is_admin"):
+        return redirect(url_for("admin_login"))
+    return await render_template("search.html", event_id=admin_event(), q=request.args.get("q", ""))
+
+
+@app.route("/admin/search.json")
+async def admin_search_json():
+    if not session.get("is_admin"):
+        abort(403)
+    event_id = admin_event()
+    result = await db(verify_app.search_report, event_id, request.args)
+    for r in result["results"]:
+        r["qr_url"] = url_for("qr_image", token=r["code"], fmt="png", event=event_id) if r["code"] else None
+    resp = jsonify(result)
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+
+@app.route("/admin/profiler", methods=["GET", "POST"])
+async def admin_profiler():
+    # profiler.py berbasis thread-local -> tidak berlaku di event loop; tampilkan sebagai nonaktif
+    if not session.get("is_admin"):
+        return redirect(url_for("admin_login"))
+    return await render_template("profiler.html", traces=[], cfg=dict(profiler.settings(), enabled=False),
+                                 now_ts=time.time())
+
+
+# === ASET & METRIK ===
+@app.route("/dist/<path:filename>")
+async def built_asset(filename):
+    if not assets.is_built_file(filename):
+        abort(404)
+    served, encoding = assets.pick_variant(filename, request.headers.get("Accept-Encoding"))
+    resp = await send_from_directory(assets.DIST_DIR, served, mimetype=assets.mimetype(filename))
+    return verify_app.asset_headers(resp, encoding)
+
+
+@app.route("/metrics")
+async def metrics_page():
+    if not verify_app.metrics_authorized(request.headers.get("Authorization")):
+        abort(403)
+    resp = await make_response(await db(verify_app.metrics_text))
+    resp.mimetype = "text/plain"
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+
+@app.route("/metrics/push", methods=["POST"])
+async def metrics_push():
+    if not METRICS_PUSH_TOKEN:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get("Authorization") or "", f"Bearer {METRICS_PUSH_TOKEN}"):
+        abort(403)
+    try:
+        rows = metrics.parse_push(await request.get_json(force=True))
+    except (TypeError, ValueError):
+        abort(400)
+    return jsonify(await db(verify_app.write_metric_rows, rows))
+
+
+@app.route("/api/ingest", methods=["POST"])
+@app.route("/e/<event_id>/api/ingest", methods=["POST"])
+async def ingest(event_id=None):
+    """Sama dengan verify_app.ingest (upsert peserta + antrean tiket)."""
+    if not INGEST_TOKEN:
+        abort(404)
+    if not verify_app.ingest_authorized(request.headers.get("Authorization")):
+        abort(403)
+    data = await request.get_json(silent=True)
+    try:
+        rows = verify_app.ingest_rows(data)
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    return jsonify(await db(verify_app.apply_ingest, verify_app.body_event(event_id, data), rows))
+
+
+@app.route("/api/edge/<any(push, pull, codes, redeem):op>", methods=["GET", "POST"])
+async def edge_endpoint(op):
+    """Sama dengan verify_app.edge_endpoint (hub replikasi gate edge)."""
+    if edge_sync.ROLE != "hub":
+        abort(404)
+    if not verify_app.edge_authorized(request.headers.get("Authorization")):
+        abort(403)
+    data = await request.get_json(silent=True) or {}
+    try:
+        return jsonify(await db(verify_app.edge_api, op, request.args, data))
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+
+
+@app.route("/admin/edge.json")
+async def admin_edge_status():
+    if not session.get("is_admin"):
+        abort(403)
+    return jsonify(await db(edge_sync.status, storage))
+
+
+# === JALANKAN SERVER ===
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=5000, debug=verify_app.DEBUG)